@@ -0,0 +1,50 @@
+# benchmarks/bench_frame_sampling.py
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from benchmarks.synthetic_media import make_synthetic_video
+from src.pipelines.extract_frames_from_video import ExtractFramesFromVideo
+
+
+def bench_strategy(video_path: str, fps: float, strategy: str):
+    extractor = ExtractFramesFromVideo(
+        video_path, tempfile.gettempdir(), fps, strategy=strategy)
+    start = time.perf_counter()
+    frame_numbers = [frame_number for frame_number, _, _ in extractor.iter_frames()]
+    elapsed = time.perf_counter() - start
+    return {
+        "strategy": strategy,
+        "target_fps": fps,
+        "frames": len(frame_numbers),
+        "seconds": round(elapsed, 3),
+        "frames_per_second": round(len(frame_numbers) / elapsed, 2) if elapsed > 0 else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare frame sampling strategies")
+    parser.add_argument("--video", help="Video to sample, a synthetic one is generated when omitted")
+    parser.add_argument("--seconds", type=float, default=600)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--video-fps", type=float, default=30)
+    parser.add_argument("--fps", type=float, nargs="+", default=[1, 0.5, 2.5])
+    parser.add_argument("--strategies", nargs="+", default=["read", "grab", "seek"])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or make_synthetic_video(
+            os.path.join(tmp_dir, "synthetic.mp4"), args.seconds,
+            args.width, args.height, args.video_fps)
+        results = [
+            bench_strategy(video_path, fps, strategy)
+            for fps in args.fps for strategy in args.strategies]
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/bench_inference_backends.py
+import argparse
+import copy
+import json
+import logging
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from benchmarks.stub_models import StubSwin
+from benchmarks.synthetic_media import make_synthetic_video
+from src.pipelines.detect_objects_from_frames import DetectObjectsFromFrames
+from src.pipelines.extract_features_from_frames import ExtractFeaturesFromFrames
+from src.pipelines.extract_frames_from_video import ExtractFramesFromVideo
+from src.pipelines.inference_backends import INFERENCE_BACKENDS, apply_backend, backend_for
+from src.pipelines.model_registry import MODEL_VERSIONS, load_swin, load_yolov5
+
+
+def decode_images(video_path: str, fps: float):
+    extractor = ExtractFramesFromVideo(video_path, tempfile.gettempdir(), fps)
+    return [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            for _, _, frame in extractor.iter_frames()]
+
+
+def swin_parity(features: list, reference: list):
+    features, reference = np.asarray(features), np.asarray(reference)
+    cosine = (features * reference).sum(axis=1) / (
+        np.linalg.norm(features, axis=1) * np.linalg.norm(reference, axis=1))
+    return {
+        "min_cosine_similarity": round(float(cosine.min()), 5),
+        "top1_agreement": round(float((features.argmax(axis=1) == reference.argmax(axis=1)).mean()), 4)
+    }
+
+
+def iou(a: dict, b: dict):
+    width = max(0.0, min(a["xmax"], b["xmax"]) - max(a["xmin"], b["xmin"]))
+    height = max(0.0, min(a["ymax"], b["ymax"]) - max(a["ymin"], b["ymin"]))
+    intersection = width * height
+    union = ((a["xmax"] - a["xmin"]) * (a["ymax"] - a["ymin"])
+             + (b["xmax"] - b["xmin"]) * (b["ymax"] - b["ymin"]) - intersection)
+    return intersection / union if union > 0 else 0.0
+
+
+def detection_parity(records: list, reference: list, threshold: float = 0.5):
+    """F1 of the detections against eager's, a match is the same class at IoU >= threshold."""
+    matched = total = expected = 0
+    for frame_records, frame_reference in zip(records, reference):
+        unmatched = list(frame_reference)
+        for record in frame_records:
+            match = next((r for r in unmatched if r["class"] == record["class"]
+                          and iou(record, r) >= threshold), None)
+            if match is not None:
+                unmatched.remove(match)
+                matched += 1
+        total += len(frame_records)
+        expected += len(frame_reference)
+    precision = matched / total if total else 1.0
+    recall = matched / expected if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"detection_f1": round(f1, 4)}
+
+
+def bench_backend(name: str, model, backend: str, images: list, batch_size: int, repeats: int):
+    model = apply_backend(name, copy.deepcopy(model), MODEL_VERSIONS[name], backend=backend)
+    if name == "swin":
+        stage = ExtractFeaturesFromFrames(tempfile.gettempdir(), model=model, num_workers=0)
+        run = stage.process_batch
+    else:
+        stage = DetectObjectsFromFrames(tempfile.gettempdir(), model=model)
+        def run(batch):
+            return [stage.to_records(result) for result in stage.process_batch(batch)]
+    batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+
+    # The first pass compiles every batch shape and runs the parity check
+    start = time.perf_counter()
+    outputs = [output for batch in batches for output in run(batch)]
+    first_pass = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for batch in batches:
+            run(batch)
+    elapsed = time.perf_counter() - start
+    return {
+        "model": name,
+        "backend": backend_for(name, backend),
+        "first_pass_seconds": round(first_pass, 3),
+        "frames_per_second": round(len(images) * repeats / elapsed, 2) if elapsed > 0 else None
+    }, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends on speed and output parity")
+    parser.add_argument("--video", help="Video to sample, a synthetic one is generated when omitted")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--fps", type=float, default=1)
+    parser.add_argument("--models", default="stub", choices=["stub", "real"],
+                        help="The stub only covers Swin, the YOLOv5 stand-in is not a torch model")
+    parser.add_argument("--stub-hidden-layers", type=int, default=4)
+    parser.add_argument("--backends", nargs="+", default=list(INFERENCE_BACKENDS), choices=INFERENCE_BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    # Every backend must run its model, not answer from an earlier run's results
+    os.environ["RESULT_CACHE"] = "false"
+    if args.models == "stub":
+        models = {"swin": StubSwin(hidden_layers=args.stub_hidden_layers)}
+    else:
+        models = {"swin": load_swin(), "yolov5": load_yolov5()}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or make_synthetic_video(
+            os.path.join(tmp_dir, "synthetic.mp4"), args.seconds)
+        images = decode_images(video_path, args.fps)
+        # Compiled graphs of one run are not reused by the next
+        os.environ.setdefault("COMPILED_MODEL_DIR", os.path.join(tmp_dir, "compiled"))
+
+        results = []
+        for name, model in models.items():
+            eager, reference = bench_backend(name, model, "eager", images, args.batch_size, args.repeats)
+            for backend in args.backends:
+                result, outputs = (eager, reference) if backend == "eager" else bench_backend(
+                    name, model, backend, images, args.batch_size, args.repeats)
+                result["speedup"] = round(result["frames_per_second"] / eager["frames_per_second"], 3)
+                result.update(swin_parity(outputs, reference) if name == "swin"
+                              else detection_parity(outputs, reference))
+                results.append(dict(result, requested_backend=backend))
+
+    print(json.dumps({"models": args.models, "frames": len(images), "cpu_count": os.cpu_count(),
+                      "torch": torch.__version__, "torch_threads": torch.get_num_threads(),
+                      "results": results}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_parallel_inference.py
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from functools import partial
+import cv2
+import torch
+from benchmarks.stub_models import StubSwin, StubYolo
+from benchmarks.synthetic_media import make_synthetic_video
+from src.pipelines.extract_frames_from_video import ExtractFramesFromVideo
+from src.pipelines.model_registry import model_registry
+from src.pipelines.parallel_video_pipeline import build_inference_executor, infer_shard
+
+
+def decode_shards(video_path: str, fps: float, shard_size: int):
+    extractor = ExtractFramesFromVideo(video_path, tempfile.gettempdir(), fps)
+    names, frames = [], []
+    for frame_number, _, frame in extractor.iter_frames():
+        names.append(extractor.frame_name(frame_number))
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    return [(names[i:i + shard_size], frames[i:i + shard_size])
+            for i in range(0, len(names), shard_size)]
+
+
+def bench_workers(shards: list, workers: int, threads: int):
+    executor = build_inference_executor(workers, threads)
+    try:
+        # Spawning and mapping the weights is a one-off cost, keep it out of the timing
+        for future in [executor.submit(infer_shard, *shards[0]) for _ in range(workers)]:
+            future.result()
+        start = time.perf_counter()
+        futures = [executor.submit(infer_shard, *shard) for shard in shards]
+        frames = sum(len(future.result()[0]) for future in futures)
+        elapsed = time.perf_counter() - start
+    finally:
+        executor.shutdown()
+    return {
+        "workers": workers,
+        "torch_threads": threads,
+        "frames": frames,
+        "seconds": round(elapsed, 3),
+        "frames_per_second": round(frames / elapsed, 2) if elapsed > 0 else None
+    }
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Measure how parallel inference scales with workers")
+    parser.add_argument("--video", help="Video to sample, a synthetic one is generated when omitted")
+    parser.add_argument("--seconds", type=float, default=120)
+    parser.add_argument("--fps", type=float, default=1)
+    parser.add_argument("--models", default="stub", choices=["stub", "real"])
+    parser.add_argument("--stub-hidden-layers", type=int, default=8,
+                        help="Dense layers in the stub Swin, so it has compute worth spreading")
+    parser.add_argument("--shard-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1))))
+    parser.add_argument("--cores", type=int, default=cpus,
+                        help="Cores split between the workers, each gets cores // workers threads")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    # Workers read the cache at import, repeated runs must not answer from it
+    os.environ["RESULT_CACHE"] = "false"
+    if args.models == "stub":
+        model_registry.register("swin", partial(StubSwin, hidden_layers=args.stub_hidden_layers))
+        model_registry.register("yolov5", StubYolo)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or make_synthetic_video(
+            os.path.join(tmp_dir, "synthetic.mp4"), args.seconds)
+        shards = decode_shards(video_path, args.fps, args.shard_size)
+
+    results = [bench_workers(shards, workers, max(1, args.cores // workers)) for workers in args.workers]
+    baseline = results[0]["frames_per_second"] / results[0]["workers"]
+    for result in results:
+        # Relative to the first configuration scaled to the same number of workers
+        result["efficiency"] = round(result["frames_per_second"] / (baseline * result["workers"]), 3)
+    print(json.dumps({"models": args.models, "cpu_count": cpus, "torch": torch.__version__,
+                      "results": results}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# benchmarks/bench_pipeline.py
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import torch
+from benchmarks.local_milvus import LocalMilvusClient
+from benchmarks.stub_models import StubSwin, StubYolo
+from benchmarks.synthetic_media import make_synthetic_video
+from src.pipelines.detect_objects_from_frames import DetectObjectsFromFrames
+from src.pipelines.extract_audio_and_transcribe_video import ExtractAudioAndTranscribeVideo
+from src.pipelines.extract_features_from_frames import ExtractFeaturesFromFrames
+from src.pipelines.extract_frames_from_video import ExtractFramesFromVideo
+from src.pipelines.ingest_to_milvus import MILVUS_ROW_LAYOUT, MILVUS_ROW_LAYOUTS, IngestToMilvus
+from src.pipelines.model_registry import current_rss_bytes, model_registry
+from src.pipelines.speech_recognizers import get_speech_recognizer
+
+STAGES = ("frames", "features", "detections", "audio", "ingest")
+PERCENTILES = (50, 90, 99)
+
+
+class LatencyRecorder:
+    """Per-item latencies of one stage, batch times are split over their items."""
+
+    def __init__(self):
+        self.samples = []
+
+    def record(self, seconds: float, count: int = 1):
+        if count > 0:
+            self.samples.extend([seconds / count] * count)
+
+    def timed_call(self, target, count=lambda args, result: 1):
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            result = target(*args, **kwargs)
+            self.record(time.perf_counter() - start, count(args, result))
+            return result
+        return call
+
+    def timed_iter(self, target):
+        # Each item's latency runs from the previous one, consumer time included
+        def iterate(*args, **kwargs):
+            start = time.perf_counter()
+            for item in target(*args, **kwargs):
+                now = time.perf_counter()
+                self.record(now - start)
+                yield item
+                start = time.perf_counter()
+        return iterate
+
+    def summary(self):
+        if not self.samples:
+            return None
+        samples_ms = np.asarray(self.samples) * 1000
+        summary = {f"p{p}": round(float(np.percentile(samples_ms, p)), 3) for p in PERCENTILES}
+        summary.update(mean=round(float(samples_ms.mean()), 3), max=round(float(samples_ms.max()), 3))
+        return summary
+
+
+class TimedModel:
+    """Wraps a model so each call is recorded, everything else is passed through."""
+
+    def __init__(self, model, recorder: LatencyRecorder):
+        self.model = model
+        self.recorder = recorder
+
+    def __call__(self, inputs, *args, **kwargs):
+        start = time.perf_counter()
+        result = self.model(inputs, *args, **kwargs)
+        count = len(inputs) if isinstance(inputs, (list, torch.Tensor)) else 1
+        self.recorder.record(time.perf_counter() - start, count)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class RssSampler:
+    """Samples the resident set size in the background to find a stage's peak."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = current_rss_bytes() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes() or 0)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes() or 0)
+        return False
+
+
+def run_stage(stage: str, run, recorder: LatencyRecorder):
+    """Run one stage; ``run`` returns the number of items it processed."""
+    gc.collect()
+    rss_before = current_rss_bytes()
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        items = run()
+        seconds = time.perf_counter() - start
+    logging.warning(f"{stage}: {items} items in {seconds:.2f} seconds")
+    return {
+        "stage": stage,
+        "items": items,
+        "seconds": round(seconds, 3),
+        "items_per_second": round(items / seconds, 2) if seconds > 0 else None,
+        "latency_ms": recorder.summary(),
+        "rss_before_bytes": rss_before,
+        "peak_rss_bytes": sampler.peak
+    }
+
+
+def load_models(kind: str):
+    start = time.perf_counter()
+    if kind == "stub":
+        models = StubSwin(), StubYolo()
+    else:
+        models = model_registry.get("swin"), model_registry.get("yolov5")
+    return models, time.perf_counter() - start
+
+
+def run_pipeline(args, video_path: str, work_dir: str, models: str):
+    frames_dir = os.path.join(work_dir, f"frames_{models}")
+    audio_dir = os.path.join(work_dir, f"audio_{models}")
+    os.makedirs(frames_dir, exist_ok=True)
+    (swin, yolo), load_seconds = load_models(models)
+    recorders = {stage: LatencyRecorder() for stage in STAGES}
+    stages = [stage for stage in STAGES if stage in args.stages]
+    results = []
+
+    def frames():
+        extractor = ExtractFramesFromVideo(video_path, frames_dir, args.fps, strategy=args.sampling)
+        extractor.iter_frames = recorders["frames"].timed_iter(extractor.iter_frames)
+        extractor.extract_frames()
+        return len(extractor.frame_ranges)
+
+    def features():
+        extractor = ExtractFeaturesFromFrames(
+            frames_dir, model=TimedModel(swin, recorders["features"]),
+            batch_size=args.feature_batch_size, num_workers=args.feature_workers)
+        extractor.extract_features()
+        return len(extractor.list_frames())
+
+    def detections():
+        detector = DetectObjectsFromFrames(
+            frames_dir, model=TimedModel(yolo, recorders["detections"]),
+            batch_size=args.detection_batch_size)
+        detector.detect_objects()
+        return len(detector.list_frames())
+
+    def audio():
+        transcriber = ExtractAudioAndTranscribeVideo(
+            video_path, audio_dir, classifier=args.audio_classifier,
+            speech_recognizer=get_speech_recognizer(args.speech))
+        transcriber.recognize = recorders["audio"].timed_call(transcriber.recognize)
+        if args.audio_extraction == "streaming":
+            return len(transcriber.transcribe_stream())
+        return len(transcriber.process())
+
+    def ingest():
+        milvus_client = LocalMilvusClient(
+            f"bench_{models}", insert_latency=args.insert_latency, flush_latency=args.flush_latency,
+            layout=args.row_layout)
+        milvus_client.insert_columns = recorders["ingest"].timed_call(
+            milvus_client.insert_columns, count=lambda _, rows: rows)
+        ingestor = IngestToMilvus(frames_dir, milvus_client, video_id="bench")
+        return ingestor.ingest_data()["rows"]
+
+    runners = {"frames": frames, "features": features, "detections": detections,
+               "audio": audio, "ingest": ingest}
+    for stage in stages:
+        results.append(run_stage(stage, runners[stage], recorders[stage]))
+    return {"models": models, "model_load_seconds": round(load_seconds, 3), "stages": results}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads()
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float):
+    """Stages whose throughput dropped, or p50 latency rose, by more than ``tolerance``."""
+    previous = {
+        (run["models"], stage["stage"]): stage
+        for run in baseline["runs"] for stage in run["stages"]}
+    rows, regressions = [], []
+    for run in current["runs"]:
+        for stage in run["stages"]:
+            before = previous.get((run["models"], stage["stage"]))
+            if before is None or not before["items_per_second"] or not stage["items_per_second"]:
+                continue
+            throughput = stage["items_per_second"] / before["items_per_second"] - 1
+            p50_before = (before["latency_ms"] or {}).get("p50")
+            p50_after = (stage["latency_ms"] or {}).get("p50")
+            latency = p50_after / p50_before - 1 if p50_before and p50_after else None
+            row = {"models": run["models"], "stage": stage["stage"],
+                   "throughput_change": round(throughput, 3),
+                   "p50_change": round(latency, 3) if latency is not None else None}
+            rows.append(row)
+            if throughput < -tolerance or (latency is not None and latency > tolerance):
+                regressions.append(row)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on a synthetic video")
+    parser.add_argument("--video", help="Video to process, a synthetic one is generated when omitted")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--video-fps", type=float, default=30)
+    parser.add_argument("--fps", type=float, default=1, help="Frames sampled per second of video")
+    parser.add_argument("--sampling", default="auto", help="Frame sampling strategy")
+    parser.add_argument("--models", nargs="+", default=["stub"], choices=["stub", "real"])
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--feature-batch-size", default="auto")
+    parser.add_argument("--feature-workers", type=int, help="DataLoader workers, FEATURE_NUM_WORKERS when omitted")
+    parser.add_argument("--detection-batch-size", type=int, default=16)
+    parser.add_argument("--speech", default="stub", help="Speech backend, see SPEECH_BACKEND")
+    parser.add_argument("--audio-extraction", default="file", choices=["file", "streaming"])
+    parser.add_argument("--audio-classifier", default="chunked", choices=["chunked", "vectorized"])
+    parser.add_argument("--insert-latency", type=float, default=0.005,
+                        help="Seconds the local Milvus stand-in sleeps per insert")
+    parser.add_argument("--flush-latency", type=float, default=0.05)
+    parser.add_argument("--row-layout", default=MILVUS_ROW_LAYOUT, choices=MILVUS_ROW_LAYOUTS,
+                        help="One Milvus row per frame or per detection")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        video_path = args.video or make_synthetic_video(
+            os.path.join(work_dir, "synthetic.mp4"), args.seconds,
+            args.width, args.height, args.video_fps, audio=True)
+        results = {
+            "benchmark": "pipeline",
+            "created_at": time.time(),
+            "environment": environment(),
+            "config": vars(args),
+            "runs": [run_pipeline(args, video_path, work_dir, models) for models in args.models]
+        }
+
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows, regressions = compare(json.load(f), results, args.tolerance)
+        print(json.dumps({"comparison": rows, "regressions": regressions}, indent=4))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
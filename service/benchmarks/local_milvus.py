@@ -0,0 +1,74 @@
+# benchmarks/local_milvus.py
+import threading
+import time
+import numpy as np
+from src.pipelines.ingest_to_milvus import MILVUS_ROW_LAYOUT
+from src.pipelines.milvus_index_strategy import MilvusIndexStrategy
+
+LAYOUT_FIELDS = {
+    "detection": ["video_id", "frame_name", "object_class", "confidence",
+                  "start_time", "end_time", "vector"],
+    "frame": ["video_id", "frame_name", "object_classes", "max_confidence", "class_confidence",
+              "detections", "start_time", "end_time", "vector"]
+}
+
+
+class LocalMilvusClient:
+    """In-process stand-in for MilvusClient that keeps inserted columns in memory.
+
+    ``insert_latency`` and ``flush_latency`` (seconds) emulate server round-trips
+    so batching and flushing strategies can be compared without a Milvus server.
+    """
+
+    def __init__(self, collection_name: str = "local", fields=None,
+                 insert_latency: float = 0.0, flush_latency: float = 0.0,
+                 index_strategy=None, layout: str = None):
+        self.collection_name = collection_name
+        self.layout = layout or MILVUS_ROW_LAYOUT
+        self.insert_fields = list(fields or LAYOUT_FIELDS[self.layout])
+        self.insert_latency = insert_latency
+        self.flush_latency = flush_latency
+        self.columns = {name: [] for name in self.insert_fields}
+        self.insert_calls = 0
+        self.flush_calls = 0
+        self.index_strategy = index_strategy or MilvusIndexStrategy()
+        self.index_config = None
+        self._lock = threading.Lock()
+
+    def insert_columns(self, columns: dict):
+        time.sleep(self.insert_latency)
+        row_count = len(columns[self.insert_fields[0]])
+        with self._lock:
+            for name in self.insert_fields:
+                self.columns[name].extend(columns[name])
+            self.insert_calls += 1
+        return row_count
+
+    def insert_data(self, data: list):
+        columns = {name: [row[name] for row in data] for name in self.insert_fields}
+        return self.insert_columns(columns)
+
+    def delete_frames(self, video_id: str, frame_names: list):
+        names = set(frame_names)
+        with self._lock:
+            keep = [i for i, (vid, frame) in enumerate(zip(self.columns["video_id"], self.columns["frame_name"]))
+                    if vid != video_id or frame not in names]
+            for name in self.insert_fields:
+                self.columns[name] = [self.columns[name][i] for i in keep]
+
+    def flush(self):
+        time.sleep(self.flush_latency)
+        self.flush_calls += 1
+
+    def build_index(self):
+        # Searches stay brute force, only the chosen configuration is recorded
+        dim = len(self.columns["vector"][0]) if self.num_entities else 0
+        self.index_config = self.index_strategy.choose(self.num_entities, dim)
+        return {"config": self.index_config, "build_seconds": 0.0}
+
+    @property
+    def num_entities(self):
+        return len(self.columns[self.insert_fields[0]])
+
+    def vectors(self):
+        return np.asarray(self.columns["vector"], dtype=np.float32)
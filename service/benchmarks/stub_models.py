@@ -0,0 +1,86 @@
+# benchmarks/stub_models.py
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+
+STUB_CLASS_NAMES = {0: "person", 1: "car", 2: "dog", 3: "chair"}
+
+
+class StubSwin(torch.nn.Module):
+    """Stands in for SwinForImageClassification with a pooled linear projection.
+
+    Takes the same normalized 224x224 batches and returns ``.logits`` and
+    ``.pooler_output`` of the same widths, so every stage downstream sees
+    real-shaped features. ``hidden_layers`` adds dense layers to emulate a
+    heavier model's compute.
+    """
+
+    def __init__(self, num_labels: int = 1000, seed: int = 0,
+                 hidden_layers: int = 0, hidden_size: int = 2048, embedding_size: int = 1024):
+        super().__init__()
+        generator = torch.Generator().manual_seed(seed)
+        self.hidden = torch.nn.Sequential(*[
+            layer for i in range(hidden_layers) for layer in (
+                torch.nn.Linear(3 * 7 * 7 if i == 0 else hidden_size, hidden_size), torch.nn.ReLU())])
+        self.projection = torch.nn.Linear(hidden_size if hidden_layers else 3 * 7 * 7, num_labels)
+        self.pooler = torch.nn.Linear(hidden_size if hidden_layers else 3 * 7 * 7, embedding_size)
+        with torch.no_grad():
+            for parameter in self.parameters():
+                parameter.copy_(torch.randn(parameter.shape, generator=generator) / parameter.shape[-1] ** 0.5)
+        self.eval()
+
+    def forward(self, pixel_values):
+        hidden = self.hidden(F.adaptive_avg_pool2d(pixel_values, 7).flatten(1))
+        return SimpleNamespace(logits=self.projection(hidden), pooler_output=self.pooler(hidden))
+
+
+class StubDetections:
+    """The parts of YOLOv5's Detections that the pipeline reads."""
+
+    def __init__(self, xyxy: list, names: dict):
+        self.xyxy = xyxy
+        self.names = names
+
+    def pandas(self):
+        columns = ["xmin", "ymin", "xmax", "ymax", "confidence", "class"]
+        frames = []
+        for boxes in self.xyxy:
+            frame = pd.DataFrame(boxes.numpy(), columns=columns)
+            frame["class"] = frame["class"].astype(int)
+            frame["name"] = frame["class"].map(self.names)
+            frames.append(frame)
+        return SimpleNamespace(xyxy=frames)
+
+
+class StubYolo:
+    """Stands in for the YOLOv5 hub model: boxes derived from image brightness.
+
+    Accepts a PIL image or a list of them like the AutoShape wrapper, and
+    returns ``max_boxes`` deterministic detections per image at most.
+    """
+
+    def __init__(self, max_boxes: int = 3):
+        self.max_boxes = max_boxes
+        self.names = dict(STUB_CLASS_NAMES)
+
+    def eval(self):
+        return self
+
+    def __call__(self, images):
+        images = images if isinstance(images, list) else [images]
+        return StubDetections([self.detect(image) for image in images], self.names)
+
+    def detect(self, image):
+        pixels = np.asarray(image.convert("L").resize((32, 32)), dtype=np.float32) / 255.0
+        width, height = image.size
+        count = 1 + int(pixels.mean() * self.max_boxes) % self.max_boxes
+        rows = []
+        for i in range(count):
+            # Box around the i-th brightest column band of the thumbnail
+            band = int(np.argsort(pixels.mean(axis=0))[-(i + 1)])
+            x1 = band / 32 * width
+            rows.append([x1, height * 0.25, min(width, x1 + width / 8), height * 0.75,
+                         float(0.5 + pixels[:, band].mean() / 2), i % len(self.names)])
+        return torch.tensor(rows, dtype=torch.float32)
@@ -1,82 +1,154 @@
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 import os
 import shutil
-from src.pipelines.extract_frames_from_video import ExtractFramesFromVideo
-from src.pipelines.extract_features_from_frames import ExtractFeaturesFromFrames
-from src.pipelines.extract_audio_and_transcribe_video import ExtractAudioAndTranscribeVideo
-from src.pipelines.handle_video_file import HandleVideoFile
-from src.pipelines.detect_objects_from_frames import DetectObjectsFromFrames
-from src.pipelines.ingest_to_milvus import IngestToMilvus, MilvusClient
+from contextlib import asynccontextmanager
+from src.app.job_manager import JobManager, JobQueueFull
+from src.app.upload_sessions import UploadSessions
+from src.pipelines.handle_video_file import HandleVideoFile, new_upload_id
+from src.pipelines.metrics import MetricsRegistry, metrics, record_model_gauges
+from src.pipelines.model_registry import model_registry
+from src.pipelines.query_cache import query_cache
+from src.pipelines.search_video_library import SearchVideoLibrary
+from src.routes.jobs import build_jobs_router
+from src.routes.search import build_search_router
+from src.routes.uploads import build_uploads_router
+from src.routes.videos import build_videos_router
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# "disk" keeps the JPEG/JSON round-trip, "streaming" runs frames in memory
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "disk").lower()
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "true").lower() == "true"
 
 FRAMES_DIR = "frames"
 AUDIO_DIR = "audio"
 OUTPUT_DIR = "output"
+UPLOADS_DIR = "uploads"
+
+searcher = SearchVideoLibrary(frames_dir=FRAMES_DIR, audio_dir=AUDIO_DIR)
+
+
+def on_job_done(job_id: str):
+    # New or replaced rows make cached search results stale
+    searcher.forget()
+    query_cache.clear()
+
+
+# Uploads run on worker processes, each keeping its own resident models
+job_manager = JobManager(
+    max_workers=int(os.getenv("JOB_WORKERS", 1)),
+    max_queued=int(os.getenv("JOB_QUEUE_SIZE", 4)),
+    max_history=int(os.getenv("JOB_HISTORY", 1000)),
+    preload_models=PRELOAD_MODELS,
+    on_job_done=on_job_done,
+    frames_root=FRAMES_DIR)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Workers warm their models once so jobs don't pay the cold-start cost
+    job_manager.start()
+    yield
+    job_manager.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+app.include_router(build_jobs_router(job_manager))
+app.include_router(build_search_router(searcher, query_cache))
+app.include_router(build_videos_router(searcher, query_cache))
 
 # Ensure the frames directory exists
 os.makedirs(FRAMES_DIR, exist_ok=True)
 os.makedirs(AUDIO_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+os.makedirs(UPLOADS_DIR, exist_ok=True)
 
 
-@app.post("/upload_video/")
-async def upload_video(file: UploadFile = File(...),
-                       frames_per_second: int = Form(1)):
-    logger.info("Received request to upload video")
-
-    upload_id = file.filename.split('.')[0]
+def submit_upload(upload_id: str, video_path: str, frames_per_second: float,
+                  video_hash: str = None, upload_pending: bool = False) -> str:
+    """Queue a saved (or still arriving) upload, raises JobQueueFull when busy."""
     upload_frames_dir = os.path.join(FRAMES_DIR, upload_id)
     upload_audio_dir = os.path.join(AUDIO_DIR, upload_id)
     output_path = os.path.join(OUTPUT_DIR,
                                f"{upload_id}_detected_objects.json")
     os.makedirs(upload_frames_dir, exist_ok=True)
     os.makedirs(upload_audio_dir, exist_ok=True)
-
-    handler = ""
-    temp_video_path = ""
     try:
-        handler = HandleVideoFile(upload_dir=upload_frames_dir)
-        temp_video_path = handler.save_file(file)
+        return job_manager.submit({
+            "upload_id": upload_id,
+            "video_path": video_path,
+            "frames_dir": upload_frames_dir,
+            "audio_dir": upload_audio_dir,
+            "output_path": output_path,
+            "frames_per_second": frames_per_second,
+            "video_hash": video_hash,
+            "upload_pending": upload_pending,
+            "mode": PIPELINE_MODE
+        })
+    except Exception:
+        shutil.rmtree(upload_frames_dir, ignore_errors=True)
+        shutil.rmtree(upload_audio_dir, ignore_errors=True)
+        raise
 
-        extractor = ExtractFramesFromVideo(video_path=temp_video_path, output_dir=upload_frames_dir,
-                                           fps=frames_per_second)
-        extractor.extract_frames()
 
-        transcriber = ExtractAudioAndTranscribeVideo(
-            video_path=temp_video_path, output_dir=upload_audio_dir)
-        transcript = transcriber.process()
+# Resumable uploads share the job submission with /upload_video/
+app.include_router(build_uploads_router(UploadSessions(UPLOADS_DIR), job_manager, submit_upload))
 
-        feature_extractor = ExtractFeaturesFromFrames(upload_frames_dir)
-        feature_extractor.extract_features()
 
-        object_detector = DetectObjectsFromFrames(upload_frames_dir)
-        object_detector.detect_objects()
+@app.post("/upload_video/", status_code=202)
+async def upload_video(file: UploadFile = File(...),
+                       frames_per_second: float = Form(1)):
+    logger.info("Received request to upload video")
 
-        milvus_client = MilvusClient(
-            collection_name="object_detection_{upload_id}".format(
-                upload_id=upload_id))
-        ingestor = IngestToMilvus(upload_frames_dir, milvus_client)
-        ingestor.ingest_data()
+    if frames_per_second <= 0:
+        raise HTTPException(status_code=400,
+                            detail="frames_per_second must be positive")
 
-        return JSONResponse(content={
-                            "message": "Processing completed successfully", "output_path": output_path})
+    # Reject before touching the disk when every worker and queue slot is taken
+    if not job_manager.has_capacity():
+        raise HTTPException(status_code=429, detail="Job queue is full",
+                            headers={"Retry-After": "30"})
 
+    # The client filename is only a prefix, concurrent uploads of one name get distinct ids
+    upload_id = new_upload_id(file.filename)
+    handler = HandleVideoFile(upload_dir=UPLOADS_DIR)
+    temp_video_path = ""
+    try:
+        temp_video_path = await handler.save_file(file, upload_id)
+        job_id = submit_upload(upload_id, temp_video_path, frames_per_second,
+                               video_hash=handler.content_hash)
+    except JobQueueFull as e:
+        handler.clean_up(temp_video_path)
+        raise HTTPException(status_code=429, detail=str(e),
+                            headers={"Retry-After": "30"})
     except Exception as e:
-        logger.error(f"Error during processing: {str(e)}")
-        shutil.rmtree(upload_frames_dir, ignore_errors=True)
-        shutil.rmtree(upload_audio_dir, ignore_errors=True)
+        logger.error(f"Error while queueing upload: {str(e)}")
+        handler.clean_up(temp_video_path)
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if temp_video_path != "":
-            handler.clean_up(temp_video_path)
+
+    return JSONResponse(status_code=202, content={
+                        "message": "Processing queued", "job_id": job_id,
+                        "upload_id": upload_id,
+                        "status_url": f"/jobs/{job_id}"})
+
+
+@app.get("/models")
+def read_models():
+    return {"api": model_registry.stats(), "jobs": job_manager.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    # Prometheus text format; worker registries are the ones published after their last job
+    registry = MetricsRegistry()
+    registry.merge(metrics.snapshot())
+    record_model_gauges(registry, os.getpid(), model_registry.stats())
+    return job_manager.collect_metrics(registry).render_prometheus()
 
 
 @app.get("/")
@@ -0,0 +1,440 @@
+# src/app/job_manager.py
+import os
+import logging
+import multiprocessing
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.pipelines.handle_video_file import COMPLETE_SUFFIX, read_completion
+from src.pipelines.ingest_to_milvus import (
+    MILVUS_ROW_LAYOUT, STAGING_PREFIX, MilvusClient, feature_space, ingest_client_for_video,
+    milvus_client_for_video, publish_video)
+from src.pipelines.metrics import JobTrace, metrics, record_model_gauges
+from src.pipelines.model_registry import model_registry, MODEL_VERSIONS
+from src.pipelines.result_cache import RESULT_CACHE_MATCH, content_key, result_cache
+from src.pipelines.pipeline_orchestrator import PipelineOrchestrator, prepare_manifest, shutdown_executors
+from src.pipelines.stage_manifest import MANIFEST_FILE, STAGES, StageManifest
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("completed", "failed")
+# Attach a per-stage span list and counter deltas to every job
+JOB_TRACE = os.getenv("JOB_TRACE", "false").lower() == "true"
+# Keep a failed job's frames, audio and video so a retry resumes from its stage manifest
+JOB_RESUME = os.getenv("JOB_RESUME", "true").lower() == "true"
+# Seconds those files are kept for a retry before they are removed
+JOB_RESUME_TTL = float(os.getenv("JOB_RESUME_TTL", 24 * 3600))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobConflict(Exception):
+    pass
+
+
+def update_job(jobs, job_id: str, **changes):
+    # Manager proxies don't track nested mutation, so write the whole record
+    job = dict(jobs[job_id])
+    job.update(changes)
+    job["updated_at"] = time.time()
+    jobs[job_id] = job
+
+
+def update_stage(jobs, job_id: str, stage: str, status: str, seconds=None):
+    job = dict(jobs[job_id])
+    stages = dict(job["stages"])
+    stages[stage] = {"status": status, "seconds": seconds}
+    job["stages"] = stages
+    job["updated_at"] = time.time()
+    jobs[job_id] = job
+
+
+def init_worker(worker_stats, worker_metrics, preload_models: bool):
+    logging.basicConfig(level=logging.INFO)
+    if preload_models:
+        model_registry.warm_up()
+    model_registry.start_idle_eviction()
+    worker_stats[os.getpid()] = model_registry.stats()
+    worker_metrics[os.getpid()] = metrics.snapshot()
+
+
+def counter_deltas(before: dict, after: dict):
+    return {name: value - before.get(name, 0)
+            for name, value in after.items() if value != before.get(name, 0)}
+
+
+def video_cache_key(params: dict):
+    if not params.get("video_hash"):
+        return None
+    # Everything that changes which frames are sampled or how their rows are stored
+    return content_key(
+        params["video_hash"], params["frames_per_second"], params.get("mode", "disk"),
+        os.getenv("FRAME_SAMPLING", "auto"),
+        os.getenv("FRAME_FILTER", "none"), os.getenv("FRAME_FILTER_THRESHOLD", ""),
+        RESULT_CACHE_MATCH, MILVUS_ROW_LAYOUT,
+        MODEL_VERSIONS["swin"], MODEL_VERSIONS["yolov5"], feature_space.version)
+
+
+def cached_video_result(params: dict):
+    # A duplicate upload can reuse the collection built for the original one
+    key = video_cache_key(params)
+    cached = result_cache.get_json("videos", key) if key else None
+    if cached is None or not MilvusClient.has_collection(cached["collection_name"]):
+        return None
+    video_id = cached["result"].get("video_id")
+    if video_id and not milvus_client_for_video(video_id, drop_existing=False).has_video(video_id):
+        # The original video was deleted from the shared collection since
+        return None
+    return dict(cached["result"], cache_hit=True)
+
+
+def can_resume_ingest(milvus_client, manifest, video_id: str) -> bool:
+    """Whether the rows an earlier attempt stored are still where it left them."""
+    completed = manifest.is_completed("ingest")
+    if not completed and not milvus_client.shared and \
+            not milvus_client.collection_name.startswith(STAGING_PREFIX):
+        # Unfinished per-video ingestion lives in the staging collection, which is gone
+        return False
+    if not completed and not manifest.checkpointed_frames("ingest"):
+        return True
+    return milvus_client.has_video(video_id)
+
+
+def expire_failed_uploads(frames_root: str, ttl_seconds: float, skip=()):
+    """Remove the files kept for failed jobs that were not retried in time, returns their upload ids."""
+    if not os.path.isdir(frames_root):
+        return []
+    cutoff = time.time() - ttl_seconds
+    expired = []
+    for upload_id in os.listdir(frames_root):
+        frames_dir = os.path.join(frames_root, upload_id)
+        manifest_path = os.path.join(frames_dir, MANIFEST_FILE)
+        if upload_id in skip or not os.path.exists(manifest_path):
+            continue
+        manifest = StageManifest(manifest_path)
+        failed_at = manifest.failed_at()
+        if failed_at is None or failed_at > cutoff:
+            continue
+        for path in manifest.data["failed"]["paths"]:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(frames_dir, ignore_errors=True)
+        expired.append(upload_id)
+    if expired:
+        logger.info(f"Removed the files of {len(expired)} failed uploads not retried in time")
+    return expired
+
+
+def run_upload_job(jobs, worker_stats, worker_metrics, job_id: str, params: dict):
+    """Run one upload through the pipeline inside a worker process."""
+    update_job(jobs, job_id, status="running", started_at=time.time())
+    # Workers run one job at a time, so counter deltas belong to this job
+    trace = JobTrace(job_id) if JOB_TRACE else None
+    counters_before = metrics.counter_totals() if trace is not None else None
+    status = "failed"
+    stage_lock = threading.Lock()
+
+    def on_stage(stage: str, status: str, seconds=None):
+        # Stages report from the visual thread and the joining thread
+        with stage_lock:
+            update_stage(jobs, job_id, stage, status, seconds)
+
+    upload_pending = params.get("upload_pending", False)
+    rerun_stages = params.get("rerun_stages") or []
+    manifest = None
+    try:
+        # Early-started uploads have no content hash until the last byte arrives,
+        # re-running stages on purpose must not be answered from the cache
+        cached = None if upload_pending or rerun_stages else cached_video_result(params)
+        if cached is not None:
+            logger.info(f"Job {job_id} reuses results of an identical upload")
+            update_job(jobs, job_id, status="completed", result=cached)
+            status = "completed"
+            return
+
+        video_id = params["upload_id"]
+        manifest = prepare_manifest(
+            params["frames_dir"], params["audio_dir"], params["frames_per_second"],
+            params["mode"], rerun_stages) if JOB_RESUME else None
+        if manifest is not None:
+            manifest.clear_failure()
+        resume_ingest = manifest is not None and manifest.has_progress("ingest")
+        milvus_client = ingest_client_for_video(video_id, resume=resume_ingest)
+        if resume_ingest and not can_resume_ingest(milvus_client, manifest, video_id):
+            # The stored rows were deleted since, ingest again from the saved files into a
+            # fresh staging collection, or replacing every current row of a shared one
+            logger.info(f"Rows stored for {video_id} by an earlier attempt are gone, ingesting again")
+            manifest.reset({"ingest"})
+            resume_ingest = False
+            milvus_client = ingest_client_for_video(video_id)
+        if resume_ingest:
+            stale_rows = manifest.stale_rows()
+        else:
+            # A re-run replaces the video's rows, they stay searchable until the new ones are in
+            stale_rows = milvus_client.video_row_ids(video_id) if milvus_client.shared else []
+            if manifest is not None:
+                manifest.set_stale_rows(stale_rows)
+        orchestrator = PipelineOrchestrator(
+            video_path=params["video_path"], frames_dir=params["frames_dir"],
+            audio_dir=params["audio_dir"],
+            frames_per_second=params["frames_per_second"],
+            milvus_client=milvus_client, mode=params["mode"],
+            on_stage=on_stage, video_hash=params.get("video_hash"),
+            video_id=video_id, upload_pending=upload_pending, trace=trace,
+            manifest=manifest)
+        result = orchestrator.run()
+        collection_name = publish_video(milvus_client, video_id, stale_rows)
+        if manifest is not None:
+            manifest.set_stale_rows([])
+        if upload_pending:
+            params = dict(params, video_hash=read_completion(params["video_path"])["content_hash"])
+        job_result = {
+            "output_path": params["output_path"],
+            "collection_name": collection_name,
+            "video_id": video_id,
+            "timings": result["timings"],
+            "frame_filter": result["frame_filter"],
+            "ingest": result["ingest"],
+            "index": result["index"],
+            "transcript_chunks": len(result["transcript"]),
+            "cache_hit": False
+        }
+        if video_cache_key(params):
+            result_cache.put_json("videos", video_cache_key(params), {
+                "collection_name": collection_name, "result": job_result})
+        with stage_lock:
+            update_job(jobs, job_id, status="completed", result=job_result)
+        status = "completed"
+    except Exception as e:
+        logger.error(f"Error during processing of job {job_id}: {str(e)}")
+        if not JOB_RESUME:
+            shutil.rmtree(params["frames_dir"], ignore_errors=True)
+            shutil.rmtree(params["audio_dir"], ignore_errors=True)
+        elif manifest is not None:
+            manifest.mark_failed([params["audio_dir"], params["video_path"],
+                                  params["video_path"] + COMPLETE_SUFFIX])
+        update_job(jobs, job_id, status="failed", error=str(e))
+    finally:
+        # Frames and features outlive a completed job, stages reading them can still re-run.
+        # A still arriving upload belongs to its session, which queues another job if this one failed
+        if status == "completed" or not (JOB_RESUME or upload_pending):
+            for path in (params["video_path"], params["video_path"] + COMPLETE_SUFFIX):
+                if os.path.exists(path):
+                    os.remove(path)
+        metrics.inc("qyv_jobs_total", status=status)
+        if trace is not None:
+            update_job(jobs, job_id, trace=trace.to_dict(
+                counter_deltas(counters_before, metrics.counter_totals())))
+        worker_stats[os.getpid()] = model_registry.stats()
+        worker_metrics[os.getpid()] = metrics.snapshot()
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 1, max_queued: int = 4,
+                 max_history: int = 1000, preload_models: bool = True,
+                 on_job_done=None, frames_root: str = None, resume_ttl: float = None):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_history = max_history
+        self.preload_models = preload_models
+        # Called with the job id in the API process once a job finishes
+        self.on_job_done = on_job_done
+        # Upload directories swept for failed jobs whose retry window has passed
+        self.frames_root = frames_root
+        self.resume_ttl = resume_ttl if resume_ttl is not None else JOB_RESUME_TTL
+        self._context = multiprocessing.get_context("spawn")
+        self._manager = None
+        self._executor = None
+        self._active = set()
+        self._lock = threading.Lock()
+        self.jobs = None
+        self.worker_stats = None
+        self.worker_metrics = None
+        # Submitted parameters by job id, kept in this process for retries
+        self._params = {}
+
+    def start(self):
+        self.expire_failed()
+        self._manager = self._context.Manager()
+        self.jobs = self._manager.dict()
+        self.worker_stats = self._manager.dict()
+        # Each worker publishes its metrics registry after every job
+        self.worker_metrics = self._manager.dict()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        # Processes sidestep the GIL; each worker keeps its own resident models
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._context,
+            initializer=init_worker,
+            initargs=(self.worker_stats, self.worker_metrics, self.preload_models))
+
+    def _replace_executor(self, broken):
+        # A killed worker (out of memory, segfault) breaks the whole pool for good
+        with self._lock:
+            if self._executor is not broken:
+                return
+            logger.warning("A job worker died, starting a new worker pool")
+            self._executor = self._new_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit_job(self, job_id: str, params: dict):
+        executor = self._executor
+        try:
+            future = executor.submit(
+                run_upload_job, self.jobs, self.worker_stats, self.worker_metrics, job_id, params)
+        except BrokenProcessPool:
+            self._replace_executor(executor)
+            executor = self._executor
+            future = executor.submit(
+                run_upload_job, self.jobs, self.worker_stats, self.worker_metrics, job_id, params)
+        future.add_done_callback(
+            lambda done: self._on_done(job_id, done, executor))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        shutdown_executors()
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queued
+
+    def has_capacity(self):
+        with self._lock:
+            return len(self._active) < self.capacity
+
+    def expire_failed(self):
+        if self.frames_root is None:
+            return []
+        with self._lock:
+            # A queued retry has not cleared the failure yet
+            active = ({self.jobs[job_id]["upload_id"] for job_id in self._active}
+                if self.jobs is not None else set())
+        return expire_failed_uploads(self.frames_root, self.resume_ttl, skip=active)
+
+    def submit(self, params: dict, retry_of: str = None) -> str:
+        self.expire_failed()
+        with self._lock:
+            if len(self._active) >= self.capacity:
+                raise JobQueueFull(
+                    f"Job queue is full ({len(self._active)} jobs pending)")
+            if retry_of is not None and any(
+                    self.jobs[active]["upload_id"] == params["upload_id"] for active in self._active):
+                raise JobConflict(f"Upload {params['upload_id']} is already being processed")
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            self.jobs[job_id] = {
+                "id": job_id,
+                "upload_id": params["upload_id"],
+                "status": "queued",
+                "stages": {},
+                "result": None,
+                "error": None,
+                "trace": None,
+                "retry_of": retry_of,
+                "created_at": now,
+                "updated_at": now
+            }
+            self._params[job_id] = params
+            self._active.add(job_id)
+            self._prune_history()
+
+        try:
+            self._submit_job(job_id, params)
+        except Exception as e:
+            with self._lock:
+                self._active.discard(job_id)
+            update_job(self.jobs, job_id, status="failed", error=str(e))
+            raise
+        return job_id
+
+    def retry(self, job_id: str, stages=None) -> str:
+        """Queue a finished job's upload again, resuming from its stage manifest.
+
+        ``stages`` are re-run even if completed, along with every stage
+        depending on them. Raises KeyError for unknown jobs, ValueError for
+        unknown stages and JobConflict while the upload is being processed.
+        """
+        unknown = set(stages or ()) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stages {sorted(unknown)}, expected some of {list(STAGES)}")
+        job = self.jobs.get(job_id)
+        params = self._params.get(job_id)
+        if job is None or params is None:
+            raise KeyError(job_id)
+        if job["status"] not in FINISHED_STATUSES:
+            raise JobConflict(f"Job {job_id} is still {job['status']}")
+        if not os.path.isdir(params["frames_dir"]) and not os.path.exists(params["video_path"]):
+            raise JobConflict(f"The files of job {job_id} are no longer kept")
+        return self.submit(dict(params, rerun_stages=list(stages or ())), retry_of=job_id)
+
+    def _on_done(self, job_id: str, future, executor=None):
+        with self._lock:
+            self._active.discard(job_id)
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._replace_executor(executor)
+        # Failures inside the job are recorded by the worker itself, this only
+        # catches crashed or cancelled workers
+        if future.cancelled():
+            update_job(self.jobs, job_id, status="failed", error="Job cancelled")
+        elif future.exception() is not None:
+            update_job(self.jobs, job_id, status="failed", error=str(future.exception()))
+        if self.on_job_done is not None:
+            self.on_job_done(job_id)
+
+    def _prune_history(self):
+        finished = [
+            job for job in self.jobs.values()
+            if job["status"] in FINISHED_STATUSES]
+        overflow = len(self.jobs) - self.max_history
+        for job in sorted(finished, key=lambda job: job["updated_at"])[:max(0, overflow)]:
+            del self.jobs[job["id"]]
+            self._params.pop(job["id"], None)
+
+    def get(self, job_id: str):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+        job["position"] = self.queue_position(job_id) if job["status"] == "queued" else None
+        return job
+
+    def queue_position(self, job_id: str):
+        queued = sorted(
+            (job for job in self.jobs.values() if job["status"] == "queued"),
+            key=lambda job: job["created_at"])
+        return next((i for i, job in enumerate(queued) if job["id"] == job_id), None)
+
+    def list(self):
+        return sorted(self.jobs.values(), key=lambda job: job["created_at"], reverse=True)
+
+    def collect_metrics(self, registry):
+        """Merge every worker's published metrics and model memory gauges into ``registry``."""
+        for snapshot in self.worker_metrics.values():
+            registry.merge(snapshot)
+        for pid, stats in self.worker_stats.items():
+            record_model_gauges(registry, pid, stats)
+        return registry
+
+    def stats(self):
+        with self._lock:
+            active = len(self._active)
+        return {
+            "max_workers": self.max_workers,
+            "max_queued": self.max_queued,
+            "active": active,
+            "workers": {str(pid): stats for pid, stats in self.worker_stats.items()}
+        }
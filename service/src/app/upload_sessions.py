@@ -0,0 +1,123 @@
+# src/app/upload_sessions.py
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+from fastapi.concurrency import run_in_threadpool
+from src.pipelines.handle_video_file import (
+    UPLOAD_CHUNK_SIZE, is_streamable, mark_complete, new_upload_id, video_extension, write_chunk)
+
+
+class UploadOffsetMismatch(Exception):
+    pass
+
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    filename: str
+    video_path: str
+    frames_per_second: float
+    size: int = None  # Announced total size, None when unknown
+    received: int = 0
+    complete: bool = False
+    job_id: str = None
+    updated_at: float = field(default_factory=time.time)
+    digest: object = field(default_factory=hashlib.sha256, repr=False)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    def status(self):
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "offset": self.received,
+            "size": self.size,
+            "complete": self.complete,
+            "job_id": self.job_id,
+            "status_url": f"/jobs/{self.job_id}" if self.job_id else None
+        }
+
+
+class UploadSessions:
+    """Resumable uploads, each written in order to its own file while hashing it.
+
+    Sessions live in the API process; an interrupted client asks for the
+    current offset and continues from there.
+    """
+
+    def __init__(self, upload_dir: str, ttl_seconds: float = None, early_start_bytes: int = None):
+        self.upload_dir = upload_dir
+        self.ttl_seconds = ttl_seconds or float(os.getenv("UPLOAD_SESSION_TTL", 24 * 3600))
+        # Start decoding once this much of a streamable container has arrived, 0 disables it
+        self.early_start_bytes = early_start_bytes if early_start_bytes is not None else int(
+            os.getenv("UPLOAD_EARLY_START_BYTES", 16 * 1024 * 1024))
+        self.sessions = {}
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def create(self, filename: str, frames_per_second: float, size: int = None) -> UploadSession:
+        self.expire()
+        upload_id = new_upload_id(filename)
+        video_path = os.path.join(self.upload_dir, upload_id + video_extension(filename))
+        open(video_path, "wb").close()
+        session = UploadSession(upload_id=upload_id, filename=filename, video_path=video_path,
+                                frames_per_second=frames_per_second, size=size)
+        self.sessions[upload_id] = session
+        return session
+
+    def get(self, upload_id: str):
+        return self.sessions.get(upload_id)
+
+    async def append(self, session: UploadSession, offset: int, chunks):
+        """Append an async iterable of bytes written at ``offset``."""
+        async with session.lock:
+            if session.complete:
+                raise UploadOffsetMismatch("Upload is already complete")
+            if offset != session.received:
+                raise UploadOffsetMismatch(f"Expected offset {session.received}, got {offset}")
+            # Request bodies arrive in small pieces, write them in large chunks
+            pending = bytearray()
+            with open(session.video_path, "ab") as buffer:
+                async for chunk in chunks:
+                    pending += chunk
+                    if len(pending) >= UPLOAD_CHUNK_SIZE:
+                        await self.write(session, buffer, bytes(pending))
+                        pending.clear()
+                if pending:
+                    await self.write(session, buffer, bytes(pending))
+            session.updated_at = time.time()
+            if session.size is not None and session.received > session.size:
+                raise UploadOffsetMismatch(f"Received {session.received} bytes, announced {session.size}")
+            return session.received
+
+    @staticmethod
+    async def write(session: UploadSession, buffer, data: bytes):
+        await run_in_threadpool(write_chunk, buffer, session.digest, data)
+        # Flushed so workers following the upload see every byte that is counted
+        await run_in_threadpool(buffer.flush)
+        session.received += len(data)
+
+    def can_start_early(self, session: UploadSession) -> bool:
+        return (self.early_start_bytes > 0 and session.job_id is None and not session.complete
+                and session.received >= self.early_start_bytes
+                and is_streamable(session.video_path))
+
+    async def finish(self, session: UploadSession):
+        async with session.lock:
+            if session.size is not None and session.received != session.size:
+                raise UploadOffsetMismatch(f"Received {session.received} of {session.size} bytes")
+            if not session.complete:
+                session.complete = True
+                # Tells workers following the upload that the file is final
+                mark_complete(session.video_path, session.digest.hexdigest(), session.received)
+            return session.digest.hexdigest()
+
+    def discard(self, session: UploadSession):
+        self.sessions.pop(session.upload_id, None)
+        if session.job_id is None and os.path.exists(session.video_path):
+            os.remove(session.video_path)
+
+    def expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        for session in [s for s in self.sessions.values() if s.updated_at < cutoff]:
+            self.discard(session)
@@ -1,32 +1,149 @@
 # src/pipelines/detect_objects_from_frames.py
 import os
 import json
+import logging
+import time
+import numpy as np
 import torch
 from PIL import Image
+from src.pipelines.metrics import log_sampler, metrics
+from src.pipelines.model_registry import model_registry, MODEL_VERSIONS
+from src.pipelines.result_cache import content_key, frame_hash
 
 
 class DetectObjectsFromFrames:
-    def __init__(self, frames_dir: str):
+    def __init__(self, frames_dir: str, model=None, batch_size=None,
+                 cache=None, skip_existing: bool = False):
         self.frames_dir = frames_dir
         self.output_dir = frames_dir
         os.makedirs(self.output_dir, exist_ok=True)
-        self.model = torch.hub.load(
-            'ultralytics/yolov5',
-            'yolov5s',
-            pretrained=True)  # Load YOLOv5 model
+        # YOLOv5 model, shared through the registry unless injected
+        self.model = model if model is not None else model_registry.get(
+            "yolov5")
+        # A batch size of 1 keeps the per-frame pandas path
+        self.batch_size = max(1, int(
+            batch_size or os.getenv("DETECTION_BATCH_SIZE", 16)))
+        self.frames_per_second = None
+        # Optional ResultCache keyed by frame hash and model version
+        self.cache = cache if cache is not None and cache.enabled else None
+        # Resuming an upload keeps the detection files a previous attempt saved
+        self.skip_existing = skip_existing
 
-    def detect_objects(self):
-        frames = [
+    def list_frames(self):
+        return [
             f for f in os.listdir(
                 self.frames_dir) if f.endswith('.jpg') or f.endswith('.png')]
-        for frame in frames:
-            detections = self.process_frame(frame)
-            self.save_detections(frame, detections)
+
+    def detections_path(self, frame: str) -> str:
+        return os.path.join(
+            self.output_dir,
+            f"{os.path.splitext(frame)[0]}_detections.json")
+
+    def pending_frames(self):
+        frames = self.list_frames()
+        if not self.skip_existing:
+            return frames
+        pending = [
+            frame for frame in frames
+            if not os.path.exists(self.detections_path(frame))]
+        if len(pending) < len(frames):
+            logging.info(
+                f"Resuming detections, {len(frames) - len(pending)} of "
+                f"{len(frames)} frames already saved")
+        return pending
+
+    def detect_objects(self):
+        frames = self.pending_frames()
+        start = time.perf_counter()
+        if self.batch_size > 1:
+            self.detect_objects_batched(frames)
+        else:
+            for frame in frames:
+                detections = self.process_frame(frame)
+                self.save_detections(frame, detections)
+        self.report_throughput(len(frames), time.perf_counter() - start)
+        return self.frames_per_second
+
+    def detect_objects_batched(self, frames: list):
+        for i in range(0, len(frames), self.batch_size):
+            batch = frames[i:i + self.batch_size]
+            images = [
+                Image.open(os.path.join(self.frames_dir, frame)).convert("RGB")
+                for frame in batch]
+            for frame, detections in zip(batch, self.process_batch(images)):
+                self.save_detections(frame, self.to_records(detections))
+
+    def process_batch(self, images: list):
+        if self.cache is None:
+            return self.run_model(images)
+
+        keys = [content_key(MODEL_VERSIONS["yolov5"], frame_hash(image)) for image in images]
+        results = [self.cache.get_arrays("detections", key) for key in keys]
+        # Only the frames the cache has never seen go through the model
+        misses = [i for i, detections in enumerate(results) if detections is None]
+        metrics.inc("qyv_cache_hits_total", len(keys) - len(misses), stage="detections")
+        if misses:
+            computed = self.run_model([images[i] for i in misses])
+            for i, detections in zip(misses, computed):
+                results[i] = detections
+                self.cache.put_arrays("detections", keys[i], **detections)
+        return results
+
+    def run_model(self, images: list):
+        start = time.perf_counter()
+        with torch.inference_mode():
+            results = self.model(images)  # One call for the whole batch
+        self.record_items(len(images), time.perf_counter() - start)
+        # Each xyxy tensor holds one row per box: x1, y1, x2, y2, conf, class
+        return [self.to_arrays(xyxy) for xyxy in results.xyxy]
+
+    @staticmethod
+    def record_items(count: int, seconds: float):
+        if count:
+            metrics.observe("qyv_item_seconds", seconds / count, count=count, stage="detections")
+            metrics.inc("qyv_items_total", count, stage="detections")
+
+    @staticmethod
+    def to_arrays(xyxy):
+        xyxy = xyxy.detach().cpu().numpy()
+        return {
+            "boxes": xyxy[:, :4].astype(np.float32),
+            "confidences": xyxy[:, 4].astype(np.float32),
+            "class_ids": xyxy[:, 5].astype(np.int32)
+        }
+
+    def to_records(self, detections: dict):
+        # Same record layout as results.pandas().xyxy for the saved JSON
+        names = self.model.names
+        return [
+            {
+                "xmin": float(box[0]),
+                "ymin": float(box[1]),
+                "xmax": float(box[2]),
+                "ymax": float(box[3]),
+                "confidence": float(confidence),
+                "class": int(class_id),
+                "name": names[int(class_id)]
+            }
+            for box, confidence, class_id in zip(
+                detections["boxes"],
+                detections["confidences"],
+                detections["class_ids"])]
+
+    def report_throughput(self, frame_count: int, elapsed: float):
+        self.frames_per_second = frame_count / elapsed if elapsed > 0 else 0.0
+        mode = "batched" if self.batch_size > 1 else "per-frame"
+        logging.info(
+            f"Detected objects in {frame_count} frames in {elapsed:.2f} seconds "
+            f"({self.frames_per_second:.2f} fps, {mode}, "
+            f"batch size {self.batch_size})")
 
     def process_frame(self, frame: str):
         frame_path = os.path.join(self.frames_dir, frame)
         image = Image.open(frame_path).convert("RGB")
+        start = time.perf_counter()
         results = self.model(image)  # Perform object detection
+        self.record_items(1, time.perf_counter() - start)
         detections = results.pandas().xyxy[0].to_dict(
             orient="records")  # Convert detections to list of dictionaries
         return detections
@@ -37,14 +154,14 @@ class DetectObjectsFromFrames:
             "detections": detections
         }
 
-        # Save detections to JSON file
-        json_path = os.path.join(
-            self.output_dir,
-            f"{os.path.splitext(frame)[0]}_detections.json")
-        with open(json_path, 'w') as json_file:
+        # Save detections to JSON file, renamed into place so an
+        # interrupted run never leaves half a file
+        json_path = self.detections_path(frame)
+        with open(f"{json_path}.tmp", 'w') as json_file:
             json.dump(detection_data, json_file, indent=4)
+        os.replace(f"{json_path}.tmp", json_path)
 
-        print(f"Processed and saved detections for {frame}")
+        log_sampler.log(logging.getLogger(), "detections", "Processed and saved detections for %s", frame)
 
 
 # Example usage
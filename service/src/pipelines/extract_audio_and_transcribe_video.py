@@ -1,21 +1,72 @@
+import io
 import os
 import json
 import numpy as np
 import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from moviepy.editor import VideoFileClip
 import speech_recognition as sr
 from pydub import AudioSegment
-from pydub.silence import split_on_silence
+from pydub.silence import detect_nonsilent
 import librosa
+from src.pipelines.handle_video_file import wait_for_upload
+from src.pipelines.metrics import log_sampler, metrics
+from src.pipelines.result_cache import content_key, result_cache
+from src.pipelines.speech_recognizers import get_speech_recognizer
+from src.pipelines.stream_audio_chunks import StreamAudioChunks
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# "chunked" re-reads every exported chunk, "vectorized" computes features once per track
+AUDIO_CLASSIFIER = os.getenv("AUDIO_CLASSIFIER", "chunked").lower()
+# Logging every feature of every chunk is costly, only do it when asked
+AUDIO_FEATURE_LOGGING = os.getenv("AUDIO_FEATURE_LOGGING", "false").lower() == "true"
+CLASSIFIER_SAMPLE_RATE = 16000
+CLASSIFIER_N_FFT = 512
+CLASSIFIER_HOP = CLASSIFIER_N_FFT // 2
+
+# "file" writes audio.wav through MoviePy, "streaming" decodes PCM windows from ffmpeg
+AUDIO_EXTRACTION = os.getenv("AUDIO_EXTRACTION", "file").lower()
+
+# Part of the transcript cache key, bump when chunking or recognition changes
+# The speech backend's version is added per transcript
+TRANSCRIBER_VERSION = (f"rms-gate:{AUDIO_EXTRACTION}" if AUDIO_EXTRACTION == "streaming"
+                       else f"pydub-silence:{AUDIO_CLASSIFIER}:offsets")
+
+
+def classify_features(zcr, spectral_centroid, spectral_contrast, tonnetz, chroma, rms):
+    """Threshold test shared by both classifiers, works on scalars and arrays."""
+    silence = (zcr < 0.03) & (spectral_centroid < 1500) & (spectral_contrast < 20) & (tonnetz < 0.1) & (rms < 0.01)
+    music = (zcr > 0.1) & (spectral_centroid > 2000) & (chroma > 0.4)
+    return np.where(silence, "Silence", np.where(music, "Music", "Speech"))
+
+
+def silence_split_ranges(audio, min_silence_len=500, silence_thresh=-16, keep_silence=500):
+    """(start_ms, end_ms) of the chunks pydub's split_on_silence would return."""
+    ranges = [[start - keep_silence, end + keep_silence]
+              for start, end in detect_nonsilent(audio, min_silence_len, silence_thresh)]
+    for current, following in zip(ranges, ranges[1:]):
+        # Overlapping padding is split halfway between the two chunks
+        if following[0] < current[1]:
+            current[1] = (current[1] + following[0]) // 2
+            following[0] = current[1]
+    return [(max(start, 0), min(end, len(audio))) for start, end in ranges]
+
+
 class ExtractAudioAndTranscribeVideo:
-    def __init__(self, video_path: str, output_dir: str):
+    def __init__(self, video_path: str, output_dir: str, classifier: str = None,
+                 log_features: bool = None, speech_recognizer=None):
         self.video_path = video_path
         self.output_dir = output_dir
+        self.classifier = classifier or AUDIO_CLASSIFIER
+        self.log_features = AUDIO_FEATURE_LOGGING if log_features is None else log_features
+        self.decode_seconds = 0.0
+        # Google by default, SPEECH_BACKEND selects a local engine for offline nodes
+        self.speech_recognizer = speech_recognizer or get_speech_recognizer()
         os.makedirs(self.output_dir, exist_ok=True)
         self.audio_path = os.path.join(self.output_dir, "audio.wav")
 
@@ -41,104 +92,260 @@ class ExtractAudioAndTranscribeVideo:
         mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13), axis=1)
         rms = np.mean(librosa.feature.rms(y=y))
 
-        logger.info(f"Features for chunk {audio_chunk_path} - ZCR: {zcr}, Spectral Centroid: {spectral_centroid}, Spectral Contrast: {spectral_contrast}, Tonnetz: {tonnetz}, Chroma: {chroma}, MFCC: {mfcc}, RMS: {rms}")
+        if self.log_features:
+            logger.info(f"Features for chunk {audio_chunk_path} - ZCR: {zcr}, Spectral Centroid: {spectral_centroid}, Spectral Contrast: {spectral_contrast}, Tonnetz: {tonnetz}, Chroma: {chroma}, MFCC: {mfcc}, RMS: {rms}")
 
         # Adjusted thresholds for classification
-        if zcr < 0.03 and spectral_centroid < 1500 and spectral_contrast < 20 and tonnetz < 0.1 and rms < 0.01:
-            classification = "Silence"
-        elif zcr > 0.1 and spectral_centroid > 2000 and chroma > 0.4:
-            classification = "Music"
-        else:
-            classification = "Speech"
-
-        logger.info(f"Classification for chunk {audio_chunk_path}: {classification}")
+        classification = str(classify_features(zcr, spectral_centroid, spectral_contrast, tonnetz, chroma, rms))
+
+        log_sampler.log(logger, "classification", "Classification for chunk %s: %s",
+                        audio_chunk_path, classification)
         return classification
 
+    def track_features(self):
+        """Frame-level features of the whole track, computed in one pass."""
+        y, sr = librosa.load(self.audio_path, sr=CLASSIFIER_SAMPLE_RATE)
+        options = {"n_fft": CLASSIFIER_N_FFT, "hop_length": CLASSIFIER_HOP}
+        chroma = librosa.feature.chroma_stft(y=y, sr=sr, **options)
+        features = {
+            "zcr": librosa.feature.zero_crossing_rate(y, frame_length=CLASSIFIER_N_FFT, hop_length=CLASSIFIER_HOP)[0],
+            "spectral_centroid": librosa.feature.spectral_centroid(y=y, sr=sr, **options)[0],
+            "spectral_contrast": librosa.feature.spectral_contrast(y=y, sr=sr, **options).mean(axis=0),
+            # Derived from the STFT chroma instead of running a full CQT
+            "tonnetz": librosa.feature.tonnetz(sr=sr, chroma=chroma).mean(axis=0),
+            "chroma": chroma.mean(axis=0),
+            "rms": librosa.feature.rms(y=y, frame_length=CLASSIFIER_N_FFT, hop_length=CLASSIFIER_HOP)[0]
+        }
+        if self.log_features:
+            features["mfcc"] = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13, **options)
+        return features
+
+    def classify_ranges(self, ranges: list):
+        """Classify every (start_ms, end_ms) chunk by averaging the track features."""
+        if not ranges:
+            return []
+        features = self.track_features()
+        frames = len(features["zcr"])
+        bounds = np.asarray(ranges, dtype=np.int64) * CLASSIFIER_SAMPLE_RATE // 1000 // CLASSIFIER_HOP
+        starts = np.clip(bounds[:, 0], 0, frames - 1)
+        ends = np.clip(bounds[:, 1], starts + 1, frames)
+
+        means = {}
+        for name, values in features.items():
+            # Prefix sums turn every chunk mean into a single subtraction
+            totals = np.concatenate([np.zeros(values.shape[:-1] + (1,)), np.cumsum(values, axis=-1)], axis=-1)
+            means[name] = (totals[..., ends] - totals[..., starts]) / (ends - starts)
+
+        classifications = classify_features(
+            means["zcr"], means["spectral_centroid"], means["spectral_contrast"],
+            means["tonnetz"], means["chroma"], means["rms"]).tolist()
+        if self.log_features:
+            for i, (start, end) in enumerate(ranges):
+                logger.info(
+                    f"Features for chunk {i} ({start}-{end} ms) - "
+                    + ", ".join(f"{name}: {means[name][..., i]}" for name in means))
+        return classifications
+
     def transcribe_audio(self):
-        recognizer = sr.Recognizer()
         try:
             audio = AudioSegment.from_wav(self.audio_path)
-            chunks = split_on_silence(audio, min_silence_len=500, silence_thresh=audio.dBFS-14, keep_silence=500)
+            ranges = silence_split_ranges(audio, min_silence_len=500, silence_thresh=audio.dBFS-14, keep_silence=500)
 
-            if len(chunks) == 0:
+            if len(ranges) == 0:
                 raise Exception("No transcribable audio found")
 
-            transcript = []
-            current_time = 0  # Initialize current time tracker
-
-            for i, chunk in enumerate(chunks):
-                chunk_silent = AudioSegment.silent(duration=10)
-                audio_chunk = chunk_silent + chunk + chunk_silent
-                chunk_path = os.path.join(self.output_dir, f"chunk{i}.wav")
-                audio_chunk.export(chunk_path, format="wav")
+            transcript = self.transcribe_chunks(self.file_chunks(audio, ranges))
+            self.save_transcript(transcript)
+            return transcript
+        except Exception as e:
+            raise Exception(f"Error transcribing audio: {str(e)}")
 
-                # Get the duration of the current chunk
-                chunk_duration = len(chunk) / 1000.0  # Convert to seconds
+    def file_chunks(self, audio, ranges: list):
+        """Yield (name, start, end, classification, audio data) for the chunks of audio.wav."""
+        reader = sr.Recognizer()
+        vectorized = self.classifier == "vectorized"
+        classifications = self.classify_ranges(ranges) if vectorized else None
+        for i, (start, end) in enumerate(ranges):
+            chunk_silent = AudioSegment.silent(duration=10)
+            audio_chunk = chunk_silent + audio[start:end] + chunk_silent
+            chunk_path = os.path.join(self.output_dir, f"chunk{i}.wav")
 
-                # Classify the audio chunk
+            # Classify the audio chunk
+            if vectorized:
+                classification = classifications[i]
+                # Only speech is handed to the recognizer, and it reads from memory
+                chunk_file = io.BytesIO()
+                if classification == "Speech":
+                    audio_chunk.export(chunk_file, format="wav")
+                    chunk_file.seek(0)
+            else:
+                audio_chunk.export(chunk_path, format="wav")
+                chunk_file = chunk_path
                 classification = self.classify_audio(chunk_path)
 
-                if classification == "Speech":
-                    with sr.AudioFile(chunk_path) as source:
-                        audio_listened = recognizer.record(source)
-                        try:
-                            text = recognizer.recognize_google(audio_listened)
-                            timestamp = {
-                                "start": current_time,
-                                "end": current_time + chunk_duration,
-                                "text": text,
-                                "classification": classification
-                            }
-                            logger.info(f"Transcription for chunk {chunk_path}: {text}")
-                            transcript.append(timestamp)
-
-                            # Save individual chunk transcript as JSON
-                            chunk_json_path = os.path.join(self.output_dir, f"chunk{i}.json")
-                            with open(chunk_json_path, 'w') as json_file:
-                                json.dump(timestamp, json_file, indent=4)
-
-                        except sr.UnknownValueError:
-                            error_info = {
-                                "start": current_time,
-                                "end": current_time + chunk_duration,
-                                "text": "",
-                                "error": "Could not understand audio",
-                                "classification": classification
-                            }
-                            logger.info(f"Error for chunk {chunk_path}: Could not understand audio")
-                            transcript.append(error_info)
-
-                            # Save individual chunk error as JSON
-                            chunk_json_path = os.path.join(self.output_dir, f"chunk{i}.json")
-                            with open(chunk_json_path, 'w') as json_file:
-                                json.dump(error_info, json_file, indent=4)
-                else:
-                    logger.info(f"Skipping transcription for chunk {chunk_path} classified as {classification}")
-                    non_speech_info = {
-                        "start": current_time,
-                        "end": current_time + chunk_duration,
-                        "text": "",
-                        "classification": classification
-                    }
-                    transcript.append(non_speech_info)
-
-                    # Save non-speech chunk info as JSON
-                    chunk_json_path = os.path.join(self.output_dir, f"chunk{i}.json")
-                    with open(chunk_json_path, 'w') as json_file:
-                        json.dump(non_speech_info, json_file, indent=4)
-
-                # Update current time tracker
-                current_time += chunk_duration
-
-            # Save the entire transcript as a single JSON
-            transcript_json_path = os.path.join(self.output_dir, "transcript.json")
-            with open(transcript_json_path, 'w') as json_file:
-                json.dump(transcript, json_file, indent=4)
+            audio_listened = None
+            if classification == "Speech":
+                with sr.AudioFile(chunk_file) as source:
+                    audio_listened = reader.record(source)
+            # Timestamps are the chunk's offsets in the track, removed silence included
+            yield chunk_path, start / 1000.0, end / 1000.0, classification, audio_listened
 
+    def transcribe_stream(self, stream=None):
+        """Transcribe chunks decoded straight from the video, nothing is written but JSON."""
+        stream = stream or StreamAudioChunks(self.video_path)
+        try:
+            transcript = self.transcribe_chunks(self.stream_chunks(stream))
+            if stream.samples_read == 0:
+                raise Exception("No audio track found in the video")
+            if len(transcript) == 0:
+                raise Exception("No transcribable audio found")
+            self.decode_seconds = stream.decode_seconds
+            self.save_transcript(transcript)
             return transcript
         except Exception as e:
             raise Exception(f"Error transcribing audio: {str(e)}")
 
+    def stream_chunks(self, stream):
+        for i, chunk in enumerate(stream):
+            chunk_name = f"chunk{i} ({chunk.start:.2f}-{chunk.end:.2f}s)"
+            classification = self.classify_samples(chunk.samples, chunk_name)
+            audio_data = None
+            if classification == "Speech":
+                # Same 10 ms of padding the file-based path adds around each chunk
+                padding = np.zeros(stream.sample_rate // 100, dtype=np.int16)
+                pcm = np.concatenate([padding, chunk.samples, padding])
+                audio_data = sr.AudioData(pcm.tobytes(), stream.sample_rate, 2)
+            yield chunk_name, chunk.start, chunk.end, classification, audio_data
+
+    def transcribe_chunks(self, chunks):
+        """Recognize chunks on a bounded pool, recording results in chunk order.
+
+        Chunks are classified and prepared on this thread while earlier ones are
+        being recognized; at most twice the concurrency limit are held at once.
+        """
+        concurrency = max(1, self.speech_recognizer.max_concurrency)
+        transcript = []
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="speech") as executor:
+            try:
+                for chunk in chunks:
+                    pending.append(executor.submit(self.recognize, *chunk))
+                    while len(pending) > 2 * concurrency:
+                        self.record_chunk(transcript, len(transcript), pending.popleft().result())
+                while pending:
+                    self.record_chunk(transcript, len(transcript), pending.popleft().result())
+            except Exception:
+                for future in pending:
+                    future.cancel()
+                raise
+        return transcript
+
+    def classify_samples(self, samples, chunk_name: str):
+        """Classify an in-memory int16 chunk with the vectorized feature pass."""
+        y = librosa.util.buf_to_float(samples, n_bytes=2)
+        options = {"n_fft": CLASSIFIER_N_FFT, "hop_length": CLASSIFIER_HOP}
+        chroma = librosa.feature.chroma_stft(y=y, sr=CLASSIFIER_SAMPLE_RATE, **options)
+        features = {
+            "zcr": np.mean(librosa.feature.zero_crossing_rate(y, frame_length=CLASSIFIER_N_FFT, hop_length=CLASSIFIER_HOP)),
+            "spectral_centroid": np.mean(librosa.feature.spectral_centroid(y=y, sr=CLASSIFIER_SAMPLE_RATE, **options)),
+            "spectral_contrast": np.mean(librosa.feature.spectral_contrast(y=y, sr=CLASSIFIER_SAMPLE_RATE, **options)),
+            "tonnetz": np.mean(librosa.feature.tonnetz(sr=CLASSIFIER_SAMPLE_RATE, chroma=chroma)),
+            "chroma": np.mean(chroma),
+            "rms": np.mean(librosa.feature.rms(y=y, frame_length=CLASSIFIER_N_FFT, hop_length=CLASSIFIER_HOP))
+        }
+        if self.log_features:
+            logger.info(f"Features for {chunk_name} - " + ", ".join(f"{name}: {value}" for name, value in features.items()))
+        classification = str(classify_features(**features))
+        log_sampler.log(logger, "classification", "Classification for %s: %s", chunk_name, classification)
+        return classification
+
+    def recognize(self, chunk_name: str, start: float, end: float, classification: str,
+                  audio_data):
+        if classification != "Speech":
+            log_sampler.log(logger, "skipped", "Skipping transcription for chunk %s classified as %s",
+                            chunk_name, classification)
+            return {"start": start, "end": end, "text": "", "classification": classification}
+        start_time = time.perf_counter()
+        try:
+            text = self.speech_recognizer.transcribe(audio_data)
+            metrics.observe("qyv_item_seconds", time.perf_counter() - start_time, stage="recognition")
+            log_sampler.log(logger, "transcription", "Transcription for chunk %s: %s", chunk_name, text)
+            return {"start": start, "end": end, "text": text, "classification": classification}
+        except sr.UnknownValueError:
+            metrics.observe("qyv_item_seconds", time.perf_counter() - start_time, stage="recognition")
+            log_sampler.log(logger, "unintelligible", "Error for chunk %s: Could not understand audio", chunk_name)
+            return {
+                "start": start,
+                "end": end,
+                "text": "",
+                "error": "Could not understand audio",
+                "classification": classification
+            }
+
+    def record_chunk(self, transcript: list, i: int, record: dict):
+        transcript.append(record)
+        metrics.inc("qyv_audio_chunks_total", classification=record["classification"])
+        # Save individual chunk result as JSON
+        chunk_json_path = os.path.join(self.output_dir, f"chunk{i}.json")
+        with open(chunk_json_path, 'w') as json_file:
+            json.dump(record, json_file, indent=4)
+
+    def save_transcript(self, transcript: list):
+        save_transcript(self.output_dir, transcript)
+
     def process(self):
         self.extract_audio()
         return self.transcribe_audio()
+
+
+def save_transcript(output_dir: str, transcript: list):
+    # Save the entire transcript as a single JSON, the transcript search reads it
+    os.makedirs(output_dir, exist_ok=True)
+    transcript_json_path = os.path.join(output_dir, "transcript.json")
+    with open(transcript_json_path, 'w') as json_file:
+        json.dump(transcript, json_file, indent=4)
+
+
+def transcribe_video(video_path: str, output_dir: str, video_hash: str = None,
+                     upload_pending: bool = False):
+    # Module-level entry point so the audio branch can run in a worker process;
+    # that process's metrics travel back with the result
+    transcript, timings = run_transcription(video_path, output_dir, video_hash, upload_pending)
+    return transcript, timings, metrics.drain()
+
+
+def run_transcription(video_path: str, output_dir: str, video_hash: str = None,
+                      upload_pending: bool = False):
+    if upload_pending:
+        # The soundtrack is read in one go, so wait for the rest of the upload
+        video_hash = wait_for_upload(video_path)["content_hash"]
+    speech_recognizer = get_speech_recognizer()
+    cache_key = content_key(TRANSCRIBER_VERSION, speech_recognizer.version, video_hash) if video_hash else None
+    if cache_key is not None:
+        transcript = result_cache.get_json("transcripts", cache_key)
+        if transcript is not None:
+            logger.info(f"Reusing cached transcript for video {video_hash}")
+            save_transcript(output_dir, transcript)
+            return transcript, {"audio_extraction": 0.0, "transcription": 0.0}
+
+    transcriber = ExtractAudioAndTranscribeVideo(video_path, output_dir, speech_recognizer=speech_recognizer)
+    start = time.perf_counter()
+    if AUDIO_EXTRACTION == "streaming":
+        transcript = transcriber.transcribe_stream()
+        if cache_key is not None:
+            result_cache.put_json("transcripts", cache_key, transcript)
+        # Decoding overlaps with recognition, only the time spent reading PCM counts as extraction
+        total = time.perf_counter() - start
+        return transcript, {
+            "audio_extraction": transcriber.decode_seconds,
+            "transcription": total - transcriber.decode_seconds
+        }
+    transcriber.extract_audio()
+    extracted = time.perf_counter()
+    transcript = transcriber.transcribe_audio()
+    if cache_key is not None:
+        result_cache.put_json("transcripts", cache_key, transcript)
+    return transcript, {
+        "audio_extraction": extracted - start,
+        "transcription": time.perf_counter() - extracted
+    }
@@ -1,36 +1,174 @@
 import os
 import json
+import logging
+import time
+import numpy as np
 import torch
+from torch.utils.data import DataLoader, Dataset
 from torchvision import transforms
 from PIL import Image
-from transformers import SwinForImageClassification
+from src.pipelines.feature_space import swin_output_field
+from src.pipelines.metrics import log_sampler, metrics
+from src.pipelines.model_registry import model_registry, available_memory_bytes, MODEL_VERSIONS
+from src.pipelines.result_cache import content_key, frame_hash
+
+# Rough peak activation memory of one 224x224 Swin-base sample at inference
+BYTES_PER_SAMPLE = 64 * 1024 * 1024
+MAX_BATCH_SIZE = 64
+
+
+class FrameDataset(Dataset):
+    def __init__(self, frames_dir: str, frames: list, transform,
+                 with_hash: bool = False):
+        self.frames_dir = frames_dir
+        self.frames = frames
+        self.transform = transform
+        self.with_hash = with_hash
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        frame = self.frames[index]
+        image = Image.open(os.path.join(self.frames_dir, frame)).convert("RGB")
+        key = frame_hash(image) if self.with_hash else ""
+        return self.transform(image), frame, key
+
 
 class ExtractFeaturesFromFrames:
-    def __init__(self, frames_dir: str):
+    def __init__(self, frames_dir: str, model=None, batch_size=None,
+                 num_workers=None, cache=None, skip_existing: bool = False):
         self.frames_dir = frames_dir
         self.output_dir = frames_dir
         os.makedirs(self.output_dir, exist_ok=True)
-        self.model = SwinForImageClassification.from_pretrained("microsoft/swin-base-patch4-window7-224")
+        # Models are resident in the registry, only load when none is injected
+        self.model = model if model is not None else model_registry.get("swin")
         self.transform = transforms.Compose([
             transforms.Resize((224, 224)),
             transforms.ToTensor(),
             transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
+        # "auto" sizes batches from available memory, 1 keeps the per-frame path
+        self.batch_size = batch_size or os.getenv("FEATURE_BATCH_SIZE", "auto")
+        self.num_workers = num_workers if num_workers is not None else int(
+            os.getenv("FEATURE_NUM_WORKERS", min(4, os.cpu_count() or 1)))
+        # Optional ResultCache keyed by frame hash and model version
+        self.cache = cache if cache is not None and cache.enabled else None
+        # Class logits or the pooled embedding, see FEATURE_MODE
+        self.output_field = swin_output_field()
+        # Resuming an upload keeps the feature files a previous attempt saved
+        self.skip_existing = skip_existing
+
+    @property
+    def device(self):
+        try:
+            return next(self.model.parameters()).device
+        except (AttributeError, StopIteration):
+            return torch.device("cpu")
+
+    def resolve_batch_size(self):
+        if self.batch_size != "auto":
+            return max(1, int(self.batch_size))
+        available = available_memory_bytes(self.device)
+        if available is None:
+            return 1
+        # Only budget half of what is free, other stages share the host
+        return max(1, min(MAX_BATCH_SIZE, available // 2 // BYTES_PER_SAMPLE))
+
+    def list_frames(self):
+        return [f for f in os.listdir(self.frames_dir) if f.endswith('.jpg') or f.endswith('.png')]
+
+    def features_path(self, frame: str) -> str:
+        return os.path.join(self.output_dir, f"{os.path.splitext(frame)[0]}_features.json")
+
+    def pending_frames(self):
+        frames = self.list_frames()
+        if not self.skip_existing:
+            return frames
+        pending = [frame for frame in frames if not os.path.exists(self.features_path(frame))]
+        if len(pending) < len(frames):
+            logging.info(f"Resuming features, {len(frames) - len(pending)} of {len(frames)} frames already saved")
+        return pending
 
     def extract_features(self):
-        frames = [f for f in os.listdir(self.frames_dir) if f.endswith('.jpg') or f.endswith('.png')]
+        frames = self.pending_frames()
+        batch_size = self.resolve_batch_size()
+        if batch_size > 1:
+            return self.extract_features_batched(frames, batch_size)
         for frame in frames:
             features = self.process_frame(frame)
             self.save_features(frame, features)
 
+    def extract_features_batched(self, frames: list, batch_size: int):
+        logging.info(
+            f"Extracting features for {len(frames)} frames with batch size "
+            f"{batch_size} and {self.num_workers} preprocessing workers")
+        # Workers decode and resize the next batches while the model runs
+        loader = DataLoader(
+            FrameDataset(self.frames_dir, frames, self.transform,
+                         with_hash=self.cache is not None),
+            batch_size=batch_size,
+            num_workers=self.num_workers,
+            pin_memory=self.device.type == "cuda")
+        for inputs, batch_frames, keys in loader:
+            for frame, features in zip(batch_frames, self.process_cached_batch(inputs, keys)):
+                self.save_features(frame, features)
+
+    def process_batch(self, images: list):
+        images = [image.convert("RGB") for image in images]
+        keys = [frame_hash(image) for image in images] if self.cache is not None else None
+        inputs = torch.stack([self.transform(image) for image in images])
+        return self.process_cached_batch(inputs, keys)
+
+    def cache_key(self, key: str) -> str:
+        return content_key(MODEL_VERSIONS["swin"], key)
+
+    def process_cached_batch(self, inputs, keys=None):
+        if self.cache is None or keys is None:
+            return self.process_tensor_batch(inputs)
+
+        results = []
+        for key in keys:
+            cached = self.cache.get_arrays("features", self.cache_key(key))
+            results.append(cached["features"].tolist() if cached is not None else None)
+
+        # Only the frames the cache has never seen go through the model
+        misses = [i for i, features in enumerate(results) if features is None]
+        metrics.inc("qyv_cache_hits_total", len(keys) - len(misses), stage="features")
+        if misses:
+            computed = self.process_tensor_batch(inputs[misses])
+            for i, features in zip(misses, computed):
+                results[i] = features
+                self.cache.put_arrays("features", self.cache_key(keys[i]),
+                                      features=np.asarray(features, dtype=np.float32))
+        return results
+
+    def process_tensor_batch(self, inputs):
+        start = time.perf_counter()
+        with torch.inference_mode():
+            outputs = self.model(inputs.to(self.device, non_blocking=True))
+            features = getattr(outputs, self.output_field).cpu().tolist()  # One feature list per frame
+        self.record_items(len(features), time.perf_counter() - start)
+        return features
+
+    @staticmethod
+    def record_items(count: int, seconds: float):
+        if count:
+            metrics.observe("qyv_item_seconds", seconds / count, count=count, stage="features")
+            metrics.inc("qyv_items_total", count, stage="features")
+
     def process_frame(self, frame: str):
         frame_path = os.path.join(self.frames_dir, frame)
         image = Image.open(frame_path).convert("RGB")
+        if self.cache is not None:
+            return self.process_batch([image])[0]
         inputs = self.transform(image).unsqueeze(0)  # Add batch dimension
 
+        start = time.perf_counter()
         with torch.no_grad():
             outputs = self.model(inputs)
-            features = outputs.logits.squeeze().tolist()  # Convert tensor to list
+            features = getattr(outputs, self.output_field).squeeze().tolist()  # Convert tensor to list
+        self.record_items(1, time.perf_counter() - start)
 
         return features
 
@@ -40,12 +178,13 @@ class ExtractFeaturesFromFrames:
             "features": features
         }
 
-        # Save features to JSON file
-        json_path = os.path.join(self.output_dir, f"{os.path.splitext(frame)[0]}_features.json")
-        with open(json_path, 'w') as json_file:
+        # Save features to JSON file, renamed into place so an interrupted run never leaves half a file
+        json_path = self.features_path(frame)
+        with open(f"{json_path}.tmp", 'w') as json_file:
             json.dump(feature_data, json_file, indent=4)
+        os.replace(f"{json_path}.tmp", json_path)
 
-        print(f"Processed and saved features for {frame}")
+        log_sampler.log(logging.getLogger(), "features", "Processed and saved features for %s", frame)
 
 # Example usage
 if __name__ == "__main__":
@@ -1,60 +1,243 @@
 import cv2
 import os
+import json
 import logging
 import time
+from src.pipelines.metrics import log_sampler, metrics
+
+SAMPLING_STRATEGIES = ("auto", "read", "grab", "seek")
+# Seeking only pays off when the gap between samples spans whole GOPs
+SEEK_MIN_GAP_SECONDS = 2.0
+# How often a partially uploaded video is reopened to look for new frames
+FOLLOW_POLL_SECONDS = 1.0
+FRAME_RANGES_FILE = "frame_ranges.json"
+# Assumed when the container doesn't report a frame rate (some WebM and raw streams)
+FALLBACK_VIDEO_FPS = 30.0
+
+
+def capture_fps(cap) -> float:
+    video_fps = cap.get(cv2.CAP_PROP_FPS)
+    if not video_fps or video_fps <= 0:
+        logging.warning(f"Video reports no frame rate, assuming {FALLBACK_VIDEO_FPS} fps")
+        return FALLBACK_VIDEO_FPS
+    return video_fps
 
 
 class ExtractFramesFromVideo:
-    def __init__(self, video_path: str, output_dir: str, fps: int):
+    def __init__(self, video_path: str, output_dir: str, fps: float,
+                 strategy: str = None, hw_acceleration: bool = None,
+                 frame_filter=None, upload_complete=None):
         self.video_path = video_path
         self.output_dir = output_dir
         self.fps = fps
+        self.strategy = (strategy or os.getenv("FRAME_SAMPLING", "auto")).lower()
+        if self.strategy not in SAMPLING_STRATEGIES:
+            raise ValueError(f"Unknown frame sampling strategy: {self.strategy}")
+        self.hw_acceleration = hw_acceleration if hw_acceleration is not None else os.getenv(
+            "FRAME_HW_ACCELERATION", "false").lower() == "true"
+        # Optional FilterRedundantFrames dropping near-duplicates before inference
+        self.frame_filter = frame_filter
+        # Frame name -> time range (seconds) the frame represents
+        self.frame_ranges = {}
+        # Set while the video is still being uploaded, returns True once it is complete
+        self.upload_complete = upload_complete
         os.makedirs(output_dir, exist_ok=True)
         logging.basicConfig(level=logging.INFO)
 
-    def extract_frames(self):
-        # Open the video file with OpenCV
-        cap = cv2.VideoCapture(self.video_path)
+    def open_capture(self):
+        # Open the video file with OpenCV, asking FFmpeg for a hardware decoder if enabled
+        if self.hw_acceleration and hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+            cap = cv2.VideoCapture(self.video_path, cv2.CAP_FFMPEG, [
+                cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        else:
+            cap = cv2.VideoCapture(self.video_path)
         if not cap.isOpened():
             raise Exception("Could not open video file")
 
         # Get video properties
-        video_fps = cap.get(cv2.CAP_PROP_FPS)
+        video_fps = capture_fps(cap)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         duration = total_frames / video_fps
         logging.info(f"Video FPS: {video_fps}, Total frames: {total_frames}, Duration: {duration:.2f} seconds")
+        return cap, video_fps
+
+    def resolve_strategy(self, video_fps: float) -> str:
+        if self.strategy != "auto":
+            return self.strategy
+        return "seek" if 1 / self.fps >= SEEK_MIN_GAP_SECONDS else "grab"
+
+    def target_frame_numbers(self, video_fps: float, after: int = -1):
+        # Round each sample time k / fps to its nearest frame instead of
+        # truncating the interval, so fractional rates don't drift
+        previous = -1
+        k = 0
+        while True:
+            frame_number = int(round(k * video_fps / self.fps))
+            if frame_number > previous:
+                if frame_number > after:
+                    yield frame_number
+                previous = frame_number
+            k += 1
 
-        # Calculate the interval for frame extraction
+    def iter_frames(self):
+        """Yield (frame_number, timestamp, frame) for every sampled frame."""
+        if self.upload_complete is not None:
+            cap = None
+            samples = self._follow_frames()
+        else:
+            cap, video_fps = self.open_capture()
+            strategy = self.resolve_strategy(video_fps)
+            logging.info(f"Sampling frames at {self.fps} fps with the {strategy} strategy")
+            sample = {
+                "read": self._read_frames,
+                "grab": self._grab_frames,
+                "seek": self._seek_frames
+            }[strategy]
+            samples = (
+                (frame_number, frame_number / video_fps, frame)
+                for frame_number, frame in sample(cap, video_fps))
+        if self.frame_filter is not None:
+            samples = self.frame_filter.filter(samples)
+        try:
+            # Decode time per frame, excluding whatever the consumer does in between
+            start = time.perf_counter()
+            for frame_number, timestamp, frame in samples:
+                metrics.observe("qyv_item_seconds", time.perf_counter() - start, stage="frames")
+                metrics.inc("qyv_items_total", stage="frames")
+                self.frame_ranges[self.frame_name(frame_number)] = self.time_range(
+                    frame_number, timestamp)
+                yield frame_number, timestamp, frame
+                start = time.perf_counter()
+        finally:
+            if cap is not None:
+                cap.release()
+
+    def time_range(self, frame_number: int, timestamp: float):
+        if self.frame_filter is not None and frame_number in self.frame_filter.ranges:
+            return dict(self.frame_filter.ranges[frame_number])
+        return {"start": timestamp, "end": timestamp, "frames": 1}
+
+    def _read_frames(self, cap, video_fps: float):
+        # Legacy path: decode every frame and keep one per truncated interval
         frame_interval = max(1, int(video_fps / self.fps))
 
         frame_number = 0
-        extracted_frames = 0
         while cap.isOpened():
             ret, frame = cap.read()
             if not ret:
                 break
 
             if frame_number % frame_interval == 0:
-                frame_filename = os.path.join(self.output_dir, f"frame_{frame_number}.jpg")
-                try:
-                    cv2.imwrite(frame_filename, frame)
-                    extracted_frames += 1
-                    logging.info(f"Extracted frame {frame_number} to {frame_filename}")
-                except Exception as e:
-                    logging.error(f"Error saving frame {frame_number}: {e}")
-                    time.sleep(0.1)  # Adding a small delay before retrying
+                yield frame_number, frame
 
             frame_number += 1
 
-        cap.release()
+    def _grab_frames(self, cap, video_fps: float):
+        # grab() still decodes every frame for most codecs, retrieve() only
+        # skips the colour conversion and copy of the frames not sampled
+        targets = self.target_frame_numbers(video_fps)
+        next_target = next(targets)
+        frame_number = 0
+        while cap.grab():
+            if frame_number == next_target:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                yield frame_number, frame
+                next_target = next(targets)
+            frame_number += 1
+
+    def _seek_frames(self, cap, video_fps: float):
+        # Jump to the keyframe before each target and decode forward from there
+        for frame_number in self.target_frame_numbers(video_fps):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame_number, frame
+
+    def _follow_frames(self):
+        """Sample a video that is still being uploaded, reopening it as it grows.
+
+        A sampled frame is only trusted once the frame after it has been
+        demuxed, or the upload is complete, so a half-written packet at the end
+        of the file is never decoded.
+        """
+        targets = None
+        next_target = None
+        while True:
+            complete = self.upload_complete()
+            cap = cv2.VideoCapture(self.video_path)
+            if not cap.isOpened():
+                cap.release()
+                if complete:
+                    raise Exception("Could not open video file")
+                time.sleep(FOLLOW_POLL_SECONDS)
+                continue
+            try:
+                video_fps = capture_fps(cap)
+                if targets is None:
+                    targets = self.target_frame_numbers(video_fps)
+                    next_target = next(targets)
+                    logging.info(f"Sampling frames at {self.fps} fps while the upload arrives")
+                # Resume from the first target not yielded yet
+                cap.set(cv2.CAP_PROP_POS_FRAMES, next_target)
+                frame_number = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+                held = None
+                while cap.grab():
+                    if held is not None:
+                        yield held[0], held[0] / video_fps, held[1]
+                        held = None
+                    if frame_number == next_target:
+                        ret, frame = cap.retrieve()
+                        if not ret:
+                            break
+                        held = (frame_number, frame)
+                        next_target = next(targets)
+                    frame_number += 1
+                if complete:
+                    if held is not None:
+                        yield held[0], held[0] / video_fps, held[1]
+                    return
+                if held is not None:
+                    # Not confirmed yet, decode it again after the next reopen
+                    next_target = held[0]
+                    targets = self.target_frame_numbers(video_fps, after=held[0])
+            finally:
+                cap.release()
+            time.sleep(FOLLOW_POLL_SECONDS)
+
+    @staticmethod
+    def frame_name(frame_number: int) -> str:
+        return f"frame_{frame_number}.jpg"
+
+    def extract_frames(self):
+        extracted_frames = 0
+        for frame_number, _, frame in self.iter_frames():
+            frame_filename = os.path.join(self.output_dir, self.frame_name(frame_number))
+            try:
+                cv2.imwrite(frame_filename, frame)
+                extracted_frames += 1
+                log_sampler.log(logging.getLogger(), "frames", "Extracted frame %s to %s",
+                                frame_number, frame_filename)
+            except Exception as e:
+                logging.error(f"Error saving frame {frame_number}: {e}")
+                time.sleep(0.1)  # Adding a small delay before retrying
+
         logging.info(f"Total extracted frames: {extracted_frames}")
+        self.save_frame_ranges()
+
+    def save_frame_ranges(self):
+        ranges_path = os.path.join(self.output_dir, FRAME_RANGES_FILE)
+        with open(ranges_path, 'w') as json_file:
+            json.dump(self.frame_ranges, json_file)
 
 
 # Example usage
 if __name__ == "__main__":
     video_path = "path_to_video.mp4"
     output_dir = "output_frames"
-    fps = 30  # Target FPS for frame extraction
+    fps = 30  # Target FPS for frame extraction, fractional rates like 0.5 work too
 
     extractor = ExtractFramesFromVideo(video_path, output_dir, fps)
     extractor.extract_frames()
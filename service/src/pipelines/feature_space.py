@@ -0,0 +1,224 @@
+# src/pipelines/feature_space.py
+import argparse
+import json
+import logging
+import os
+import uuid
+import numpy as np
+
+# "logits" keeps the 1000 ImageNet class scores, "embedding" the pooled last hidden state
+FEATURE_MODES = ("logits", "embedding")
+FEATURE_MODE = os.getenv("FEATURE_MODE", "logits").lower()
+FEATURE_REDUCTIONS = ("none", "pca", "random")
+# Output width of swin-base for each mode, before any reduction
+RAW_DIMS = {"logits": 1000, "embedding": 1024}
+
+if FEATURE_MODE not in FEATURE_MODES:
+    raise ValueError(f"Unknown FEATURE_MODE: {FEATURE_MODE}")
+
+
+def swin_output_field(mode: str = FEATURE_MODE) -> str:
+    """Attribute of the Swin output holding the features of a mode."""
+    return "logits" if mode == "logits" else "pooler_output"
+
+
+class FeatureProjection:
+    """Linear reduction ``(x - mean) @ components.T`` shared by a whole library."""
+
+    def __init__(self, method: str, mean: np.ndarray, components: np.ndarray):
+        self.method = method
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)
+
+    @classmethod
+    def fit_pca(cls, vectors: np.ndarray, dim: int):
+        vectors = np.asarray(vectors, dtype=np.float64)
+        mean = vectors.mean(axis=0)
+        _, _, components = np.linalg.svd(vectors - mean, full_matrices=False)
+        components = components[:dim]
+        if len(components) < dim:
+            # Fewer samples than dimensions, the remaining ones stay zero
+            logging.warning(f"PCA fitted on {len(vectors)} vectors, only {len(components)} of {dim} dimensions are used")
+            components = np.vstack([components, np.zeros((dim - len(components), vectors.shape[1]))])
+        return cls("pca", mean, components)
+
+    @classmethod
+    def random(cls, raw_dim: int, dim: int, seed: int = 0):
+        # Gaussian Johnson-Lindenstrauss projection, the same for every process with the same seed
+        generator = np.random.default_rng(seed)
+        components = generator.standard_normal((dim, raw_dim)) / np.sqrt(dim)
+        return cls("random", np.zeros(raw_dim), components)
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def save(self, path: str) -> bool:
+        """Write the projection unless one exists already, returns whether this one was kept."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+        np.savez(tmp_path, method=self.method, mean=self.mean, components=self.components)
+        try:
+            # A hard link fails when another worker saved its fit first
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(str(data["method"]), data["mean"], data["components"])
+
+
+class FeatureSpace:
+    """How Swin features become the vectors stored in and searched against Milvus.
+
+    Reduction, L2 normalization and the float16 cast are applied at ingestion
+    and to query vectors alike, the cached features and feature files keep
+    the model's raw output. A PCA projection is fitted once per library, on
+    ``fit_samples`` frames of one video topped up with earlier uploads or with
+    the fit command below, and reused by every video after that. Until then
+    the seeded random projection stands in for it, and ``version`` says so;
+    changing any of these settings needs a fresh collection.
+    """
+
+    def __init__(self, library: str, mode: str = None, reduction: str = None, dim: int = None,
+                 normalize: bool = None, dtype: str = None, projection_dir: str = None,
+                 fit_samples: int = None, seed: int = None):
+        self.library = library
+        self.mode = mode or FEATURE_MODE
+        self.reduction = (reduction or os.getenv("FEATURE_REDUCTION", "none")).lower()
+        if self.reduction not in FEATURE_REDUCTIONS:
+            raise ValueError(f"Unknown FEATURE_REDUCTION: {self.reduction}")
+        self.raw_dim = RAW_DIMS[self.mode]
+        self.dim = self.raw_dim if self.reduction == "none" else min(
+            self.raw_dim, int(dim or os.getenv("FEATURE_DIM", 256)))
+        self.normalize = normalize if normalize is not None else os.getenv(
+            "FEATURE_NORMALIZE", "false").lower() == "true"
+        self.dtype = (dtype or os.getenv("FEATURE_DTYPE", "float32")).lower()
+        if self.dtype not in ("float32", "float16"):
+            raise ValueError(f"Unknown FEATURE_DTYPE: {self.dtype}")
+        self.projection_dir = projection_dir or os.getenv("FEATURE_PROJECTION_DIR", "models/projections")
+        self.fit_samples = fit_samples or int(os.getenv("FEATURE_PCA_FIT_SAMPLES", 2048))
+        self.seed = seed if seed is not None else int(os.getenv("FEATURE_PROJECTION_SEED", 0))
+        self.projection = None
+        # Whether the random projection stands in for a PCA one not fitted yet
+        self.provisional = False
+
+    @property
+    def projection_path(self):
+        return os.path.join(self.projection_dir, f"{self.library}-{self.mode}-pca{self.dim}.npz")
+
+    def load_projection(self):
+        """The library's projection, the random one while a PCA one was never fitted."""
+        if self.reduction == "none" or (self.projection is not None and not self.provisional):
+            return self.projection
+        if self.reduction == "pca" and os.path.exists(self.projection_path):
+            # Fitted by this or another worker
+            self.projection = FeatureProjection.load(self.projection_path)
+            self.provisional = False
+        elif self.projection is None:
+            self.projection = FeatureProjection.random(self.raw_dim, self.dim, self.seed)
+            self.provisional = self.reduction == "pca"
+        return self.projection
+
+    @property
+    def needs_fit(self):
+        self.load_projection()
+        return self.provisional
+
+    def fit(self, vectors: list):
+        """Fit the PCA once ``fit_samples`` vectors exist, until then keep the random stand-in."""
+        if len(vectors) < self.fit_samples:
+            # A projection fitted on a short clip would be kept by the library forever
+            logging.warning(
+                f"No PCA projection for {self.library} yet and only {len(vectors)} of "
+                f"{self.fit_samples} frames to fit one, storing randomly projected vectors")
+            return self.load_projection()
+        projection = FeatureProjection.fit_pca(vectors, self.dim)
+        if projection.save(self.projection_path):
+            logging.info(f"Fitted a {self.dim}-dimensional PCA on {len(vectors)} vectors for {self.library}")
+            logging.warning(
+                f"Videos ingested into {self.library} before the fit hold randomly projected "
+                f"vectors, retry their jobs to re-ingest them")
+            self.projection = projection
+            self.provisional = False
+        else:
+            # Another worker fitted the library first, its vectors are already stored
+            self.load_projection()
+        return self.projection
+
+    def transform(self, vectors: list) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        projection = self.load_projection()
+        if projection is not None:
+            vectors = projection.transform(vectors)
+        if self.normalize:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.astype(self.dtype)
+
+    def milvus_vectors(self, vectors: list) -> list:
+        """Rows as Milvus takes them, lists of floats or float16 arrays."""
+        vectors = self.transform(vectors)
+        return list(vectors) if self.dtype == "float16" else vectors.tolist()
+
+    def query_vectors(self, vectors: list) -> list:
+        """Query vectors in the stored space, raw features are reduced and stored-size ones kept."""
+        if self.reduction == "none" or all(len(vector) == self.raw_dim for vector in vectors):
+            return self.milvus_vectors(vectors)
+        if any(len(vector) != self.dim for vector in vectors):
+            raise ValueError(f"Query vectors must have {self.raw_dim} or {self.dim} dimensions")
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        return list(vectors) if self.dtype == "float16" else vectors.tolist()
+
+    @property
+    def version(self) -> str:
+        """Part of cache keys of results that hold stored vectors."""
+        # Vectors stored with the stand-in change once the PCA is fitted
+        reduction = f"{self.reduction}{self.dim}{'~random' if self.needs_fit else ''}"
+        return f"{self.mode}:{reduction}:{'l2' if self.normalize else 'raw'}:{self.dtype}"
+
+
+def load_feature_files(frames_dirs: list, dim: int = None, limit: int = None) -> list:
+    """Raw feature vectors saved by earlier jobs under the given frame directories.
+
+    Only vectors of ``dim`` values are kept when given, and reading stops
+    after ``limit`` of them.
+    """
+    vectors = []
+    for frames_dir in frames_dirs:
+        for directory, _, files in os.walk(frames_dir):
+            for name in sorted(files):
+                if limit is not None and len(vectors) >= limit:
+                    return vectors
+                if name.endswith("_features.json"):
+                    with open(os.path.join(directory, name)) as f:
+                        features = json.load(f)["features"]
+                    if dim is None or len(features) == dim:
+                        vectors.append(features)
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the library's PCA projection from saved features")
+    parser.add_argument("frames_dirs", nargs="*", default=["frames"],
+                        help="Directories holding *_features.json files, searched recursively")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # The library the ingestion uses, named after the shared collection
+    from src.pipelines.ingest_to_milvus import feature_space
+    if feature_space.reduction != "pca":
+        raise SystemExit("FEATURE_REDUCTION is not pca, nothing to fit")
+    if not feature_space.needs_fit:
+        raise SystemExit(f"{feature_space.projection_path} exists already")
+    vectors = load_feature_files(args.frames_dirs, dim=feature_space.raw_dim)
+    feature_space.fit(vectors)
+    if feature_space.needs_fit:
+        raise SystemExit(f"Only {len(vectors)} of {feature_space.fit_samples} frames found")
+
+
+if __name__ == "__main__":
+    main()
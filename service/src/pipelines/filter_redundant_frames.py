@@ -0,0 +1,101 @@
+# src/pipelines/filter_redundant_frames.py
+import logging
+import cv2
+import numpy as np
+
+# A frame is kept when its distance to the last kept frame exceeds the threshold
+DEFAULT_THRESHOLDS = {
+    "phash": 10,        # Hamming distance out of 64 bits
+    "histogram": 0.1,   # Bhattacharyya distance between HSV histograms
+    "ssim": 0.1         # 1 - SSIM of 64x64 grayscale thumbnails
+}
+
+
+class FilterRedundantFrames:
+    def __init__(self, method: str = "phash", threshold: float = None):
+        if method not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown frame filter method: {method}")
+        self.method = method
+        self.threshold = threshold if threshold is not None else DEFAULT_THRESHOLDS[method]
+        # Kept frame number -> time range of the sampled frames it stands for
+        self.ranges = {}
+        self.frames_seen = 0
+        self.frames_kept = 0
+
+    def filter(self, frames):
+        """Yield the (frame_number, timestamp, frame) tuples worth running models on.
+
+        A kept frame is only yielded once the next kept frame (or the end of the
+        video) closes its time range, so ``ranges`` is final for every frame
+        downstream stages receive.
+        """
+        pending = None
+        reference = None
+        for frame_number, timestamp, frame in frames:
+            self.frames_seen += 1
+            signature = self.signature(frame)
+            if pending is not None and self.distance(reference, signature) <= self.threshold:
+                time_range = self.ranges[pending[0]]
+                time_range["end"] = timestamp
+                time_range["frames"] += 1
+                continue
+
+            if pending is not None:
+                yield pending
+            pending = (frame_number, timestamp, frame)
+            reference = signature
+            self.frames_kept += 1
+            self.ranges[frame_number] = {"start": timestamp, "end": timestamp, "frames": 1}
+
+        if pending is not None:
+            yield pending
+        logging.info(
+            f"Frame filter ({self.method}) kept {self.frames_kept} of {self.frames_seen} frames, "
+            f"saving {self.stats()['model_invocations_saved']} model invocations")
+
+    def signature(self, frame):
+        if self.method == "phash":
+            gray = cv2.cvtColor(cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA),
+                                cv2.COLOR_BGR2GRAY)
+            low_frequencies = cv2.dct(np.float32(gray))[:8, :8]
+            return low_frequencies > np.median(low_frequencies)
+        if self.method == "histogram":
+            hsv = cv2.cvtColor(cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA),
+                               cv2.COLOR_BGR2HSV)
+            histogram = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256])
+            return cv2.normalize(histogram, histogram).flatten()
+        gray = cv2.cvtColor(cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA),
+                            cv2.COLOR_BGR2GRAY)
+        return np.float32(gray)
+
+    def distance(self, reference, signature):
+        if self.method == "phash":
+            return int(np.count_nonzero(reference != signature))
+        if self.method == "histogram":
+            return cv2.compareHist(reference, signature, cv2.HISTCMP_BHATTACHARYYA)
+        return 1 - self.ssim(reference, signature)
+
+    @staticmethod
+    def ssim(a, b):
+        c1 = (0.01 * 255) ** 2
+        c2 = (0.03 * 255) ** 2
+        mu_a = cv2.GaussianBlur(a, (7, 7), 1.5)
+        mu_b = cv2.GaussianBlur(b, (7, 7), 1.5)
+        var_a = cv2.GaussianBlur(a * a, (7, 7), 1.5) - mu_a * mu_a
+        var_b = cv2.GaussianBlur(b * b, (7, 7), 1.5) - mu_b * mu_b
+        covariance = cv2.GaussianBlur(a * b, (7, 7), 1.5) - mu_a * mu_b
+        ssim_map = ((2 * mu_a * mu_b + c1) * (2 * covariance + c2)) / (
+            (mu_a * mu_a + mu_b * mu_b + c1) * (var_a + var_b + c2))
+        return float(ssim_map.mean())
+
+    def stats(self):
+        dropped = self.frames_seen - self.frames_kept
+        return {
+            "method": self.method,
+            "threshold": self.threshold,
+            "frames_seen": self.frames_seen,
+            "frames_kept": self.frames_kept,
+            "frames_dropped": dropped,
+            # Every dropped frame skips one Swin pass and one YOLO pass
+            "model_invocations_saved": dropped * 2
+        }
@@ -1,22 +1,129 @@
 import os
-import shutil
+import re
+import json
+import time
+import uuid
+import hashlib
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+# Large chunks keep the number of event loop round-trips per upload low
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+COMPLETE_SUFFIX = ".complete"
+# Containers whose header lets a decoder start before the whole file is there
+MATROSKA_MAGIC = b"\x1a\x45\xdf\xa3"
+TS_PACKET_SIZE = 188
+
+
+def new_upload_id(filename: str) -> str:
+    # Client filenames collide, so only keep them as a readable prefix; the id
+    # also names a Milvus collection, which only allows letters, digits and "_"
+    stem = re.sub(r"\W+", "_", os.path.splitext(os.path.basename(filename or ""))[0]).strip("_")
+    return f"{stem[:48] or 'video'}_{uuid.uuid4().hex[:16]}"
+
+
+def video_extension(filename: str) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if re.fullmatch(r"\.[a-z0-9]{1,8}", extension) else ".mp4"
+
+
+def is_streamable(path: str) -> bool:
+    """Whether frames can be decoded from the start of a partially written file."""
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+    if head.startswith(MATROSKA_MAGIC):
+        return True  # Matroska and WebM
+    if len(head) > 2 * TS_PACKET_SIZE and head[0] == head[TS_PACKET_SIZE] == head[2 * TS_PACKET_SIZE] == 0x47:
+        return True  # MPEG-TS
+    # MP4/MOV only when the moov box precedes mdat ("faststart") or the file is fragmented
+    offset = 0
+    while offset + 8 <= len(head):
+        size = int.from_bytes(head[offset:offset + 4], "big")
+        box = head[offset + 4:offset + 8]
+        if box in (b"moov", b"moof"):
+            return True
+        if box == b"mdat":
+            return False
+        if size == 1 and offset + 16 <= len(head):
+            size = int.from_bytes(head[offset + 8:offset + 16], "big")
+        if size < 8:
+            return False
+        offset += size
+    return False
+
+
+def write_chunk(buffer, digest, chunk: bytes):
+    digest.update(chunk)
+    buffer.write(chunk)
+
+
+def mark_complete(video_path: str, content_hash: str, size: int):
+    # Written atomically, workers following the upload poll for it
+    marker_path = video_path + COMPLETE_SUFFIX
+    tmp_path = f"{marker_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"content_hash": content_hash, "size": size}, f)
+    os.replace(tmp_path, marker_path)
+
+
+def read_completion(video_path: str):
+    try:
+        with open(video_path + COMPLETE_SUFFIX) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def upload_complete(video_path: str, idle_timeout: float = None) -> bool:
+    """True once the upload finished, raises when it stopped growing."""
+    if read_completion(video_path) is not None:
+        return True
+    idle_timeout = idle_timeout or float(os.getenv("UPLOAD_IDLE_TIMEOUT", 600))
+    try:
+        idle = time.time() - os.path.getmtime(video_path)
+    except OSError:
+        raise Exception("Upload was removed before it completed")
+    if idle > idle_timeout:
+        raise Exception(f"Upload stalled for {idle:.0f} seconds")
+    return False
+
+
+def wait_for_upload(video_path: str, poll_interval: float = 1.0):
+    """Block until a resumable upload completes and return its completion record."""
+    while not upload_complete(video_path):
+        time.sleep(poll_interval)
+    return read_completion(video_path)
 
 
 class HandleVideoFile:
     def __init__(self, upload_dir: str):
         self.upload_dir = upload_dir
         os.makedirs(self.upload_dir, exist_ok=True)
+        self.content_hash = None
+        self.size = 0
 
-    def save_file(self, file: UploadFile) -> str:
-        file_path = os.path.join(self.upload_dir, file.filename)
+    async def save_file(self, file: UploadFile, upload_id: str) -> str:
+        # Named after the upload id, concurrent uploads of "video.mp4" don't collide
+        file_path = self.get_file_path(upload_id + video_extension(file.filename))
+        # Hash while copying so cache lookups don't need a second pass
+        digest = hashlib.sha256()
         with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.size += len(chunk)
+                # Hashing and writing 8 MiB both block, keep them off the event loop
+                await run_in_threadpool(write_chunk, buffer, digest, chunk)
+        self.content_hash = digest.hexdigest()
         return file_path
 
     def clean_up(self, file_path: str):
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        if not file_path:
+            return
+        for path in (file_path, file_path + COMPLETE_SUFFIX):
+            if os.path.exists(path):
+                os.remove(path)
 
     def get_file_path(self, filename: str) -> str:
         return os.path.join(self.upload_dir, filename)
@@ -0,0 +1,232 @@
+# src/pipelines/inference_backends.py
+import logging
+import os
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+import torch
+from src.pipelines.feature_space import swin_output_field
+from src.pipelines.result_cache import content_key
+
+logger = logging.getLogger(__name__)
+
+# "eager" runs the fp32 PyTorch model, "quantized" its dynamic int8 Linear
+# layers, "torchscript" and "onnx" a frozen or exported graph per input shape
+INFERENCE_BACKENDS = ("eager", "quantized", "torchscript", "onnx")
+
+
+def backend_for(name: str, backend: str = None) -> str:
+    """Backend used for a model, INFERENCE_BACKEND_<NAME> overrides INFERENCE_BACKEND."""
+    backend = (backend or os.getenv(f"INFERENCE_BACKEND_{name.upper()}")
+               or os.getenv("INFERENCE_BACKEND", "eager")).lower()
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend for {name}: {backend}")
+    if backend == "quantized" and name == "yolov5":
+        # Dynamic quantization only covers Linear layers, YOLOv5 is convolutional
+        return "eager"
+    return backend
+
+
+def backend_tag(name: str, backend: str = None) -> str:
+    """Suffix for a model's cache version, outputs of different backends are not mixed."""
+    backend = backend_for(name, backend)
+    return "" if backend == "eager" else f":{backend}"
+
+
+class SwinFeatures(torch.nn.Module):
+    """Tensor-in, tensor-out view of Swin's feature output for tracing and export."""
+
+    def __init__(self, model, field: str):
+        super().__init__()
+        self.model = model
+        self.field = field
+
+    def forward(self, pixel_values):
+        # The class forward, the instance one is replaced by the backend
+        outputs = type(self.model).forward(self.model, pixel_values=pixel_values)
+        return getattr(outputs, self.field)
+
+
+class YoloPredictions(torch.nn.Module):
+    """Raw YOLOv5 predictions before NMS, what AutoShape post-processes."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, images):
+        return type(self.model).forward(self.model, images)[0]
+
+
+def cosine_similarity(candidate: torch.Tensor, reference: torch.Tensor) -> float:
+    candidate = candidate.detach().float().flatten()
+    reference = reference.detach().float().flatten()
+    return float(torch.nn.functional.cosine_similarity(candidate, reference, dim=0))
+
+
+class InferenceBackend:
+    """Runs a tensor view of a model on another backend.
+
+    Graph backends are compiled per input shape, since traces and exports
+    bake shapes in, and kept in ``COMPILED_MODEL_DIR`` across restarts. The
+    first batch of every new runner is also run eagerly; a runner whose
+    output falls below ``INFERENCE_PARITY_MIN_SIMILARITY`` cosine similarity
+    is discarded and that shape stays on the eager model.
+    """
+
+    def __init__(self, name: str, view: torch.nn.Module, backend: str, version: str,
+                 cache_dir: str = None, min_similarity: float = None):
+        self.name = name
+        self.view = view.eval()
+        self.backend = backend
+        self.version = version
+        self.cache_dir = cache_dir or os.getenv("COMPILED_MODEL_DIR", "models/compiled")
+        self.min_similarity = min_similarity or float(os.getenv("INFERENCE_PARITY_MIN_SIMILARITY", 0.99))
+        self.parity = {}
+        self._runners = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sessions and compiled graphs are rebuilt from the disk cache after unpickling
+        state = dict(self.__dict__, _runners={})
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, _lock=threading.Lock())
+
+    def __call__(self, inputs: torch.Tensor) -> torch.Tensor:
+        key = tuple(inputs.shape) if self.backend in ("torchscript", "onnx") else ()
+        runner = self._runners.get(key)
+        if runner is None:
+            with self._lock:
+                runner = self._runners.get(key) or self.prepare(key, inputs)
+        with torch.inference_mode():
+            return runner(inputs)
+
+    def prepare(self, key: tuple, inputs: torch.Tensor):
+        start = time.perf_counter()
+        try:
+            runner = self.build(inputs)
+            with torch.inference_mode():
+                similarity = cosine_similarity(runner(inputs), self.view(inputs))
+        except Exception as e:
+            logger.warning(f"Could not run {self.name} on {self.backend} for input {key}, staying eager: {e}")
+            runner, similarity = self.view, None
+        self.parity[key] = similarity
+        if similarity is not None and similarity < self.min_similarity:
+            logger.warning(
+                f"{self.name} on {self.backend} diverges from eager for input {key} "
+                f"(cosine similarity {similarity:.4f}), staying eager")
+            runner = self.view
+        elif similarity is not None:
+            logger.info(
+                f"Prepared {self.name} on {self.backend} for input {key} in "
+                f"{time.perf_counter() - start:.2f} seconds (cosine similarity {similarity:.4f})")
+        self._runners[key] = runner
+        return runner
+
+    def build(self, inputs: torch.Tensor):
+        if self.backend == "quantized":
+            return torch.ao.quantization.quantize_dynamic(
+                self.view, {torch.nn.Linear}, dtype=torch.qint8)
+        if self.backend == "torchscript":
+            return self.build_torchscript(inputs)
+        return self.build_onnx(inputs)
+
+    def compiled_path(self, inputs: torch.Tensor, extension: str) -> str:
+        key = content_key(self.version, self.backend, tuple(inputs.shape), torch.__version__)
+        return os.path.join(self.cache_dir, f"{self.name}-{self.backend}-{key[:16]}{extension}")
+
+    def build_torchscript(self, inputs: torch.Tensor):
+        path = self.compiled_path(inputs, ".pt")
+        if os.path.exists(path):
+            frozen = torch.jit.load(path)
+        else:
+            with torch.inference_mode():
+                frozen = torch.jit.freeze(torch.jit.trace(self.view, inputs, check_trace=False).eval())
+            save_atomically(path, lambda tmp_path: torch.jit.save(frozen, tmp_path))
+        # Fuses conv/bn and picks oneDNN kernels, not serializable so done after loading
+        return torch.jit.optimize_for_inference(frozen)
+
+    def build_onnx(self, inputs: torch.Tensor):
+        import onnxruntime
+        path = self.compiled_path(inputs, ".onnx")
+        if not os.path.exists(path):
+            save_atomically(path, lambda tmp_path: torch.onnx.export(
+                self.view, (inputs,), tmp_path, input_names=["input"],
+                output_names=["output"], opset_version=17))
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Same thread budget torch was given in this process
+        options.intra_op_num_threads = torch.get_num_threads()
+        session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+        def run(batch: torch.Tensor):
+            output = session.run(None, {"input": batch.detach().cpu().numpy()})[0]
+            return torch.from_numpy(output)
+        return run
+
+
+def save_atomically(path: str, save):
+    # Workers compiling the same shape must not read a half-written file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        save(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class SwinForward:
+    """Replaces the Swin model's forward, keeping the output field features are read from."""
+
+    def __init__(self, backend: InferenceBackend):
+        self.backend = backend
+
+    def __call__(self, pixel_values=None, **kwargs):
+        return SimpleNamespace(**{self.backend.view.field: self.backend(pixel_values)})
+
+
+class YoloForward:
+    """Replaces the forward of the DetectionModel inside YOLOv5's AutoShape wrapper."""
+
+    def __init__(self, backend: InferenceBackend):
+        self.backend = backend
+
+    def __call__(self, images, *args, **kwargs):
+        return self.backend(images)
+
+
+def yolo_detection_model(model):
+    # AutoShape -> DetectMultiBackend -> DetectionModel
+    inner = getattr(getattr(model, "model", None), "model", None)
+    return inner if isinstance(inner, torch.nn.Module) and hasattr(inner, "model") else None
+
+
+def apply_backend(name: str, model, version: str, backend: str = None):
+    """Route a loaded model's forward through the configured backend.
+
+    The model object keeps its type and interface, pre- and post-processing
+    (AutoShape letterboxing and NMS for YOLOv5) still run in PyTorch.
+    """
+    backend = backend_for(name, backend)
+    if backend == "eager":
+        return model
+    if name == "swin":
+        target, view, forward = model, SwinFeatures(model, swin_output_field()), SwinForward
+    elif name == "yolov5":
+        target = yolo_detection_model(model)
+        if target is None:
+            logger.warning(f"Unexpected YOLOv5 model structure, keeping {name} eager")
+            return model
+        view, forward = YoloPredictions(target), YoloForward
+    else:
+        raise ValueError(f"No inference backend support for model {name}")
+    # An instance attribute, the module's own __call__ and hooks stay in place
+    target.forward = forward(InferenceBackend(name, view, backend, version))
+    logger.info(f"Running {name} on the {backend} backend")
+    return model
@@ -1,20 +1,201 @@
 import os
+import re
 import json
 import logging
+import time
 from pymilvus import connections, Collection, DataType, FieldSchema, CollectionSchema, utility
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.pipelines.extract_frames_from_video import FRAME_RANGES_FILE
+from src.pipelines.feature_space import FeatureSpace, load_feature_files
+from src.pipelines.metrics import metrics
+from src.pipelines.milvus_index_strategy import MilvusIndexStrategy
+
+# "per_video" builds one collection per upload, "shared" keeps every video in
+# one collection partitioned by video_id
+MILVUS_COLLECTION_MODE = os.getenv("MILVUS_COLLECTION_MODE", "per_video").lower()
+MILVUS_SHARED_COLLECTION = os.getenv("MILVUS_SHARED_COLLECTION", "video_library")
+MILVUS_NUM_PARTITIONS = int(os.getenv("MILVUS_NUM_PARTITIONS", 64))
+# "frame" stores one row per frame with its detections in array and JSON fields,
+# "detection" one row per detected object, each with its own copy of the frame vector
+MILVUS_ROW_LAYOUTS = ("frame", "detection")
+MILVUS_ROW_LAYOUT = os.getenv("MILVUS_ROW_LAYOUT", "frame").lower()
+# Capacity of the object_classes array, well above the 80 COCO classes
+MAX_FRAME_CLASSES = 128
+SEARCH_OUTPUT_FIELDS = ["video_id", "frame_name", "object_class",
+                        "confidence", "start_time", "end_time"]
+FRAME_OUTPUT_FIELDS = ["video_id", "frame_name", "start_time", "end_time", "detections"]
+# Per-video collections are built under this name and renamed over the video's
+# once complete, outside object_detection_ so they are not listed as videos
+STAGING_PREFIX = "staging_"
+# Vectors of every collection of the library live in this space, see FEATURE_* settings
+feature_space = FeatureSpace(library=MILVUS_SHARED_COLLECTION)
+
+
+def connect_milvus(host, port):
+    # Reuse the pooled gRPC channel when this alias is already connected
+    if connections.has_connection("default"):
+        address = connections.get_connection_addr("default")
+        if address.get("address") == f"{host}:{port}":
+            return
+    connections.connect("default", host=host, port=port)
+
+
+def collection_name_for_video(video_id: str) -> str:
+    if MILVUS_COLLECTION_MODE == "shared":
+        return MILVUS_SHARED_COLLECTION
+    return "object_detection_{upload_id}".format(upload_id=video_id)
+
+
+def video_id_for_collection(collection_name: str) -> str:
+    """Video stored in a per-video collection, the inverse of collection_name_for_video."""
+    return collection_name[len("object_detection_"):]
+
+
+def milvus_client_for_video(video_id: str, **kwargs):
+    if MILVUS_COLLECTION_MODE == "shared":
+        return MilvusClient(collection_name=MILVUS_SHARED_COLLECTION, shared=True, **kwargs)
+    return MilvusClient(collection_name=collection_name_for_video(video_id), **kwargs)
+
+
+def ingest_client_for_video(video_id: str, resume: bool = False, **kwargs):
+    """Client a job writes a video's rows to, its current rows stay searchable until publish_video.
+
+    A shared collection is written in place, the rows being replaced are
+    deleted by ``publish_video``. Per-video collections are built under a
+    staging name; once published, resuming works on the video's collection.
+    """
+    if MILVUS_COLLECTION_MODE == "shared":
+        return milvus_client_for_video(video_id, drop_existing=False, **kwargs)
+    name = collection_name_for_video(video_id)
+    staging_name = STAGING_PREFIX + name
+    if resume and not MilvusClient.has_collection(
+            staging_name, kwargs.get("host", "localhost"), kwargs.get("port", "19530")):
+        return MilvusClient(collection_name=name, drop_existing=False, **kwargs)
+    return MilvusClient(collection_name=staging_name, drop_existing=not resume, **kwargs)
+
+
+def publish_video(milvus_client, video_id: str, stale_rows=()):
+    """Replace a video's searchable rows with the ones a job wrote, returns the collection name."""
+    if milvus_client.shared:
+        milvus_client.delete_rows(list(stale_rows))
+        return milvus_client.collection_name
+    name = collection_name_for_video(video_id)
+    if milvus_client.collection_name == name:
+        return name
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    milvus_client.collection.release()
+    utility.rename_collection(milvus_client.collection_name, name)
+    milvus_client.collection_name = name
+    milvus_client.collection = Collection(name=name)
+    milvus_client.ensure_loaded()
+    logging.info(f"Published collection {name} of video {video_id}")
+    return name
+
+
+def list_video_collections(host='localhost', port='19530'):
+    """Collections holding videos, the shared one or every per-video collection."""
+    connect_milvus(host, port)
+    collections = utility.list_collections()
+    if MILVUS_COLLECTION_MODE == "shared":
+        return [MILVUS_SHARED_COLLECTION] if MILVUS_SHARED_COLLECTION in collections else []
+    return sorted(name for name in collections if name.startswith("object_detection_"))
+
+
+def open_milvus_client(collection_name: str, host='localhost', port='19530'):
+    """Open an existing collection for reads, None when it doesn't exist."""
+    if not MilvusClient.has_collection(collection_name, host, port):
+        return None
+    return MilvusClient(host=host, port=port, collection_name=collection_name,
+                        drop_existing=False,
+                        shared=collection_name == MILVUS_SHARED_COLLECTION)
+
+
+def delete_video(video_id: str, host='localhost', port='19530'):
+    """Remove a video from the library, returns False when it was never ingested."""
+    collection_name = collection_name_for_video(video_id)
+    if not MilvusClient.has_collection(collection_name, host, port):
+        return False
+    client = milvus_client_for_video(video_id, host=host, port=port, drop_existing=False)
+    if not client.has_video(video_id):
+        return False
+    client.delete_video(video_id)
+    return True
+
+
+def frame_detections(detections: list):
+    """Columns summarizing a frame's detections in the frame row layout."""
+    class_confidence = {}
+    for detection in detections:
+        name = detection["name"]
+        class_confidence[name] = max(class_confidence.get(name, 0.0), float(detection["confidence"]))
+    return {
+        # array_contains filters on the class, the JSON map on class and confidence together
+        "object_classes": sorted(class_confidence)[:MAX_FRAME_CLASSES],
+        "max_confidence": max(class_confidence.values(), default=0.0),
+        "class_confidence": class_confidence,
+        "detections": [
+            {"object_class": detection["name"], "confidence": float(detection["confidence"]),
+             **({"box": [float(detection[key]) for key in ("xmin", "ymin", "xmax", "ymax")]}
+                if "xmin" in detection else {})}
+            for detection in detections]
+    }
+
+
+def quote(value: str) -> str:
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def video_filter(video_ids=None):
+    """Boolean expression limiting a search to some videos, None searches all."""
+    if not video_ids:
+        return None
+    if len(video_ids) == 1:
+        return f"video_id == {quote(video_ids[0])}"
+    return f"video_id in [{', '.join(quote(video_id) for video_id in video_ids)}]"
 
 
 class MilvusClient:
     def __init__(self, host='localhost', port='19530',
-                 collection_name='object_detections'):
+                 collection_name='object_detections', drop_existing=True,
+                 index_strategy=None, shared=False, dim=None, dtype=None, layout=None):
         self.collection_name = collection_name
+        # Vector width and type of new collections, follow the feature configuration
+        self.dim = dim or feature_space.dim
+        self.dtype = dtype or feature_space.dtype
+        # Shared collections hold the whole library and are never dropped
+        self.shared = shared
+        drop_existing = drop_existing and not shared
+        self.index_strategy = index_strategy or MilvusIndexStrategy()
+        self.index_config = None
+        self.index_build_seconds = None
+        self._search_defaults = None
         self.connect(host, port)
-        self.create_collection()
-        self.create_index()
+        if not drop_existing and utility.has_collection(self.collection_name):
+            self.collection = Collection(name=self.collection_name)
+            logging.info(f"Using existing collection: {self.collection_name}")
+            # Collections created before the frame layout keep theirs until migrated
+            self.layout = "frame" if "detections" in self.field_names else "detection"
+            if self.vector_dim != self.dim:
+                logging.warning(
+                    f"Collection {self.collection_name} stores {self.vector_dim}-dimensional vectors, "
+                    f"the feature configuration produces {self.dim}")
+        else:
+            self.layout = (layout or MILVUS_ROW_LAYOUT).lower()
+            if self.layout not in MILVUS_ROW_LAYOUTS:
+                raise ValueError(f"Unknown Milvus row layout: {self.layout}")
+            self.create_collection()
+        # The index is built by build_index once ingestion is done
 
     def connect(self, host, port):
-        connections.connect("default", host=host, port=port)
+        connect_milvus(host, port)
+
+    @staticmethod
+    def has_collection(collection_name, host='localhost', port='19530'):
+        connect_milvus(host, port)
+        return utility.has_collection(collection_name)
 
     def create_collection(self):
         if utility.has_collection(self.collection_name):
@@ -31,111 +212,549 @@ class MilvusClient:
             name="frame_name",
             dtype=DataType.VARCHAR,
             max_length=255)
-        object_class = FieldSchema(
-            name="object_class",
+        if self.layout == "frame":
+            detection_fields = [
+                FieldSchema(name="object_classes", dtype=DataType.ARRAY,
+                            element_type=DataType.VARCHAR, max_capacity=MAX_FRAME_CLASSES,
+                            max_length=255),
+                FieldSchema(name="max_confidence", dtype=DataType.FLOAT),
+                # Highest confidence per class, e.g. class_confidence["person"] >= 0.5
+                FieldSchema(name="class_confidence", dtype=DataType.JSON),
+                FieldSchema(name="detections", dtype=DataType.JSON)]
+        else:
+            detection_fields = [
+                FieldSchema(name="object_class", dtype=DataType.VARCHAR, max_length=255),
+                FieldSchema(name="confidence", dtype=DataType.FLOAT)]
+        # Partition key in shared mode, so scoped searches only touch one video's data
+        video_id = FieldSchema(
+            name="video_id",
             dtype=DataType.VARCHAR,
-            max_length=255)
-        confidence = FieldSchema(name="confidence", dtype=DataType.FLOAT)
+            max_length=255,
+            is_partition_key=self.shared)
+        # Time range in seconds the frame stands for after duplicate filtering
+        start_time = FieldSchema(name="start_time", dtype=DataType.FLOAT)
+        end_time = FieldSchema(name="end_time", dtype=DataType.FLOAT)
         vector = FieldSchema(
             name="vector",
-            dtype=DataType.FLOAT_VECTOR,
-            dim=1000)  # Updated to match feature vector length
+            dtype=DataType.FLOAT16_VECTOR if self.dtype == "float16" else DataType.FLOAT_VECTOR,
+            dim=self.dim)
 
-        schema = CollectionSchema(fields=[frame_id, frame_name, object_class, confidence, vector],
+        schema = CollectionSchema(fields=[frame_id, video_id, frame_name, *detection_fields,
+                                          start_time, end_time, vector],
                                   description="Object detections with extracted features")
-        self.collection = Collection(name=self.collection_name, schema=schema)
-        logging.info(f"Created new collection: {self.collection_name}")
+        if self.shared:
+            self.collection = Collection(name=self.collection_name, schema=schema,
+                                         num_partitions=MILVUS_NUM_PARTITIONS)
+        else:
+            self.collection = Collection(name=self.collection_name, schema=schema)
+        logging.info(f"Created new collection: {self.collection_name} ({self.layout} rows)")
+
+    @property
+    def field_names(self):
+        return [field.name for field in self.collection.schema.fields]
+
+    @property
+    def insert_fields(self):
+        return [field.name for field in self.collection.schema.fields if not field.auto_id]
+
+    @property
+    def output_fields(self):
+        return FRAME_OUTPUT_FIELDS if self.layout == "frame" else SEARCH_OUTPUT_FIELDS
 
     def insert_data(self, data):
+        # Flushing is left to the caller so segments aren't sealed per batch
         self.collection.insert(data)
-        self.collection.flush()
         logging.info(
             f"Inserted batch of {len(data)} records into collection: {self.collection_name}")
 
-    def create_index(self):
-        logging.info(f"Creating index for collection: {self.collection_name}")
-        index_params = {
-            "index_type": "IVF_FLAT",
-            "metric_type": "L2",
-            "params": {
-                "nlist": 128}}
+    def insert_columns(self, columns: dict):
+        self.collection.insert([columns[name] for name in self.insert_fields])
+        row_count = len(next(iter(columns.values()), []))
+        logging.debug(
+            f"Inserted batch of {row_count} rows into collection: {self.collection_name}")
+        return row_count
+
+    def flush(self):
+        self.collection.flush()
+        logging.info(f"Flushed collection: {self.collection_name}")
+
+    def delete_video(self, video_id: str):
+        """Remove one video's rows, other videos in a shared collection stay untouched."""
+        if not self.shared:
+            utility.drop_collection(self.collection_name)
+            logging.info(f"Dropped collection {self.collection_name} of video {video_id}")
+            return
+        self.collection.delete(expr=video_filter([video_id]))
+        self.collection.flush()
+        logging.info(f"Deleted video {video_id} from collection: {self.collection_name}")
+
+    def delete_frames(self, video_id: str, frame_names: list):
+        """Remove a video's rows for some frames, left behind by an interrupted ingest."""
+        if not frame_names:
+            return
+        self.ensure_loaded()
+        names = ", ".join(quote(name) for name in frame_names)
+        self.collection.delete(expr=f"{video_filter([video_id])} and frame_name in [{names}]")
+
+    def video_row_ids(self, video_id: str, batch_size: int = 10000) -> list:
+        """Primary keys of a video's rows."""
+        return [row["frame_id"] for row in self.iter_rows(
+            video_filter([video_id]), output_fields=["frame_id"], batch_size=batch_size)]
+
+    def iter_rows(self, expr: str, output_fields=None, batch_size: int = 10000):
+        """Every row matching a scalar filter, in batches rather than one bounded query."""
+        self.ensure_loaded()
+        iterator = self.collection.query_iterator(
+            batch_size=batch_size, expr=expr or "frame_id >= 0",
+            output_fields=output_fields or self.output_fields)
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            iterator.close()
+
+    def delete_rows(self, row_ids: list, batch_size: int = 10000):
+        if not row_ids:
+            return
+        for i in range(0, len(row_ids), batch_size):
+            ids = ", ".join(str(row_id) for row_id in row_ids[i:i + batch_size])
+            self.collection.delete(expr=f"frame_id in [{ids}]")
+        self.collection.flush()
+        logging.info(f"Deleted {len(row_ids)} replaced rows from collection: {self.collection_name}")
+
+    def has_video(self, video_id: str):
+        # A query also sees rows not flushed yet, num_entities only counts sealed segments
+        self.ensure_loaded()
+        rows = self.collection.query(expr=video_filter([video_id]), output_fields=["frame_id"], limit=1)
+        return len(rows) > 0
+
+    def ensure_loaded(self):
+        if utility.load_state(self.collection_name).name != "Loaded":
+            if not self.collection.has_index():
+                # Loading needs an index, build_index replaces this one once ingestion is done
+                self.create_index({"index_type": "FLAT", "params": {},
+                                   "metric_type": self.index_strategy.metric_type})
+                return
+            self.collection.load()
+
+    def search(self, vectors: list, limit: int = 10, video_ids=None, expr=None,
+               search_params=None, output_fields=None, offset: int = 0):
+        """Vector search over one video, several videos or the whole library."""
+        filters = [f"({condition})" for condition in (video_filter(video_ids), expr) if condition]
+        metric_type, default_params = self.search_defaults()
+        self.ensure_loaded()
+        return self.collection.search(
+            data=vectors,
+            anns_field="vector",
+            param={"metric_type": metric_type, "params": search_params or default_params,
+                   "offset": offset},
+            limit=limit,
+            expr=" and ".join(filters) or None,
+            output_fields=output_fields or self.output_fields)
+
+    def query(self, expr: str, limit: int = 10, offset: int = 0, output_fields=None):
+        """Scalar query, e.g. every detection of one object class."""
+        self.ensure_loaded()
+        return self.collection.query(
+            expr=expr, limit=limit, offset=offset,
+            output_fields=output_fields or self.output_fields)
+
+    def search_defaults(self):
+        # Readers didn't build the index, so derive defaults from the one in place
+        if self.index_config is not None:
+            return self.index_config["metric_type"], self.index_config["search_params"]
+        if self._search_defaults is None:
+            current = self.current_index_params() or {}
+            self._search_defaults = (
+                current.get("metric_type", self.index_strategy.metric_type),
+                self.index_strategy.search_params(current.get("index_type"), current.get("params", {})))
+        return self._search_defaults
+
+    @property
+    def vector_field(self):
+        return next(field for field in self.collection.schema.fields if field.name == "vector")
+
+    @property
+    def vector_dim(self):
+        return self.vector_field.params["dim"]
+
+    @property
+    def vector_dtype(self):
+        return "float16" if self.vector_field.dtype == DataType.FLOAT16_VECTOR else "float32"
+
+    def create_index(self, index_params: dict):
+        logging.info(f"Creating {index_params['index_type']} index for collection: {self.collection_name}")
         self.collection.create_index(
             field_name="vector",
             index_params=index_params)
+        utility.wait_for_index_building_complete(self.collection_name)
         self.collection.load()
         logging.info(
             f"Index created and collection loaded: {self.collection_name}")
 
+    def current_index_params(self):
+        if not self.collection.has_index():
+            return None
+        index = self.collection.index()
+        params = dict(index.params)
+        if isinstance(params.get("params"), str):
+            params["params"] = json.loads(params["params"])
+        return params
+
+    def build_index(self):
+        """Pick an index for the ingested vectors, build it and load the collection."""
+        num_vectors = self.collection.num_entities
+        config = self.index_strategy.choose(num_vectors, self.vector_dim)
+        current = self.current_index_params()
+        if current is not None and not self.needs_rebuild(current, config):
+            # Milvus indexes new segments itself, a shared library keeps its index
+            params = current.get("params", {})
+            self.index_config = dict(
+                config, index_type=current["index_type"], params=params,
+                search_params=self.index_strategy.search_params(current["index_type"], params))
+            self.ensure_loaded()
+            logging.info(f"Keeping existing {current['index_type']} index on {self.collection_name}")
+            return {"config": self.index_config, "build_seconds": 0.0, "rebuilt": False}
+        if current is not None:
+            # Rebuilding after more data arrived, the old index no longer fits
+            self.collection.release()
+            self.collection.drop_index()
+
+        start = time.perf_counter()
+        self.create_index({
+            "index_type": config["index_type"],
+            "metric_type": config["metric_type"],
+            "params": config["params"]})
+        self.index_build_seconds = round(time.perf_counter() - start, 3)
+        self.index_config = config
+        logging.info(
+            f"Built {config['index_type']} index {config['params']} over {num_vectors} vectors "
+            f"in {self.index_build_seconds} seconds")
+        return {"config": config, "build_seconds": self.index_build_seconds, "rebuilt": True}
+
+    def needs_rebuild(self, current: dict, config: dict):
+        if not self.shared:
+            return True
+        if current.get("index_type") != config["index_type"]:
+            return True
+        # Only rebuild IVF indexes once the list count is off by 4x or more
+        current_nlist = current.get("params", {}).get("nlist")
+        wanted_nlist = config["params"].get("nlist")
+        if current_nlist and wanted_nlist:
+            return max(current_nlist, wanted_nlist) / min(current_nlist, wanted_nlist) >= 4
+        return False
+
+
+# Frames whose feature and detection files are parsed ahead of the writer
+READ_AHEAD_FRAMES = 64
+
+
+def frame_sort_key(frame_id: str):
+    # frame_120.jpg sorts after frame_20.jpg, anything else falls back to the name
+    match = re.search(r"(\d+)(?:\.\w+)?$", frame_id)
+    return (0, int(match.group(1)), frame_id) if match else (1, 0, frame_id)
+
+
+def estimate_row_bytes(row: dict):
+    size = 0
+    for value in row.values():
+        if isinstance(value, str):
+            size += len(value)
+        elif isinstance(value, np.ndarray):
+            size += value.nbytes
+        elif isinstance(value, (list, tuple)) and (not value or isinstance(value[0], float)):
+            size += 4 * len(value)
+        elif isinstance(value, (list, tuple, dict)):
+            size += len(json.dumps(value))
+        else:
+            size += 8
+    return size
+
+
+class ColumnarBatchWriter:
+    """Accumulate rows into column-oriented batches and insert them in the background.
+
+    Batches are cut by estimated payload size rather than row count, between
+    frames so a frame's rows are inserted together, up to ``max_in_flight``
+    inserts run concurrently over the client's connection, and the collection
+    is flushed once when the writer is closed. ``on_batch`` is called with the
+    frame names of every inserted batch, in insertion order. With ``replace``
+    rows already stored for those frames are deleted before the insert, on
+    the submitting thread so only one thread at a time loads the collection.
+    """
+
+    def __init__(self, milvus_client, max_batch_bytes: int, max_in_flight: int,
+                 on_batch=None, replace: bool = False):
+        self.milvus_client = milvus_client
+        self.on_batch = on_batch
+        self.replace = replace
+        self.max_batch_bytes = max_batch_bytes
+        self.max_in_flight = max_in_flight
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="milvus-insert")
+        self.in_flight = []
+        self.columns = None
+        self.batch_bytes = 0
+        self.rows_inserted = 0
+        self.batches_inserted = 0
+        self.started_at = None
+
+    def add_rows(self, rows: list):
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        for row in rows:
+            if self.columns is None:
+                self.columns = {name: [] for name in row}
+            for name, value in row.items():
+                self.columns[name].append(value)
+            self.batch_bytes += estimate_row_bytes(row)
+        if self.batch_bytes >= self.max_batch_bytes:
+            self.submit_batch()
+
+    def submit_batch(self):
+        if not self.columns:
+            return
+        columns, self.columns, self.batch_bytes = self.columns, None, 0
+        # Backpressure: wait for the oldest insert before exceeding the limit
+        while len(self.in_flight) >= self.max_in_flight:
+            self.collect(self.in_flight.pop(0))
+        frames = list(dict.fromkeys(columns["frame_name"]))
+        if self.replace:
+            self.milvus_client.delete_frames(columns["video_id"][0], frames)
+        self.in_flight.append(
+            self.executor.submit(self.insert, columns, frames))
+
+    def insert(self, columns: dict, frames: list):
+        start = time.perf_counter()
+        row_count = self.milvus_client.insert_columns(columns)
+        metrics.observe("qyv_milvus_insert_seconds", time.perf_counter() - start)
+        metrics.inc("qyv_milvus_rows_total", row_count)
+        return row_count, frames
+
+    def collect(self, future):
+        row_count, frames = future.result()
+        self.rows_inserted += row_count
+        self.batches_inserted += 1
+        if self.on_batch is not None:
+            self.on_batch(frames)
+
+    def abort(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def close(self):
+        try:
+            self.submit_batch()
+            while self.in_flight:
+                self.collect(self.in_flight.pop(0))
+            if self.rows_inserted:
+                self.milvus_client.flush()
+        finally:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        return {
+            "rows": self.rows_inserted,
+            "batches": self.batches_inserted,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_inserted / elapsed, 2) if elapsed > 0 else 0.0
+        }
+
 
 class IngestToMilvus:
     def __init__(self, frames_dir: str,
-                 milvus_client: MilvusClient, batch_size=100):
+                 milvus_client: MilvusClient, max_batch_bytes=None,
+                 max_in_flight=None, frame_ranges=None, video_id: str = "",
+                 space=None, ingested=None, on_ingested=None, resume: bool = False):
         self.frames_dir = frames_dir
+        self.video_id = video_id
         self.milvus_client = milvus_client
-        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes or int(
+            os.getenv("MILVUS_INSERT_BATCH_BYTES", 16 * 1024 * 1024))
+        self.max_in_flight = max_in_flight or int(
+            os.getenv("MILVUS_INSERTS_IN_FLIGHT", 2))
+        # Frame name -> {"start", "end"}, read from frame_ranges.json when not given
+        self.frame_ranges = frame_ranges
+        # Reduction applied to the features, shared by the library unless injected
+        self.space = space or feature_space
+        # Frames held back until the library's PCA projection is fitted
+        self.pending = []
+        # Resuming skips the frames a previous attempt stored and replaces
+        # whatever its unconfirmed batches left of the others
+        self.resume = resume
+        self.ingested = set(ingested or ())
+        # Called with the frame names of every batch once it was inserted
+        self.on_ingested = on_ingested
+        self.writer = None
+        self.stats = None
         logging.basicConfig(level=logging.INFO)
 
+    def load_frame_ranges(self):
+        ranges_path = os.path.join(self.frames_dir, FRAME_RANGES_FILE)
+        if not os.path.exists(ranges_path):
+            return {}
+        with open(ranges_path, 'r') as f:
+            return json.load(f)
+
+    def pair_files(self):
+        """Join feature and detection files by frame id, ordered by frame number."""
+        feature_files = {}
+        detection_files = {}
+        for f in os.listdir(self.frames_dir):
+            if f.endswith('_features.json'):
+                feature_files[f[:-len('_features.json')]] = f
+            elif f.endswith('_detections.json'):
+                detection_files[f[:-len('_detections.json')]] = f
+
+        unmatched = feature_files.keys() ^ detection_files.keys()
+        if unmatched:
+            logging.warning(
+                f"Skipping {len(unmatched)} frames missing features or detections: {sorted(unmatched)[:10]}")
+        return [
+            (frame_id, feature_files[frame_id], detection_files[frame_id])
+            for frame_id in sorted(feature_files.keys() & detection_files.keys(), key=frame_sort_key)]
+
     def ingest_data(self):
-        feature_files = [
-            f for f in os.listdir(
-                self.frames_dir) if f.endswith('_features.json')]
-        detection_files = [
-            f for f in os.listdir(
-                self.frames_dir) if f.endswith('_detections.json')]
+        if self.frame_ranges is None:
+            self.frame_ranges = self.load_frame_ranges()
+        pairs = self.pair_files()
 
+        try:
+            frames = self.load_frames(pairs)
+            try:
+                self.ingest_frames(frame for frame in frames if frame is not None)
+            finally:
+                frames.close()
+            return self.finish()
+        except Exception:
+            # Stop the insert threads, a long-lived worker would otherwise keep them
+            self.abort()
+            raise
+
+    def load_frames(self, pairs: list):
+        """Parse the JSON files ahead of the writer, keeping frame order.
+
+        Only ``READ_AHEAD_FRAMES`` frames are read ahead, the writer bounds
+        what is held in memory after that.
+        """
         with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = []
-            for feature_file, detection_file in zip(
-                    feature_files, detection_files):
-                futures.append(
-                    executor.submit(
-                        self.process_files,
-                        feature_file,
-                        detection_file))
-
-            for future in as_completed(futures):
-                future.result()
-
-    def process_files(self, feature_file, detection_file):
-        feature_path = os.path.join(self.frames_dir, feature_file)
-        detection_path = os.path.join(self.frames_dir, detection_file)
+            ahead = deque()
+            for pair in pairs:
+                ahead.append(executor.submit(self.load_frame, *pair))
+                if len(ahead) >= READ_AHEAD_FRAMES:
+                    yield ahead.popleft().result()
+            while ahead:
+                yield ahead.popleft().result()
 
+    def load_frame(self, frame_id, feature_file, detection_file):
         try:
-            with open(feature_path, 'r') as f:
+            with open(os.path.join(self.frames_dir, feature_file), 'r') as f:
                 features_data = json.load(f)
-            with open(detection_path, 'r') as f:
+            with open(os.path.join(self.frames_dir, detection_file), 'r') as f:
                 detections_data = json.load(f)
-
-            batch_data = []
-            for detection in detections_data['detections']:
-                if len(features_data['features']) != 1000:
-                    logging.error(
-                        f"Feature vector length for frame {features_data['frame']} does not match expected length of 1000")
-                    continue
-
-                data = {
-                    "frame_name": features_data['frame'],
-                    "object_class": detection['name'],
-                    "confidence": detection['confidence'],
-                    "vector": features_data['features']
-                }
-                batch_data.append(data)
-
-                if len(batch_data) >= self.batch_size:
-                    self.milvus_client.insert_data(batch_data)
-                    logging.info(
-                        f"Inserted batch data for frames: {[data['frame_name'] for data in batch_data]}")
-                    batch_data.clear()
-
-            # Insert any remaining data
-            if batch_data:
-                self.milvus_client.insert_data(batch_data)
-                logging.info(
-                    f"Ingested batch data for frame: {features_data['frame']}")
-
         except Exception as e:
             logging.error(
                 f"Error processing files {feature_file} and {detection_file}: {e}")
+            return None
+
+        if features_data['frame'] != detections_data['frame']:
+            logging.error(
+                f"Frame mismatch for {frame_id}: {features_data['frame']} != {detections_data['frame']}")
+            return None
+        return features_data['frame'], features_data['features'], detections_data['detections']
+
+    def build_rows(self, frame: str, features: list, detections: list):
+        if len(features) != self.space.raw_dim:
+            logging.error(
+                f"Feature vector length for frame {frame} does not match expected length of {self.space.raw_dim}")
+            return []
+        layout = getattr(self.milvus_client, "layout", "detection")
+        if not detections and layout == "detection":
+            return []
+
+        vector = self.space.milvus_vectors([features])[0]
+        time_range = (self.frame_ranges or {}).get(frame, {})
+        if layout == "frame":
+            # Frames without detections are kept, they can still be found by similarity
+            return [dict(
+                frame_detections(detections),
+                video_id=self.video_id,
+                frame_name=frame,
+                start_time=time_range.get("start", 0.0),
+                end_time=time_range.get("end", 0.0),
+                vector=vector)]
+        return [
+            {
+                "video_id": self.video_id,
+                "frame_name": frame,
+                "object_class": detection['name'],
+                "confidence": detection['confidence'],
+                "start_time": time_range.get("start", 0.0),
+                "end_time": time_range.get("end", 0.0),
+                "vector": vector
+            }
+            for detection in detections]
+
+    def ingest_frames(self, frames):
+        """Queue (frame, features, detections) tuples held in memory for insertion.
+
+        Call ``finish`` once every frame was queued to drain the pending inserts
+        and flush the collection.
+        """
+        if self.writer is None:
+            self.writer = ColumnarBatchWriter(
+                self.milvus_client, self.max_batch_bytes, self.max_in_flight,
+                on_batch=self.on_ingested, replace=self.resume)
+        for frame, features, detections in frames:
+            if frame in self.ingested:
+                continue
+            if self.pending or self.space.needs_fit:
+                self.pending.append((frame, features, detections))
+                if len(self.pending) >= self.space.fit_samples:
+                    self.fit_space()
+                continue
+            self.writer.add_rows(self.build_rows(frame, features, detections))
+
+    def fit_space(self):
+        # The first frames ingested into the library define its projection
+        pending, self.pending = self.pending, []
+        if self.space.needs_fit:
+            vectors = [features for _, features, _ in pending if len(features) == self.space.raw_dim]
+            if len(vectors) < self.space.fit_samples:
+                vectors += self.earlier_features(self.space.fit_samples - len(vectors))
+            # Too few frames keep the random stand-in, a later upload fits the PCA
+            self.space.fit(vectors)
+        for frame, features, detections in pending:
+            self.writer.add_rows(self.build_rows(frame, features, detections))
+
+    def earlier_features(self, count: int) -> list:
+        """Features saved by earlier uploads, next to this video's frame directory."""
+        frames_root = os.path.dirname(os.path.abspath(self.frames_dir))
+        frames_dir = os.path.abspath(self.frames_dir)
+        others = [os.path.join(frames_root, name) for name in sorted(os.listdir(frames_root))]
+        return load_feature_files(
+            [path for path in others if path != frames_dir and os.path.isdir(path)],
+            dim=self.space.raw_dim, limit=count)
+
+    def finish(self):
+        if self.pending and self.writer is not None:
+            self.fit_space()
+        if self.writer is None:
+            return self.stats
+        writer, self.writer = self.writer, None
+        self.stats = writer.close()
+        logging.info(
+            f"Ingested {self.stats['rows']} rows in {self.stats['batches']} batches into "
+            f"{self.milvus_client.collection_name} ({self.stats['rows_per_second']} rows/s)")
+        return self.stats
+
+    def abort(self):
+        # Drop pending inserts without flushing, used when the pipeline failed
+        self.pending = []
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
 
 
 # Example usage
@@ -144,4 +763,4 @@ if __name__ == "__main__":
     milvus_client = MilvusClient()
     ingester = IngestToMilvus(frames_dir, milvus_client)
     ingester.ingest_data()
-    milvus_client.create_index()
+    milvus_client.build_index()
@@ -0,0 +1,224 @@
+# src/pipelines/metrics.py
+import logging
+import math
+import os
+import threading
+import time
+
+# Upper bounds in seconds, per-item latencies sit at the low end, stages at the high end
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+METRIC_HELP = {
+    "qyv_stage_seconds": ("histogram", "Wall time of a pipeline stage"),
+    "qyv_item_seconds": ("histogram", "Time spent on one item of a stage"),
+    "qyv_items_total": ("counter", "Items processed by a stage"),
+    "qyv_cache_hits_total": ("counter", "Items a stage answered from the result cache"),
+    "qyv_audio_chunks_total": ("counter", "Audio chunks by classification"),
+    "qyv_milvus_rows_total": ("counter", "Rows inserted into Milvus"),
+    "qyv_milvus_insert_seconds": ("histogram", "Latency of one columnar Milvus insert"),
+    "qyv_jobs_total": ("counter", "Finished upload jobs by status"),
+    "qyv_search_seconds": ("histogram", "Search request latency by kind"),
+    "qyv_model_bytes": ("gauge", "Memory held by a resident model"),
+    "qyv_model_loaded": ("gauge", "Whether a model is resident"),
+    "qyv_process_rss_bytes": ("gauge", "Resident set size of a process")
+}
+
+
+def label_key(labels: dict):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class MetricsRegistry:
+    """Counters, gauges and fixed-bucket histograms keyed by name and labels.
+
+    Each process keeps its own registry; ``snapshot`` returns plain dicts
+    that can cross a process boundary and be combined with ``merge``.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # Reentrant so drain can snapshot and reset under one acquisition
+        self._lock = threading.RLock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[(name, label_key(labels))] = value
+
+    def observe(self, name: str, value: float, count: int = 1, **labels):
+        """Record ``count`` observations of ``value``, a batch's per-item time counts once per item."""
+        key = (name, label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += count
+                    break
+            histogram["sum"] += value * count
+            histogram["count"] += count
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "counters": [[name, list(labels), value]
+                             for (name, labels), value in self._counters.items()],
+                "gauges": [[name, list(labels), value]
+                           for (name, labels), value in self._gauges.items()],
+                "histograms": [[name, list(labels), dict(h, buckets=list(h["buckets"]))]
+                               for (name, labels), h in self._histograms.items()]
+            }
+
+    def drain(self) -> dict:
+        """Snapshot and reset, for handing deltas from a short-lived process to its parent."""
+        with self._lock:
+            snapshot = self.snapshot()
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+        return snapshot
+
+    def merge(self, snapshot: dict):
+        if not snapshot:
+            return
+        if tuple(snapshot["buckets"]) != self.buckets:
+            raise ValueError("Cannot merge histograms with different buckets")
+        with self._lock:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, labels, value in snapshot["gauges"]:
+                self._gauges[(name, tuple(map(tuple, labels)))] = value
+            for name, labels, other in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = self._histograms.setdefault(
+                    key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+                histogram["buckets"] = [a + b for a, b in zip(histogram["buckets"], other["buckets"])]
+                histogram["sum"] += other["sum"]
+                histogram["count"] += other["count"]
+
+    def counter_totals(self) -> dict:
+        """Counters as {"name{labels}": value}, compact enough for a job trace."""
+        with self._lock:
+            return {series_name(name, labels): value
+                    for (name, labels), value in sorted(self._counters.items())}
+
+    def render_prometheus(self) -> str:
+        """The Prometheus text exposition format."""
+        with self._lock:
+            series = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                series.setdefault(name, []).append(f"{series_name(name, labels)} {format_value(value)}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                series.setdefault(name, []).append(f"{series_name(name, labels)} {format_value(value)}")
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                lines = series.setdefault(name, [])
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    cumulative += count
+                    lines.append(f"{series_name(name + '_bucket', labels + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{series_name(name + '_bucket', labels + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{series_name(name + '_sum', labels)} {format_value(histogram['sum'])}")
+                lines.append(f"{series_name(name + '_count', labels)} {histogram['count']}")
+
+        output = []
+        for name in sorted(series):
+            kind, description = METRIC_HELP.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(series[name])
+        return "\n".join(output) + "\n"
+
+
+def series_name(name: str, labels) -> str:
+    if not labels:
+        return name
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in labels)
+    return name + "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(labels, escaped)) + "}"
+
+
+def format_value(value) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+def record_model_gauges(registry: MetricsRegistry, pid, stats: dict):
+    """Model memory gauges from ``model_registry.stats()`` of one process."""
+    registry.set_gauge("qyv_process_rss_bytes", stats.get("rss_bytes", 0), pid=pid)
+    for model, model_stats in stats.get("models", {}).items():
+        registry.set_gauge("qyv_model_loaded", int(bool(model_stats["loaded"])), model=model, pid=pid)
+        registry.set_gauge("qyv_model_bytes", model_stats.get("parameter_bytes") or 0,
+                           model=model, pid=pid, kind="parameters")
+        registry.set_gauge("qyv_model_bytes", model_stats.get("rss_delta_bytes") or 0,
+                           model=model, pid=pid, kind="rss_delta")
+
+
+class JobTrace:
+    """Stage spans of one job, returned with its result when JOB_TRACE is on."""
+
+    def __init__(self, job_id: str = None):
+        self.job_id = job_id
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def add(self, stage: str, seconds: float, end: float = None, **attributes):
+        """Record a finished span, ``end`` is a ``perf_counter`` value and defaults to now."""
+        end = (time.perf_counter() if end is None else end) - self._origin
+        with self._lock:
+            self.spans.append(dict(attributes, stage=stage, start=round(max(end - seconds, 0.0), 3),
+                                   seconds=round(seconds, 3), thread=threading.current_thread().name))
+
+    def to_dict(self, counters: dict = None) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start"])
+        return {"job_id": self.job_id, "started_at": self.started_at, "spans": spans,
+                "counters": counters or {}}
+
+
+class LogSampler:
+    """Emit at most one message per key every ``interval`` seconds.
+
+    Per-item progress lines add up to a real cost on long videos; the
+    suppressed count is reported with the next message that gets through.
+    """
+
+    def __init__(self, interval: float = None):
+        self.interval = interval if interval is not None else float(os.getenv("LOG_SAMPLE_SECONDS", 5))
+        self._lock = threading.Lock()
+        self._last = {}
+        self._suppressed = {}
+
+    def log(self, logger, key: str, message: str, *args, level=logging.INFO):
+        """%-style ``args`` are only formatted for messages that are emitted."""
+        if not logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            message += f" ({suppressed} similar messages suppressed)"
+        logger.log(level, message, *args)
+
+
+metrics = MetricsRegistry()
+log_sampler = LogSampler()
@@ -0,0 +1,127 @@
+# src/pipelines/migrate_milvus_layout.py
+import argparse
+import logging
+from pymilvus import utility
+from src.pipelines.ingest_to_milvus import (
+    MILVUS_SHARED_COLLECTION, SEARCH_OUTPUT_FIELDS, ColumnarBatchWriter, MilvusClient,
+    frame_detections, list_video_collections, video_id_for_collection)
+
+# Source collections are kept under this prefix unless dropped and frame rows are
+# written under the other one, both outside object_detection_ so they are not listed as videos
+BACKUP_PREFIX = "backup_"
+MIGRATION_PREFIX = "migrating_"
+
+
+def frame_groups(collection, batch_size: int, video_id: str = None):
+    """Detection rows grouped by frame.
+
+    The ingestor inserts all rows of a frame in one batch, so they hold
+    consecutive primary keys and arrive together in primary key order.
+    Collections created before video ids and frame times were stored only
+    return the fields they have, their rows belong to ``video_id``.
+    """
+    stored = {field.name for field in collection.schema.fields}
+    iterator = collection.query_iterator(
+        batch_size=batch_size, expr="frame_id >= 0",
+        output_fields=[name for name in SEARCH_OUTPUT_FIELDS + ["vector"] if name in stored])
+    group, key = [], None
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            for row in rows:
+                row_key = (row.get("video_id", video_id), row["frame_name"])
+                if group and row_key != key:
+                    yield group
+                    group = []
+                group.append(row)
+                key = row_key
+    finally:
+        iterator.close()
+    if group:
+        yield group
+
+
+def frame_row(group: list, video_id: str = None):
+    first = group[0]
+    detections = [{"name": row["object_class"], "confidence": row["confidence"]} for row in group]
+    return dict(
+        frame_detections(detections),
+        video_id=first.get("video_id", video_id),
+        frame_name=first["frame_name"],
+        start_time=first.get("start_time", 0.0),
+        end_time=first.get("end_time", 0.0),
+        vector=first["vector"])
+
+
+def migrate_collection(collection_name: str, host='localhost', port='19530',
+                       batch_size: int = 1000, max_batch_bytes: int = 16 * 1024 * 1024,
+                       drop_source: bool = False):
+    """Rewrite a one-row-per-detection collection with one row per frame.
+
+    The frame rows are written to a new collection that takes the original
+    name once complete; the source is dropped or kept as ``backup_<name>``.
+    Frames without detections were never stored and cannot be recovered,
+    neither can the frame times of collections that predate them.
+    """
+    shared = collection_name == MILVUS_SHARED_COLLECTION
+    # Rows of old per-video collections do not store their video id
+    video_id = None if shared else video_id_for_collection(collection_name)
+    source = MilvusClient(host=host, port=port, collection_name=collection_name,
+                          drop_existing=False, shared=shared)
+    if source.layout == "frame":
+        logging.info(f"{collection_name} already stores one row per frame")
+        return None
+    target_name = MIGRATION_PREFIX + collection_name
+    if utility.has_collection(target_name):
+        # Left over by an interrupted migration
+        utility.drop_collection(target_name)
+    target = MilvusClient(host=host, port=port, collection_name=target_name, drop_existing=False,
+                          shared=shared, dim=source.vector_dim, dtype=source.vector_dtype,
+                          layout="frame")
+
+    source.ensure_loaded()
+    writer = ColumnarBatchWriter(target, max_batch_bytes, max_in_flight=2)
+    detection_rows = 0
+    try:
+        for group in frame_groups(source.collection, batch_size, video_id):
+            detection_rows += len(group)
+            writer.add_rows([frame_row(group, video_id)])
+    except Exception:
+        writer.abort()
+        utility.drop_collection(target_name)
+        raise
+    stats = writer.close()
+    target.build_index()
+
+    source.collection.release()
+    if drop_source:
+        utility.drop_collection(collection_name)
+    else:
+        utility.rename_collection(collection_name, BACKUP_PREFIX + collection_name)
+    target.collection.release()
+    utility.rename_collection(target_name, collection_name)
+    logging.info(
+        f"Migrated {collection_name}: {detection_rows} detection rows into {stats['rows']} frame rows")
+    return {"collection": collection_name, "detection_rows": detection_rows, "frame_rows": stats["rows"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move Milvus collections to one row per frame")
+    parser.add_argument("collections", nargs="*", help="Collections to migrate, every video collection when omitted")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", default="19530")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows read per query")
+    parser.add_argument("--drop-source", action="store_true",
+                        help=f"Drop the migrated collections instead of keeping them as {BACKUP_PREFIX}<name>")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    for collection_name in args.collections or list_video_collections(args.host, args.port):
+        migrate_collection(collection_name, args.host, args.port, args.batch_size,
+                           drop_source=args.drop_source)
+
+
+if __name__ == "__main__":
+    main()
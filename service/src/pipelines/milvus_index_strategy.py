@@ -0,0 +1,77 @@
+# src/pipelines/milvus_index_strategy.py
+import math
+import os
+
+# Below this many vectors a brute-force scan beats any index
+FLAT_MAX_VECTORS = 10_000
+# Above this many vectors IVF_SQ8 keeps the index at a quarter of the float size
+SQ8_MIN_VECTORS = 1_000_000
+
+
+class MilvusIndexStrategy:
+    def __init__(self, index_type: str = None, metric_type: str = None,
+                 recall_target: float = None, latency_target_ms: float = None):
+        # "auto" picks from the collection size, anything else forces that index
+        self.index_type = (index_type or os.getenv("MILVUS_INDEX_TYPE", "auto")).upper()
+        self.metric_type = metric_type or os.getenv("MILVUS_METRIC_TYPE", "L2")
+        self.recall_target = recall_target if recall_target is not None else float(
+            os.getenv("MILVUS_RECALL_TARGET", 0.95))
+        self.latency_target_ms = latency_target_ms if latency_target_ms is not None else float(
+            os.getenv("MILVUS_LATENCY_TARGET_MS", 50))
+
+    def choose(self, num_vectors: int, dim: int):
+        """Return the index and default search parameters for a collection."""
+        index_type = self.index_type
+        if index_type == "AUTO":
+            index_type = self.auto_index_type(num_vectors)
+
+        if index_type == "FLAT":
+            params, search_params = {}, {}
+        elif index_type == "HNSW":
+            params, search_params = self.hnsw_params()
+        elif index_type in ("IVF_FLAT", "IVF_SQ8"):
+            params, search_params = self.ivf_params(num_vectors)
+        else:
+            raise ValueError(f"Unsupported index type: {index_type}")
+
+        return {
+            "index_type": index_type,
+            "metric_type": self.metric_type,
+            "params": params,
+            "search_params": search_params,
+            "num_vectors": num_vectors,
+            "dim": dim
+        }
+
+    def auto_index_type(self, num_vectors: int):
+        if num_vectors <= FLAT_MAX_VECTORS:
+            return "FLAT"
+        # HNSW answers in a few ms at high recall, at the cost of memory and build time
+        if self.latency_target_ms <= 10 or self.recall_target >= 0.98:
+            return "HNSW"
+        return "IVF_SQ8" if num_vectors >= SQ8_MIN_VECTORS else "IVF_FLAT"
+
+    def ivf_params(self, num_vectors: int):
+        # The usual 4 * sqrt(n) lists, rounded to a power of two
+        nlist = 2 ** round(math.log2(max(16, 4 * math.sqrt(num_vectors))))
+        nlist = min(65536, nlist)
+        return {"nlist": nlist}, {"nprobe": self.nprobe(nlist)}
+
+    def nprobe(self, nlist: int):
+        probe_fraction = 1 / 16 if self.recall_target >= 0.95 else 1 / 64
+        return max(8, min(nlist, int(nlist * probe_fraction)))
+
+    def hnsw_params(self):
+        m = 32 if self.recall_target >= 0.98 else 16
+        return {"M": m, "efConstruction": 200}, {"ef": self.ef()}
+
+    def ef(self):
+        return 256 if self.recall_target >= 0.98 else 96
+
+    def search_params(self, index_type: str, params: dict):
+        """Default search parameters for an index that is already built."""
+        if index_type in ("IVF_FLAT", "IVF_SQ8") and params.get("nlist"):
+            return {"nprobe": self.nprobe(int(params["nlist"]))}
+        if index_type == "HNSW":
+            return {"ef": self.ef()}
+        return {}
@@ -0,0 +1,189 @@
+# src/pipelines/model_registry.py
+import gc
+import logging
+import os
+import threading
+import time
+
+import torch
+from transformers import SwinForImageClassification, SwinModel
+from src.pipelines.feature_space import FEATURE_MODE
+from src.pipelines.inference_backends import apply_backend, backend_tag
+
+SWIN_MODEL_NAME = "microsoft/swin-base-patch4-window7-224"
+YOLO_REPO = "ultralytics/yolov5"
+YOLO_MODEL_NAME = "yolov5s"
+
+# Part of every cache key, bump when weights or preprocessing change
+MODEL_VERSIONS = {
+    "swin": f"{SWIN_MODEL_NAME}:{FEATURE_MODE}:224{backend_tag('swin')}",
+    "yolov5": f"{YOLO_REPO}/{YOLO_MODEL_NAME}{backend_tag('yolov5')}"
+}
+
+
+def load_swin():
+    # The embedding mode only needs the backbone, its pooler output is the feature
+    model_class = SwinModel if FEATURE_MODE == "embedding" else SwinForImageClassification
+    model = model_class.from_pretrained(SWIN_MODEL_NAME)
+    model.eval()
+    return apply_backend("swin", model, MODEL_VERSIONS["swin"])
+
+
+def load_yolov5():
+    model = torch.hub.load(YOLO_REPO, YOLO_MODEL_NAME, pretrained=True)
+    model.eval()
+    return apply_backend("yolov5", model, MODEL_VERSIONS["yolov5"])
+
+
+def current_rss_bytes():
+    # /proc is only available on Linux, other platforms report no RSS
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def available_memory_bytes(device=None):
+    if device is not None and torch.device(device).type == "cuda":
+        free_bytes, _ = torch.cuda.mem_get_info(device)
+        return free_bytes
+    try:
+        with open("/proc/meminfo", "r") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def model_size_bytes(model):
+    if not isinstance(model, torch.nn.Module):
+        return None
+    size = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        size += tensor.numel() * tensor.element_size()
+    return size
+
+
+class ModelRegistry:
+    def __init__(self, idle_timeout: float = 0, check_interval: float = 60):
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self._loaders = {}
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._reaper = None
+        # Called with the model name after an eviction, to free copies held elsewhere
+        self._evict_callbacks = []
+
+    def register(self, name: str, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self._stats.setdefault(name, {
+                "loaded": False,
+                "load_count": 0,
+                "load_seconds": None,
+                "parameter_bytes": None,
+                "rss_delta_bytes": None,
+                "last_used": None
+            })
+
+    def get(self, name: str):
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"Model {name} is not registered")
+            if name not in self._models:
+                self._load(name)
+            self._stats[name]["last_used"] = time.time()
+            return self._models[name]
+
+    def _load(self, name: str):
+        logging.info(f"Loading model {name}")
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        model = self._loaders[name]()
+        load_seconds = time.perf_counter() - start
+        rss_after = current_rss_bytes()
+
+        self._models[name] = model
+        stats = self._stats[name]
+        stats["loaded"] = True
+        stats["load_count"] += 1
+        stats["load_seconds"] = round(load_seconds, 3)
+        stats["parameter_bytes"] = model_size_bytes(model)
+        if rss_before is not None and rss_after is not None:
+            stats["rss_delta_bytes"] = rss_after - rss_before
+        logging.info(
+            f"Loaded model {name} in {load_seconds:.2f} seconds "
+            f"({stats['parameter_bytes']} parameter bytes)")
+
+    def on_evict(self, callback):
+        self._evict_callbacks.append(callback)
+
+    def warm_up(self, names=None):
+        for name in names or list(self._loaders):
+            self.get(name)
+
+    def evict(self, name: str):
+        with self._lock:
+            if self._models.pop(name, None) is None:
+                return False
+            self._stats[name]["loaded"] = False
+        for callback in self._evict_callbacks:
+            callback(name)
+        gc.collect()
+        logging.info(f"Evicted model {name}")
+        return True
+
+    def evict_idle(self):
+        if not self.idle_timeout:
+            return []
+        now = time.time()
+        with self._lock:
+            idle = [
+                name for name in self._models
+                if now - (self._stats[name]["last_used"] or 0) > self.idle_timeout]
+        return [name for name in idle if self.evict(name)]
+
+    def start_idle_eviction(self):
+        if not self.idle_timeout or self._reaper is not None:
+            return
+        self._stop_event.clear()
+        self._reaper = threading.Thread(
+            target=self._reap, name="model-registry-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop_idle_eviction(self):
+        if self._reaper is None:
+            return
+        self._stop_event.set()
+        self._reaper.join()
+        self._reaper = None
+
+    def _reap(self):
+        while not self._stop_event.wait(self.check_interval):
+            self.evict_idle()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "idle_timeout": self.idle_timeout,
+                "rss_bytes": current_rss_bytes(),
+                "models": {name: dict(stats) for name, stats in self._stats.items()}
+            }
+
+
+# Process-wide registry shared by the API and the pipeline classes
+model_registry = ModelRegistry(
+    idle_timeout=float(os.getenv("MODEL_IDLE_TIMEOUT", 0)),
+    check_interval=float(os.getenv("MODEL_IDLE_CHECK_INTERVAL", 60)))
+model_registry.register("swin", load_swin)
+model_registry.register("yolov5", load_yolov5)
@@ -0,0 +1,194 @@
+# src/pipelines/parallel_video_pipeline.py
+import logging
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.reduction import ForkingPickler
+import cv2
+import torch
+import torch.multiprocessing  # noqa: F401 - registers the shared memory reductions for tensors
+from PIL import Image
+from src.pipelines.detect_objects_from_frames import DetectObjectsFromFrames
+from src.pipelines.extract_features_from_frames import ExtractFeaturesFromFrames
+from src.pipelines.metrics import metrics
+from src.pipelines.model_registry import model_registry
+from src.pipelines.result_cache import result_cache
+
+logger = logging.getLogger(__name__)
+
+# Set in each inference worker by init_inference_worker
+_worker = {}
+
+
+def module_roots(model):
+    """Directories a model's classes are imported from, e.g. the YOLOv5 hub checkout."""
+    roots = set()
+    for module in model.modules() if hasattr(model, "modules") else [model]:
+        name = type(module).__module__
+        path = getattr(sys.modules.get(name), "__file__", None)
+        if path is None or name.split(".")[0] in ("torch", "transformers", "builtins"):
+            continue
+        for _ in name.split("."):
+            path = os.path.dirname(path)
+        roots.add(path)
+    return sorted(roots)
+
+
+def load_shared_model(name: str, payload, roots: list):
+    # Appended rather than prepended, hub checkouts ship generic package names like utils
+    for root in roots:
+        if root not in sys.path:
+            sys.path.append(root)
+    if payload is not None:
+        try:
+            return pickle.loads(payload)
+        except Exception as e:
+            logger.warning(f"Could not map the shared {name} weights, loading a private copy: {e}")
+    return model_registry.get(name)
+
+
+class SharedModel:
+    """Hands a resident model to a spawned worker without copying its weights.
+
+    Parameters are moved to shared memory once; pickling then only sends
+    handles, so every worker maps the same read-only pages. Workers that
+    cannot rebuild the model load their own copy from the registry.
+    """
+
+    def __init__(self, name: str, model):
+        self.name = name
+        self.model = model
+        if hasattr(model, "share_memory"):
+            model.share_memory()
+
+    def __reduce__(self):
+        # Pickled once per spawned worker, each gets its own file descriptor handles
+        try:
+            payload = bytes(ForkingPickler.dumps(self.model))
+        except Exception as e:
+            logger.warning(f"Could not share {self.name} weights, workers will load their own: {e}")
+            payload = None
+        return load_shared_model, (self.name, payload, module_roots(self.model))
+
+
+def init_inference_worker(swin, yolov5, num_threads: int):
+    logging.basicConfig(level=logging.INFO)
+    # Workers split the cores between them instead of each using all of them
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Already fixed once inter-op work ran
+    # Only process_batch is used, which works in memory; the directory is never written
+    scratch_dir = tempfile.gettempdir()
+    _worker["features"] = ExtractFeaturesFromFrames(
+        scratch_dir, model=swin, num_workers=0, cache=result_cache)
+    _worker["detections"] = DetectObjectsFromFrames(
+        scratch_dir, model=yolov5, cache=result_cache)
+
+
+def infer_shard(names: list, frames: list):
+    """Features and detection records of one shard of RGB frames, in order."""
+    images = [Image.fromarray(frame) for frame in frames]
+    features = _worker["features"].process_batch(images)
+    detector = _worker["detections"]
+    detections = [detector.to_records(result) for result in detector.process_batch(images)]
+    # The parent merges these into the job's metrics
+    return names, features, detections, metrics.drain()
+
+
+def resolve_parallelism(workers: int = None, threads: int = None):
+    # Cores are shared with the other job workers on the node
+    cores = max(1, (os.cpu_count() or 1) // max(1, int(os.getenv("JOB_WORKERS", 1))))
+    workers = workers or int(os.getenv("PARALLEL_WORKERS", max(1, cores // 2)))
+    threads = threads or int(os.getenv("PARALLEL_TORCH_THREADS", max(1, cores // workers)))
+    return workers, threads
+
+
+def build_inference_executor(workers: int = None, threads: int = None):
+    workers, threads = resolve_parallelism(workers, threads)
+    logger.info(f"Starting {workers} inference workers with {threads} torch threads each")
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_inference_worker,
+        initargs=(SharedModel("swin", model_registry.get("swin")),
+                  SharedModel("yolov5", model_registry.get("yolov5")), threads))
+
+
+class ParallelVideoPipeline:
+    """Decode a video here and run inference on shards of frames across processes.
+
+    Shards are submitted in frame order and merged in the same order, so
+    ingestion sees the frames exactly as the streaming pipeline would. At
+    most ``max_in_flight`` shards are decoded ahead of the merge.
+    """
+
+    def __init__(self, frame_extractor, feature_extractor, object_detector,
+                 ingestor, executor, shard_size: int = None, max_in_flight: int = None,
+                 persist: bool = None):
+        self.frame_extractor = frame_extractor
+        self.feature_extractor = feature_extractor
+        self.object_detector = object_detector
+        self.ingestor = ingestor
+        self.executor = executor
+        self.shard_size = shard_size or int(os.getenv("PARALLEL_SHARD_FRAMES", 8))
+        # Enough queued shards to keep every worker busy while the next ones decode
+        self.max_in_flight = max_in_flight or 2 * resolve_parallelism()[0]
+        self.persist = persist if persist is not None else os.getenv(
+            "DEBUG_PERSISTENCE", "false").lower() == "true"
+        self.ingestor.frame_ranges = self.frame_extractor.frame_ranges
+        self.frames_processed = 0
+
+    def run(self):
+        start = time.perf_counter()
+        pending = deque()
+        try:
+            for names, frames in self.shards():
+                pending.append(self.executor.submit(infer_shard, names, frames))
+                while len(pending) > self.max_in_flight:
+                    self.merge(*pending.popleft().result())
+            while pending:
+                self.merge(*pending.popleft().result())
+        except Exception:
+            for future in pending:
+                future.cancel()
+            self.ingestor.abort()
+            raise
+        self.ingestor.finish()
+        if self.persist:
+            self.frame_extractor.save_frame_ranges()
+
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"Processed {self.frames_processed} frames in parallel in {elapsed:.2f} seconds "
+            f"({self.frames_processed / elapsed if elapsed > 0 else 0:.2f} fps)")
+        return self.frames_processed
+
+    def shards(self):
+        names, frames = [], []
+        for frame_number, _, frame in self.frame_extractor.iter_frames():
+            name = self.frame_extractor.frame_name(frame_number)
+            if self.persist:
+                cv2.imwrite(os.path.join(self.frame_extractor.output_dir, name), frame)
+            names.append(name)
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if len(names) >= self.shard_size:
+                yield names, frames
+                names, frames = [], []
+        if names:
+            yield names, frames
+
+    def merge(self, names: list, features: list, detections: list, worker_metrics: dict):
+        metrics.merge(worker_metrics)
+        if self.persist:
+            for name, frame_features, frame_detections in zip(names, features, detections):
+                self.feature_extractor.save_features(name, frame_features)
+                self.object_detector.save_detections(name, frame_detections)
+        self.ingestor.ingest_frames(zip(names, features, detections))
+        self.frames_processed += len(names)
@@ -0,0 +1,378 @@
+# src/pipelines/pipeline_orchestrator.py
+import os
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from functools import partial
+from src.pipelines.extract_frames_from_video import FRAME_RANGES_FILE, ExtractFramesFromVideo
+from src.pipelines.extract_features_from_frames import ExtractFeaturesFromFrames
+from src.pipelines.extract_audio_and_transcribe_video import TRANSCRIBER_VERSION, transcribe_video
+from src.pipelines.filter_redundant_frames import FilterRedundantFrames
+from src.pipelines.handle_video_file import upload_complete
+from src.pipelines.detect_objects_from_frames import DetectObjectsFromFrames
+from src.pipelines.ingest_to_milvus import MILVUS_ROW_LAYOUT, IngestToMilvus, feature_space
+from src.pipelines.metrics import metrics
+from src.pipelines.model_registry import model_registry, MODEL_VERSIONS
+from src.pipelines.parallel_video_pipeline import ParallelVideoPipeline, build_inference_executor
+from src.pipelines.result_cache import result_cache
+from src.pipelines.stage_manifest import MANIFEST_FILE, StageManifest
+from src.pipelines.stream_video_pipeline import StreamVideoPipeline
+
+# Streaming and parallel modes decode, infer and ingest in one pass, nothing
+# is written between these stages so they complete together
+FUSED_STAGES = ("frames", "features", "detections", "ingest")
+# File name suffixes each stage leaves in the frames directory
+STAGE_OUTPUTS = {
+    "frames": (".jpg", ".png", FRAME_RANGES_FILE),
+    "features": ("_features.json",),
+    "detections": ("_detections.json",)
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+# Parallel jobs using the inference pool, it is only retired once none is left
+_inference_users = 0
+_retire_inference = False
+
+
+def get_audio_executor():
+    # librosa/pydub work runs in its own process so it never holds our GIL;
+    # spawn avoids forking a parent that already has torch threads running
+    with _executors_lock:
+        if "audio" not in _executors:
+            _executors["audio"] = ProcessPoolExecutor(
+                max_workers=int(os.getenv("AUDIO_WORKERS", 1)),
+                mp_context=multiprocessing.get_context("spawn"))
+        return _executors["audio"]
+
+
+def get_visual_executor():
+    # Threads share the resident models, torch releases the GIL while running
+    with _executors_lock:
+        if "visual" not in _executors:
+            _executors["visual"] = ThreadPoolExecutor(
+                max_workers=int(os.getenv("VISUAL_WORKERS", 1)),
+                thread_name_prefix="visual-branch")
+        return _executors["visual"]
+
+
+def get_inference_executor():
+    # Parallel mode shards frames over processes that share the resident weights
+    with _executors_lock:
+        if "inference" not in _executors:
+            _executors["inference"] = build_inference_executor()
+        return _executors["inference"]
+
+
+def discard_executor(name: str, executor):
+    # A dead worker (OOM, segfault) breaks the whole pool, the next job builds a new one
+    with _executors_lock:
+        if _executors.get(name) is not executor:
+            return
+        del _executors[name]
+    logging.warning(f"Discarding the broken {name} process pool")
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+@contextmanager
+def inference_executor():
+    """The shared inference pool, held for the length of one parallel run."""
+    global _inference_users, _retire_inference
+    with _executors_lock:
+        _inference_users += 1
+    try:
+        executor = get_inference_executor()
+        try:
+            yield executor
+        except BrokenProcessPool:
+            discard_executor("inference", executor)
+            raise
+    finally:
+        with _executors_lock:
+            _inference_users -= 1
+            retire = _retire_inference and _inference_users == 0
+        if retire:
+            retire_inference_executor()
+
+
+def retire_inference_executor(name: str = None):
+    """Shut the inference pool down, its workers hold their own copies of the models."""
+    global _retire_inference
+    with _executors_lock:
+        if _inference_users:
+            # Running jobs keep it, the last one to finish shuts it down
+            _retire_inference = "inference" in _executors
+            return
+        _retire_inference = False
+        executor = _executors.pop("inference", None)
+    if executor is not None:
+        logging.info("Shutting the inference pool down after its models were evicted")
+        executor.shutdown(wait=True)
+
+
+# Idle eviction in this process also frees the copies mapped by the pool's workers
+model_registry.on_evict(retire_inference_executor)
+
+
+def shutdown_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+        _executors.clear()
+
+
+def stage_versions(frames_per_second: float, mode: str) -> dict:
+    """What produced the outputs of each stage, a stage is re-run once its version changes."""
+    frame_filter = f"{os.getenv('FRAME_FILTER', 'none')}:{os.getenv('FRAME_FILTER_THRESHOLD', '')}"
+    return {
+        "frames": f"{mode}:{frames_per_second}fps:{frame_filter}",
+        "features": MODEL_VERSIONS["swin"],
+        "detections": MODEL_VERSIONS["yolov5"],
+        "ingest": f"{feature_space.version}:{MILVUS_ROW_LAYOUT}",
+        "index": f"{os.getenv('MILVUS_INDEX_TYPE', 'auto')}:{os.getenv('MILVUS_METRIC_TYPE', 'L2')}",
+        "audio": f"{TRANSCRIBER_VERSION}:{os.getenv('SPEECH_BACKEND', 'google')}"
+    }
+
+
+def clear_stage_outputs(stages, frames_dir: str, audio_dir: str):
+    suffixes = tuple(suffix for stage in stages for suffix in STAGE_OUTPUTS.get(stage, ()))
+    if suffixes and os.path.isdir(frames_dir):
+        for name in os.listdir(frames_dir):
+            if name.endswith(suffixes):
+                os.remove(os.path.join(frames_dir, name))
+    if "audio" in stages and os.path.isdir(audio_dir):
+        for name in os.listdir(audio_dir):
+            os.remove(os.path.join(audio_dir, name))
+
+
+def prepare_manifest(frames_dir: str, audio_dir: str, frames_per_second: float, mode: str,
+                     rerun=()) -> StageManifest:
+    """Load an upload's manifest, dropping the outputs of stages that must run again."""
+    os.makedirs(frames_dir, exist_ok=True)
+    manifest = StageManifest(os.path.join(frames_dir, MANIFEST_FILE))
+    reset = manifest.prepare(stage_versions(frames_per_second, mode), rerun)
+    if reset:
+        logging.info(f"Stages to run again: {sorted(reset)}")
+    clear_stage_outputs(reset, frames_dir, audio_dir)
+    return manifest
+
+
+class PipelineOrchestrator:
+    def __init__(self, video_path: str, frames_dir: str, audio_dir: str,
+                 frames_per_second: float, milvus_client, mode: str = "disk",
+                 audio_executor=None, visual_executor=None, on_stage=None,
+                 video_hash: str = None, cache=None, video_id: str = "",
+                 upload_pending: bool = False, trace=None, manifest=None):
+        self.video_path = video_path
+        self.frames_dir = frames_dir
+        self.audio_dir = audio_dir
+        self.frames_per_second = frames_per_second
+        self.milvus_client = milvus_client
+        self.mode = mode
+        # Content hash of the upload, keys the transcript cache
+        self.video_hash = video_hash
+        # Tags every ingested row, needed to scope searches in a shared collection
+        self.video_id = video_id
+        # Frames are decoded while a resumable upload is still arriving
+        self.upload_pending = upload_pending
+        self.cache = cache if cache is not None else result_cache
+        self.audio_executor = audio_executor or get_audio_executor()
+        self.visual_executor = visual_executor or get_visual_executor()
+        # Called as on_stage(stage, status, seconds) to report progress
+        self.on_stage = on_stage
+        # Optional JobTrace collecting a span per stage
+        self.trace = trace
+        # Optional StageManifest, stages it has completed are skipped and
+        # frames ingested by an earlier attempt are not inserted twice
+        self.manifest = manifest
+        self.timings = {}
+        self.frame_filter_stats = None
+        self.ingest_stats = None
+        self.index_stats = None
+        self._timings_lock = threading.Lock()
+
+    def report(self, stage: str, status: str, seconds=None):
+        if self.on_stage is not None:
+            self.on_stage(stage, status, seconds)
+
+    def record_timing(self, stage: str, seconds: float, end: float = None):
+        with self._timings_lock:
+            self.timings[stage] = round(seconds, 3)
+        metrics.observe("qyv_stage_seconds", seconds, stage=stage)
+        if self.trace is not None:
+            self.trace.add(stage, seconds, end=end)
+        logging.info(f"Stage {stage} finished in {seconds:.2f} seconds")
+        self.report(stage, "completed", round(seconds, 3))
+
+    def timed(self, stage: str, target, *args):
+        self.report(stage, "running")
+        start = time.perf_counter()
+        try:
+            result = target(*args)
+        except Exception:
+            self.report(stage, "failed")
+            raise
+        self.record_timing(stage, time.perf_counter() - start)
+        return result
+
+    def completed(self, stage: str) -> bool:
+        return self.manifest is not None and self.manifest.is_completed(stage)
+
+    def skip(self, stage: str):
+        logging.info(f"Stage {stage} was completed by an earlier run, skipping it")
+        self.report(stage, "skipped")
+        return self.manifest.result(stage)
+
+    def checkpoint(self, stage: str, result=None):
+        if self.manifest is not None:
+            self.manifest.complete(stage, self.timings.get(stage), result)
+
+    def run_stage(self, stage: str, target, *args):
+        """Run a stage unless an earlier run completed it, returns its result either way."""
+        if self.completed(stage):
+            return self.skip(stage)
+        result = self.timed(stage, target, *args)
+        self.checkpoint(stage, result)
+        return result
+
+    def require_video(self, stage: str):
+        # Finished uploads are deleted, only stages reading frames or Milvus can re-run then
+        if not os.path.exists(self.video_path):
+            raise FileNotFoundError(
+                f"Stage {stage} needs the uploaded video, which is no longer at {self.video_path}")
+
+    def load_transcript(self):
+        """The transcript an earlier run saved, None when audio has to run."""
+        path = os.path.join(self.audio_dir, "transcript.json")
+        if not self.completed("audio") or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def run(self):
+        start = time.perf_counter()
+        transcript = self.load_transcript()
+        audio_future = None
+        audio_done = {}
+        if transcript is not None:
+            self.skip("audio")
+        else:
+            self.require_video("audio")
+            self.report("audio", "running")
+            audio_future = self.audio_executor.submit(
+                transcribe_video, self.video_path, self.audio_dir, self.video_hash,
+                self.upload_pending)
+            audio_future.add_done_callback(lambda _: audio_done.setdefault("at", time.perf_counter()))
+        visual_future = self.visual_executor.submit(
+            self.timed, "visual", self.run_visual_branch)
+
+        # Join both branches before surfacing the first failure
+        wait([future for future in (audio_future, visual_future) if future is not None])
+        if audio_future is not None:
+            if audio_future.exception() is not None:
+                self.report("audio", "failed")
+                if isinstance(audio_future.exception(), BrokenProcessPool):
+                    discard_executor("audio", self.audio_executor)
+            transcript, audio_timings, audio_metrics = audio_future.result()
+            metrics.merge(audio_metrics)
+            # Audio stages ran sequentially in the other process and ended with it
+            audio_end = audio_done.get("at", time.perf_counter())
+            end = audio_end - sum(audio_timings.values())
+            for stage, seconds in audio_timings.items():
+                end += seconds
+                self.record_timing(stage, seconds, end=end)
+            self.record_timing("audio", sum(audio_timings.values()), end=audio_end)
+            # Checkpointed before the visual branch can fail, a retry keeps the transcript
+            self.checkpoint("audio", {"chunks": len(transcript)})
+        visual_future.result()
+        self.record_timing("total", time.perf_counter() - start)
+
+        return {"transcript": transcript, "timings": dict(self.timings),
+                "frame_filter": self.frame_filter_stats,
+                "ingest": self.ingest_stats,
+                "index": self.index_stats}
+
+    def build_frame_filter(self):
+        method = os.getenv("FRAME_FILTER", "none").lower()
+        if method == "none":
+            return None
+        threshold = os.getenv("FRAME_FILTER_THRESHOLD")
+        return FilterRedundantFrames(
+            method, float(threshold) if threshold else None)
+
+    def extract_frames(self, extractor, frame_filter):
+        self.require_video("frames")
+        extractor.extract_frames()
+        return frame_filter.stats() if frame_filter is not None else None
+
+    def build_ingestor(self):
+        if self.manifest is None:
+            return IngestToMilvus(self.frames_dir, self.milvus_client, video_id=self.video_id)
+        # Frames are checkpointed once their batch is inserted, a retry continues after them
+        resume = self.manifest.has_progress("ingest")
+        ingestor = IngestToMilvus(
+            self.frames_dir, self.milvus_client, video_id=self.video_id,
+            ingested=self.manifest.checkpointed_frames("ingest"),
+            on_ingested=partial(self.manifest.add_checkpoint_frames, "ingest"),
+            resume=resume)
+        if resume and ingestor.ingested:
+            logging.info(f"Resuming ingestion after {len(ingestor.ingested)} stored frames")
+        return ingestor
+
+    def run_fused(self, stage: str, pipeline):
+        if all(self.completed(fused) for fused in FUSED_STAGES):
+            for fused in FUSED_STAGES:
+                self.skip(fused)
+            return self.manifest.result("frames"), self.manifest.result("ingest")
+        self.require_video(stage)
+        if self.manifest is not None:
+            self.manifest.add_checkpoint_frames("ingest", [])
+        self.timed(stage, pipeline.run)
+        frame_filter = pipeline.frame_extractor.frame_filter
+        filter_stats = frame_filter.stats() if frame_filter is not None else None
+        results = {"frames": filter_stats, "ingest": pipeline.ingestor.stats}
+        for fused in FUSED_STAGES:
+            self.checkpoint(fused, results.get(fused))
+        return filter_stats, pipeline.ingestor.stats
+
+    def run_visual_branch(self):
+        frame_filter = self.build_frame_filter()
+        extractor = ExtractFramesFromVideo(
+            video_path=self.video_path, output_dir=self.frames_dir,
+            fps=self.frames_per_second, frame_filter=frame_filter,
+            upload_complete=partial(upload_complete, self.video_path) if self.upload_pending else None)
+        # Feature and detection files an interrupted attempt saved are kept
+        resume = self.manifest is not None
+        feature_extractor = ExtractFeaturesFromFrames(
+            self.frames_dir, model=model_registry.get("swin"), cache=self.cache,
+            skip_existing=resume)
+        object_detector = DetectObjectsFromFrames(
+            self.frames_dir, model=model_registry.get("yolov5"), cache=self.cache,
+            skip_existing=resume)
+        ingestor = self.build_ingestor()
+
+        if self.mode == "streaming":
+            pipeline = StreamVideoPipeline(
+                extractor, feature_extractor, object_detector, ingestor)
+            self.frame_filter_stats, self.ingest_stats = self.run_fused("stream", pipeline)
+        elif self.mode == "parallel":
+            with inference_executor() as executor:
+                pipeline = ParallelVideoPipeline(
+                    extractor, feature_extractor, object_detector, ingestor, executor=executor)
+                self.frame_filter_stats, self.ingest_stats = self.run_fused("parallel", pipeline)
+        else:
+            self.frame_filter_stats = self.run_stage(
+                "frames", self.extract_frames, extractor, frame_filter)
+            self.run_stage("features", feature_extractor.extract_features)
+            self.run_stage("detections", object_detector.detect_objects)
+            if self.manifest is not None and not self.completed("ingest"):
+                # Marks ingestion as started, a retry resumes instead of starting over
+                self.manifest.add_checkpoint_frames("ingest", [])
+            self.ingest_stats = self.run_stage("ingest", ingestor.ingest_data)
+
+        self.index_stats = self.run_stage("index", self.milvus_client.build_index)
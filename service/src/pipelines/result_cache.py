@@ -0,0 +1,178 @@
+# src/pipelines/result_cache.py
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+import numpy as np
+
+ARRAY_SUFFIX = ".npz"
+JSON_SUFFIX = ".json.gz"
+
+
+def content_key(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# "exact" reuses cached frame results only for identical pixels, "near" also for
+# frames differing by re-encoding noise, at the risk of matching distinct frames
+FRAME_MATCH_MODES = ("exact", "near")
+RESULT_CACHE_MATCH = os.getenv("RESULT_CACHE_MATCH", "exact").lower()
+
+if RESULT_CACHE_MATCH not in FRAME_MATCH_MODES:
+    raise ValueError(f"Unknown RESULT_CACHE_MATCH: {RESULT_CACHE_MATCH}")
+
+
+def frame_hash(frame, match: str = None) -> str:
+    """Key of a decoded frame's cached features and detections."""
+    if (match or RESULT_CACHE_MATCH) == "near":
+        return "near:" + near_frame_hash(frame)
+    pixels = np.ascontiguousarray(np.asarray(frame))
+    digest = hashlib.sha1(f"{pixels.shape}:{pixels.dtype.str}".encode("utf-8"))
+    digest.update(pixels.tobytes())
+    return digest.hexdigest()
+
+
+def near_frame_hash(frame) -> str:
+    """Hash a decoded frame so small re-encoding noise maps to the same key.
+
+    The frame is reduced to a 32x32 luminance thumbnail quantized to 32 levels
+    before hashing. Colour is discarded, so frames differing only in hue share
+    a key; only use it where that is acceptable.
+    """
+    frame = np.asarray(frame, dtype=np.float32)
+    if frame.ndim == 3:
+        frame = frame.mean(axis=2)
+    height, width = frame.shape
+    rows = np.linspace(0, height, 33, dtype=int)
+    cols = np.linspace(0, width, 33, dtype=int)
+    thumbnail = np.add.reduceat(np.add.reduceat(frame, rows[:-1], axis=0), cols[:-1], axis=1)
+    thumbnail /= np.outer(np.maximum(np.diff(rows), 1), np.maximum(np.diff(cols), 1))
+    return hashlib.sha1((thumbnail.astype(np.uint8) >> 3).tobytes()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, root: str, max_bytes: int, enabled: bool = True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path(self, namespace: str, key: str, suffix: str) -> str:
+        return os.path.join(self.root, namespace, key[:2], key + suffix)
+
+    def get_arrays(self, namespace: str, key: str):
+        if not self.enabled:
+            return None
+        path = self.path(namespace, key, ARRAY_SUFFIX)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.touch(path)
+        return arrays
+
+    def put_arrays(self, namespace: str, key: str, **arrays):
+        self._write(self.path(namespace, key, ARRAY_SUFFIX),
+                    lambda f: np.savez_compressed(f, **arrays))
+
+    def get_json(self, namespace: str, key: str):
+        if not self.enabled:
+            return None
+        path = self.path(namespace, key, JSON_SUFFIX)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.touch(path)
+        return value
+
+    def put_json(self, namespace: str, key: str, value):
+        self._write(self.path(namespace, key, JSON_SUFFIX),
+                    lambda f: f.write(gzip.compress(json.dumps(value).encode("utf-8"))))
+
+    def touch(self, path: str):
+        # The mtime doubles as the LRU timestamp
+        self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _write(self, path: str, write):
+        if not self.enabled:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        # Atomic rename keeps readers in other workers from seeing partial files
+        os.replace(tmp_path, path)
+        self._account(os.path.getsize(path))
+
+    def _entries(self):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(ARRAY_SUFFIX) or name.endswith(JSON_SUFFIX):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _account(self, size: int):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry[1] for entry in self._entries())
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other workers share the directory, so rescan before evicting
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(entry[1] for entry in entries)
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for path, entry_size, _ in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            evicted += 1
+        self._size = size
+        logging.info(f"Result cache evicted {evicted} entries, {size} bytes in use")
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "root": self.root,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Process-wide cache shared by the pipeline classes, the directory is shared across workers
+result_cache = ResultCache(
+    root=os.getenv("RESULT_CACHE_DIR", "cache"),
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", 2 * 1024 ** 3)),
+    enabled=os.getenv("RESULT_CACHE", "true").lower() == "true")
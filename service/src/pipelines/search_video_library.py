@@ -0,0 +1,251 @@
+# src/pipelines/search_video_library.py
+import heapq
+import json
+import os
+import re
+import threading
+from src.pipelines.extract_features_from_frames import ExtractFeaturesFromFrames
+from src.pipelines.ingest_to_milvus import (
+    MILVUS_COLLECTION_MODE, SEARCH_OUTPUT_FIELDS, collection_name_for_video,
+    feature_space, list_video_collections, open_milvus_client, quote, video_filter,
+    video_id_for_collection)
+from src.pipelines.model_registry import model_registry
+
+# Milvus rejects searches and queries where offset + limit exceeds this
+MAX_RESULT_WINDOW = 16384
+# Metrics where a larger distance means a closer match
+SIMILARITY_METRICS = ("IP", "COSINE")
+
+
+def filter_expression(object_class: str = None, start_time: float = None,
+                      end_time: float = None, min_confidence: float = None,
+                      layout: str = "detection"):
+    """Scalar filter shared by vector searches and object queries."""
+    conditions = []
+    if layout == "frame":
+        # The frame must hold a detection of the class at or above the confidence
+        if object_class and min_confidence is not None:
+            conditions.append(f"class_confidence[{quote(object_class)}] >= {float(min_confidence)}")
+        elif object_class:
+            conditions.append(f"ARRAY_CONTAINS(object_classes, {quote(object_class)})")
+        elif min_confidence is not None:
+            conditions.append(f"max_confidence >= {float(min_confidence)}")
+        object_class = min_confidence = None
+    if object_class:
+        conditions.append(f"object_class == {quote(object_class)}")
+    # A frame matches when the time range it stands for overlaps the requested one
+    if start_time is not None:
+        conditions.append(f"end_time >= {float(start_time)}")
+    if end_time is not None:
+        conditions.append(f"start_time <= {float(end_time)}")
+    if min_confidence is not None:
+        conditions.append(f"confidence >= {float(min_confidence)}")
+    return " and ".join(conditions) or None
+
+
+class TranscriptIndex:
+    """Keyword search over the transcript.json files written by the audio branch."""
+
+    def __init__(self, audio_dir: str):
+        self.audio_dir = audio_dir
+        # video_id -> (mtime, segments with their lowercased tokens)
+        self._transcripts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def tokens(text: str):
+        return re.findall(r"\w+", text.lower())
+
+    def load(self, video_id: str):
+        if os.path.basename(video_id) != video_id:
+            return []
+        path = os.path.join(self.audio_dir, video_id, "transcript.json")
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            self._transcripts.pop(video_id, None)
+            return []
+        cached = self._transcripts.get(video_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path) as f:
+            segments = [
+                (segment, set(self.tokens(segment.get("text", ""))))
+                for segment in json.load(f) if segment.get("text")]
+        self._transcripts[video_id] = (mtime, segments)
+        return segments
+
+    def video_ids(self):
+        if not os.path.isdir(self.audio_dir):
+            return []
+        return sorted(os.listdir(self.audio_dir))
+
+    def search(self, text: str, video_ids=None, start_time: float = None,
+               end_time: float = None, limit: int = 10, offset: int = 0):
+        terms = set(self.tokens(text))
+        matches = []
+        with self._lock:
+            for video_id in video_ids or self.video_ids():
+                for segment, segment_tokens in self.load(video_id):
+                    if start_time is not None and segment["end"] < start_time:
+                        continue
+                    if end_time is not None and segment["start"] > end_time:
+                        continue
+                    matched = len(terms & segment_tokens)
+                    if terms and not matched:
+                        continue
+                    matches.append(dict(segment, video_id=video_id,
+                                        score=matched / len(terms) if terms else 1.0))
+        # Best matches first, then in playback order
+        matches.sort(key=lambda match: (-match["score"], match["video_id"], match["start"]))
+        return matches[offset:offset + limit]
+
+
+class SearchVideoLibrary:
+    def __init__(self, frames_dir: str, audio_dir: str, host='localhost', port='19530'):
+        # Query images are embedded with the same Swin model used at ingestion
+        self.frames_dir = frames_dir
+        self.host = host
+        self.port = port
+        self.transcripts = TranscriptIndex(audio_dir)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, collection_name: str):
+        with self._lock:
+            client = self._clients.get(collection_name)
+            if client is None:
+                client = open_milvus_client(collection_name, self.host, self.port)
+                if client is not None:
+                    self._clients[collection_name] = client
+            return client
+
+    def forget(self):
+        # Collections may have been dropped or recreated since they were opened
+        with self._lock:
+            self._clients.clear()
+
+    def targets(self, video_ids=None):
+        """(client, video_ids filter, video id of the whole collection) to query."""
+        if MILVUS_COLLECTION_MODE == "shared":
+            clients = [self.client(name) for name in list_video_collections(self.host, self.port)]
+            return [(client, video_ids, None) for client in clients if client is not None]
+        if video_ids:
+            pairs = [(collection_name_for_video(video_id), video_id) for video_id in video_ids]
+        else:
+            pairs = [(name, video_id_for_collection(name))
+                     for name in list_video_collections(self.host, self.port)]
+        targets = []
+        for name, video_id in pairs:
+            client = self.client(name)
+            if client is not None:
+                # A per-video collection only holds that video, no filter needed
+                targets.append((client, None, video_id))
+        return targets
+
+    def embed_images(self, images: list):
+        # Query images skip the ingest-side frame cache, the query cache keys on their bytes
+        extractor = ExtractFeaturesFromFrames(self.frames_dir, model=model_registry.get("swin"))
+        return extractor.process_batch(images)
+
+    @staticmethod
+    def search_params(defaults: dict, nprobe: int = None, ef: int = None, window: int = 0):
+        """The index's default search parameters with the caller's overrides."""
+        params = dict(defaults or {})
+        if nprobe:
+            params["nprobe"] = nprobe
+        if ef or "ef" in params:
+            # HNSW rejects searches where offset + limit exceeds ef, deep pages included
+            params["ef"] = max(ef or params["ef"], window)
+        return params or None
+
+    @staticmethod
+    def record(entity, video_id: str = None, layout: str = "detection", object_class: str = None):
+        if layout == "frame":
+            # Frame rows report their best detection, of the requested class if any
+            detections = entity.get("detections") or []
+            best = max((detection for detection in detections
+                        if object_class is None or detection["object_class"] == object_class),
+                       key=lambda detection: detection["confidence"], default={})
+            record = {field: best.get(field) if field in ("object_class", "confidence")
+                      else entity.get(field) for field in SEARCH_OUTPUT_FIELDS}
+            record["detections"] = detections
+        else:
+            record = {field: entity.get(field) for field in SEARCH_OUTPUT_FIELDS}
+        if video_id is not None:
+            record["video_id"] = video_id
+        return record
+
+    def object_records(self, row, object_class: str, video_id: str = None,
+                       layout: str = "detection", min_confidence: float = None):
+        """One record per detection of the class, as detection rows would return them."""
+        if layout != "frame":
+            return [self.record(row, video_id)]
+        record = self.record(row, video_id, layout, object_class)
+        return [
+            dict(record, confidence=detection["confidence"], box=detection.get("box"))
+            for detection in record.pop("detections")
+            if detection["object_class"] == object_class
+            and (min_confidence is None or detection["confidence"] >= min_confidence)]
+
+    def search_vectors(self, vectors: list, video_ids=None, limit: int = 10, offset: int = 0,
+                       nprobe: int = None, ef: int = None, **filters):
+        """Nearest frames for each query vector, one page of hits per vector."""
+        window = offset + limit
+        if window > MAX_RESULT_WINDOW:
+            raise ValueError(f"offset + limit must not exceed {MAX_RESULT_WINDOW}")
+        merged = [[] for _ in vectors]
+        reverse = False
+        targets = self.targets(video_ids)
+        if targets:
+            # Raw features go through the same reduction as the stored vectors
+            vectors = feature_space.query_vectors(vectors)
+        for client, video_ids_filter, video_id in targets:
+            metric_type, defaults = client.search_defaults()
+            # Every collection has to return a full window before the pages can be merged
+            results = client.search(vectors, limit=window, video_ids=video_ids_filter,
+                                    expr=filter_expression(layout=client.layout, **filters),
+                                    search_params=self.search_params(defaults, nprobe, ef, window))
+            reverse = metric_type in SIMILARITY_METRICS
+            for hits, merged_hits in zip(results, merged):
+                for hit in hits:
+                    record = self.record(hit.entity, video_id, client.layout, filters.get("object_class"))
+                    merged_hits.append(dict(record, distance=hit.distance))
+        pages = []
+        for hits in merged:
+            hits.sort(key=lambda hit: hit["distance"], reverse=reverse)
+            pages.append(hits[offset:window])
+        return pages
+
+    def search_images(self, images: list, **kwargs):
+        return self.search_vectors(self.embed_images(images), **kwargs)
+
+    def search_objects(self, object_class: str, video_ids=None, limit: int = 10,
+                       offset: int = 0, **filters):
+        """Detections of one object class, in playback order."""
+        window = offset + limit
+        if window > MAX_RESULT_WINDOW:
+            raise ValueError(f"offset + limit must not exceed {MAX_RESULT_WINDOW}")
+        records = (
+            record
+            for client, video_ids_filter, video_id in self.targets(video_ids)
+            for row in client.iter_rows(self.scoped_expression(client, video_ids_filter, object_class, filters))
+            for record in self.object_records(
+                row, object_class, video_id, client.layout, filters.get("min_confidence")))
+        # Primary key order is not playback order (shared collections, resumed ingests),
+        # so every match is read and only the first window kept
+        return heapq.nsmallest(window, records, key=self.playback_order)[offset:]
+
+    @staticmethod
+    def scoped_expression(client, video_ids_filter, object_class: str, filters: dict):
+        expr = filter_expression(object_class=object_class, layout=client.layout, **filters)
+        return " and ".join(
+            f"({condition})" for condition in (video_filter(video_ids_filter), expr) if condition) or None
+
+    @staticmethod
+    def playback_order(row: dict):
+        return (row["video_id"] or "", row["start_time"] or 0, row["frame_name"] or "",
+                -(row["confidence"] or 0))
+
+    def search_transcripts(self, text: str, **kwargs):
+        return self.transcripts.search(text, **kwargs)
@@ -0,0 +1,152 @@
+# src/pipelines/speech_recognizers.py
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+class SpeechRecognizer(ABC):
+    """Turns one speech chunk into text.
+
+    ``transcribe`` raises ``sr.UnknownValueError`` when nothing intelligible
+    was said. ``version`` is part of the transcript cache key and
+    ``max_concurrency`` caps how many chunks run at once.
+    """
+    name = "base"
+    max_concurrency = 1
+
+    @property
+    def version(self):
+        return self.name
+
+    @abstractmethod
+    def transcribe(self, audio_data: sr.AudioData) -> str:
+        pass
+
+    @staticmethod
+    def samples(audio_data: sr.AudioData):
+        # Local engines expect 16 kHz mono float32 in [-1, 1]
+        pcm = audio_data.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+        return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class GoogleSpeechRecognizer(SpeechRecognizer):
+    """The free Google Web Speech API, one HTTP round-trip per chunk."""
+    name = "google"
+
+    def __init__(self):
+        # Requests are network bound, so several can be in flight
+        self.max_concurrency = int(os.getenv("SPEECH_CONCURRENCY", 4))
+        self._local = threading.local()
+
+    def transcribe(self, audio_data: sr.AudioData) -> str:
+        # Recognizer instances carry per-call state, keep one per thread
+        recognizer = getattr(self._local, "recognizer", None)
+        if recognizer is None:
+            recognizer = self._local.recognizer = sr.Recognizer()
+        return recognizer.recognize_google(audio_data)
+
+
+class WhisperSpeechRecognizer(SpeechRecognizer):
+    """Offline Whisper model, needs the openai-whisper package."""
+    name = "whisper"
+
+    def __init__(self):
+        self.model_name = os.getenv("WHISPER_MODEL", "base")
+        self.max_concurrency = int(os.getenv("SPEECH_CONCURRENCY", 1))
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return f"whisper:{self.model_name}"
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                import whisper
+                logger.info(f"Loading Whisper model {self.model_name}")
+                self._model = whisper.load_model(self.model_name)
+            return self._model
+
+    def transcribe(self, audio_data: sr.AudioData) -> str:
+        result = self.model.transcribe(self.samples(audio_data), fp16=False)
+        text = result["text"].strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class VoskSpeechRecognizer(SpeechRecognizer):
+    """Offline Kaldi model through the vosk package, VOSK_MODEL_PATH points at the model."""
+    name = "vosk"
+
+    def __init__(self):
+        self.model_path = os.getenv("VOSK_MODEL_PATH", "models/vosk")
+        self.max_concurrency = int(os.getenv("SPEECH_CONCURRENCY", 2))
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return f"vosk:{os.path.basename(os.path.normpath(self.model_path))}"
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                import vosk
+                logger.info(f"Loading Vosk model from {self.model_path}")
+                self._model = vosk.Model(self.model_path)
+            return self._model
+
+    def transcribe(self, audio_data: sr.AudioData) -> str:
+        import vosk
+        # The model is shared, recognizers are cheap and hold the decoding state
+        recognizer = vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+        recognizer.AcceptWaveform(audio_data.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "").strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class StubSpeechRecognizer(SpeechRecognizer):
+    """Deterministic placeholder text, for tests and benchmarks without a speech engine."""
+    name = "stub"
+
+    def __init__(self):
+        self.max_concurrency = int(os.getenv("SPEECH_CONCURRENCY", 4))
+
+    def transcribe(self, audio_data: sr.AudioData) -> str:
+        seconds = len(audio_data.frame_data) / audio_data.sample_width / audio_data.sample_rate
+        return f"speech {seconds:.2f}s"
+
+
+SPEECH_RECOGNIZERS = {
+    recognizer.name: recognizer
+    for recognizer in (GoogleSpeechRecognizer, WhisperSpeechRecognizer,
+                       VoskSpeechRecognizer, StubSpeechRecognizer)
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_speech_recognizer(name: str = None) -> SpeechRecognizer:
+    """Process-wide recognizer, so local models are loaded once per worker."""
+    name = (name or os.getenv("SPEECH_BACKEND", "google")).lower()
+    if name not in SPEECH_RECOGNIZERS:
+        raise ValueError(f"Unknown speech backend: {name}")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = SPEECH_RECOGNIZERS[name]()
+        return _instances[name]
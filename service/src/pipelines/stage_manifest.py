@@ -0,0 +1,135 @@
+# src/pipelines/stage_manifest.py
+import json
+import os
+import threading
+import time
+
+MANIFEST_FILE = "manifest.json"
+# Stages each stage reads the output of, re-running one re-runs everything downstream
+STAGE_INPUTS = {
+    "frames": (),
+    "features": ("frames",),
+    "detections": ("frames",),
+    "ingest": ("features", "detections"),
+    "index": ("ingest",),
+    "audio": ()
+}
+STAGES = tuple(STAGE_INPUTS)
+
+
+def downstream_stages(stages) -> set:
+    """The stages given and every stage depending on them."""
+    result = set(stages)
+    changed = True
+    while changed:
+        changed = False
+        for stage, inputs in STAGE_INPUTS.items():
+            if stage not in result and result.intersection(inputs):
+                result.add(stage)
+                changed = True
+    return result
+
+
+class StageManifest:
+    """Completed stages and checkpoints of one upload, kept next to its frames.
+
+    Every stage is recorded with a version string describing what produced
+    it (models, sampling rate, feature space). A stage whose version no
+    longer matches is invalidated together with its downstream stages, so a
+    new detector re-runs detections, ingest and index but keeps the frames,
+    features and transcript.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"stages": {}, "checkpoints": {}}
+
+    def save(self):
+        # Written from the visual thread and the joining thread, a crash leaves the previous copy
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+    def prepare(self, versions: dict, rerun=()):
+        """Invalidate stages whose version changed or that are re-run, returns every stage reset."""
+        changed = {
+            stage for stage, entry in self.data["stages"].items()
+            if entry.get("version") != versions.get(stage)}
+        self.data["versions"] = versions
+        return self.reset(changed | set(rerun))
+
+    def reset(self, stages):
+        """Forget the given stages and their downstream ones, returns every stage reset."""
+        with self._lock:
+            reset = downstream_stages(stages)
+            for stage in reset:
+                self.data["stages"].pop(stage, None)
+                self.data["checkpoints"].pop(stage, None)
+            self.save()
+            return reset
+
+    def is_completed(self, stage: str) -> bool:
+        return self.data["stages"].get(stage, {}).get("status") == "completed"
+
+    def result(self, stage: str):
+        return self.data["stages"].get(stage, {}).get("result")
+
+    def complete(self, stage: str, seconds: float = None, result=None):
+        with self._lock:
+            self.data["stages"][stage] = {
+                "status": "completed",
+                "version": self.data.get("versions", {}).get(stage),
+                "seconds": seconds,
+                "result": result,
+                "completed_at": time.time()
+            }
+            self.data["checkpoints"].pop(stage, None)
+            self.save()
+
+    def has_progress(self, stage: str) -> bool:
+        return self.is_completed(stage) or stage in self.data["checkpoints"]
+
+    def checkpointed_frames(self, stage: str) -> set:
+        return set(self.data["checkpoints"].get(stage, []))
+
+    def add_checkpoint_frames(self, stage: str, frames: list):
+        with self._lock:
+            done = self.data["checkpoints"].setdefault(stage, [])
+            done.extend(frames)
+            self.save()
+
+    def stale_rows(self) -> list:
+        """Rows of an earlier run of the video, deleted once this run's rows are published."""
+        return list(self.data.get("stale_rows", []))
+
+    def set_stale_rows(self, row_ids: list):
+        with self._lock:
+            self.data["stale_rows"] = list(row_ids)
+            self.save()
+
+    def mark_failed(self, paths: list):
+        """Record a failed attempt, the files kept for its retry expire after JOB_RESUME_TTL."""
+        with self._lock:
+            self.data["failed"] = {"at": time.time(), "paths": list(paths)}
+            self.save()
+
+    def clear_failure(self):
+        with self._lock:
+            if self.data.pop("failed", None) is not None:
+                self.save()
+
+    def failed_at(self):
+        return self.data.get("failed", {}).get("at")
+
+    def summary(self):
+        return {stage: {key: entry.get(key) for key in ("status", "version", "seconds")}
+                for stage, entry in self.data["stages"].items()}
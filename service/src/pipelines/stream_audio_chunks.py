@@ -0,0 +1,184 @@
+# src/pipelines/stream_audio_chunks.py
+import logging
+import os
+import subprocess
+import time
+from dataclasses import dataclass
+import numpy as np
+from moviepy.config import get_setting
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_MS = 10
+
+
+@dataclass
+class AudioChunk:
+    start: float  # Seconds from the start of the track
+    end: float
+    samples: np.ndarray  # Mono int16 PCM
+
+
+class PcmRingBuffer:
+    """Fixed-size int16 buffer addressed by absolute sample position."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.start = 0  # Oldest sample still held
+        self.end = 0    # One past the newest sample
+
+    def write(self, samples: np.ndarray):
+        if self.end + len(samples) - self.start > self.capacity:
+            raise OverflowError("PCM ring buffer overflow, raise the capacity or discard sooner")
+        offset = self.end % self.capacity
+        head = min(len(samples), self.capacity - offset)
+        self.data[offset:offset + head] = samples[:head]
+        self.data[:len(samples) - head] = samples[head:]
+        self.end += len(samples)
+
+    def read(self, start: int, end: int):
+        start, end = max(start, self.start), min(end, self.end)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+        offset = start % self.capacity
+        if offset + end - start <= self.capacity:
+            return self.data[offset:offset + end - start].copy()
+        return np.concatenate([self.data[offset:], self.data[:end - start - (self.capacity - offset)]])
+
+    def discard(self, before: int):
+        self.start = min(max(self.start, before), self.end)
+
+
+class StreamAudioChunks:
+    """Decode a video's soundtrack in windows and yield its non-silent chunks.
+
+    ffmpeg writes 16 kHz mono PCM to a pipe, so neither the soundtrack nor its
+    chunks are written to disk and only a bounded window is held in memory.
+    Silence is found with an RMS gate over 10 ms frames, mirroring
+    ``split_on_silence``: quieter than the track loudness minus 14 dB for at
+    least ``min_silence_ms``, with ``keep_silence_ms`` of padding kept around
+    each chunk. The track loudness is the running level of everything decoded
+    so far, since the whole track is never available at once.
+    """
+
+    def __init__(self, video_path: str, sample_rate: int = SAMPLE_RATE,
+                 window_seconds: float = None, min_silence_ms: int = 500,
+                 silence_offset_db: float = 14, keep_silence_ms: int = 500,
+                 max_chunk_seconds: float = None):
+        self.video_path = video_path
+        self.sample_rate = sample_rate
+        self.window_seconds = window_seconds or float(os.getenv("AUDIO_STREAM_WINDOW_SECONDS", 10))
+        self.max_chunk_seconds = max_chunk_seconds or float(os.getenv("AUDIO_MAX_CHUNK_SECONDS", 60))
+        self.frame_samples = sample_rate * FRAME_MS // 1000
+        self.min_silence_frames = max(1, min_silence_ms // FRAME_MS)
+        self.keep_silence = keep_silence_ms * sample_rate // 1000
+        self.silence_offset_db = silence_offset_db
+        self.samples_read = 0
+        self.decode_seconds = 0.0
+
+    def decode(self):
+        command = [
+            get_setting("FFMPEG_BINARY"), "-nostdin", "-loglevel", "error",
+            "-i", self.video_path, "-vn", "-ac", "1", "-ar", str(self.sample_rate),
+            "-f", "s16le", "pipe:1"]
+        window_bytes = int(self.window_seconds * self.sample_rate) * 2
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                start = time.perf_counter()
+                data = process.stdout.read(window_bytes)
+                self.decode_seconds += time.perf_counter() - start
+                if not data:
+                    break
+                window = np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16)
+                self.samples_read += len(window)
+                yield window
+        finally:
+            process.stdout.close()
+            process.kill()
+            process.wait()
+
+    def __iter__(self):
+        max_chunk = int(self.max_chunk_seconds * self.sample_rate) // self.frame_samples * self.frame_samples
+        window = int(self.window_seconds * self.sample_rate)
+        # An open chunk, its padding, a closed chunk's trailing silence and two windows
+        buffer = PcmRingBuffer(max_chunk + 4 * self.keep_silence + 2 * window + self.frame_samples)
+        energy = 0.0       # Sum of squares of every frame gated so far
+        gated = 0          # Samples gated so far, always a multiple of the frame size
+        region = None      # [first loud sample, one past last loud sample] of the open chunk
+        closed = None      # Region whose end padding is still being decided
+        previous_end = 0   # End of the last yielded chunk, padding never overlaps it
+        quiet = 0          # Samples of silence since the last loud frame
+
+        for samples in self.decode():
+            buffer.write(samples)
+            whole = (buffer.end - gated) // self.frame_samples * self.frame_samples
+            if whole == 0:
+                continue
+            frames = buffer.read(gated, gated + whole).astype(np.float32).reshape(-1, self.frame_samples)
+            squares = np.einsum("ij,ij->i", frames, frames)
+            energy += float(squares.sum())
+            rms_db = 10 * np.log10(np.maximum(squares / self.frame_samples, 1e-10) / 32768.0 ** 2)
+            # Same reference as audio.dBFS - 14, over the audio decoded so far
+            track_db = 10 * np.log10(max(energy / (gated + whole), 1e-10) / 32768.0 ** 2)
+            loud = rms_db > track_db - self.silence_offset_db
+
+            # Walk runs of loud or quiet frames rather than single frames
+            boundaries = np.concatenate([[0], np.flatnonzero(np.diff(loud)) + 1, [len(loud)]])
+            for run_start, run_end in zip(boundaries[:-1], boundaries[1:]):
+                start = gated + int(run_start) * self.frame_samples
+                end = gated + int(run_end) * self.frame_samples
+                if not loud[run_start]:
+                    quiet += end - start
+                    if region is not None and quiet >= self.min_silence_frames * self.frame_samples:
+                        closed, region = region, None
+                    if closed is not None and end - closed[1] >= 2 * self.keep_silence:
+                        chunk = self.finish(buffer, closed, previous_end, self.keep_silence)
+                        previous_end, closed = round(chunk.end * self.sample_rate), None
+                        yield chunk
+                    continue
+
+                quiet = 0
+                if closed is not None:
+                    # Padding of neighbouring chunks meets halfway, like split_on_silence
+                    gap = start - closed[1]
+                    chunk = self.finish(buffer, closed, previous_end, min(self.keep_silence, gap // 2))
+                    previous_end, closed = round(chunk.end * self.sample_rate), None
+                    yield chunk
+                if region is None:
+                    region = [start, start]
+                region[1] = end
+                while region[1] - region[0] >= max_chunk:
+                    # Overlong speech is cut so recognizer requests stay bounded
+                    cut = region[0] + max_chunk
+                    chunk = self.finish(buffer, [region[0], cut], previous_end, 0)
+                    previous_end = cut
+                    region = [cut, region[1]]
+                    yield chunk
+                if region[1] == region[0]:
+                    region = None
+
+            gated += whole
+            # Keep what an open chunk and the padding of the next one may still need
+            needed = [gated - self.keep_silence]
+            for pending in (region, closed):
+                if pending is not None:
+                    needed.append(pending[0] - self.keep_silence)
+            buffer.discard(max(min(needed), 0))
+
+        for pending in (closed, region):
+            if pending is not None:
+                chunk = self.finish(buffer, pending, previous_end, self.keep_silence)
+                previous_end = round(chunk.end * self.sample_rate)
+                yield chunk
+        logger.info(
+            f"Decoded {self.samples_read / self.sample_rate:.1f} seconds of audio "
+            f"in {self.decode_seconds:.2f} seconds")
+
+    def finish(self, buffer: PcmRingBuffer, region: list, previous_end: int, end_padding: int):
+        start = max(region[0] - self.keep_silence, previous_end, 0)
+        end = min(region[1] + end_padding, buffer.end)
+        return AudioChunk(start=start / self.sample_rate, end=end / self.sample_rate,
+                          samples=buffer.read(start, end))
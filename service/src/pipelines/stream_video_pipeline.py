@@ -0,0 +1,165 @@
+# src/pipelines/stream_video_pipeline.py
+import os
+import queue
+import logging
+import threading
+import time
+import cv2
+from PIL import Image
+
+_END = object()
+
+
+class StreamVideoPipeline:
+    """Decode, infer and ingest a video in memory through bounded queues."""
+
+    def __init__(self, frame_extractor, feature_extractor, object_detector,
+                 ingestor, batch_size: int = 16, queue_size: int = 4,
+                 persist: bool = None):
+        self.frame_extractor = frame_extractor
+        self.feature_extractor = feature_extractor
+        self.object_detector = object_detector
+        self.ingestor = ingestor
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.persist = persist if persist is not None else os.getenv(
+            "DEBUG_PERSISTENCE", "false").lower() == "true"
+        # Ranges are filled in by the decoder before frames reach the ingest stage
+        self.ingestor.frame_ranges = self.frame_extractor.frame_ranges
+        self.frames_processed = 0
+        self._stop_event = threading.Event()
+        self._errors = []
+
+    def run(self):
+        start = time.perf_counter()
+        feature_in = queue.Queue(maxsize=self.queue_size)
+        detection_in = queue.Queue(maxsize=self.queue_size)
+        feature_out = queue.Queue(maxsize=self.queue_size)
+        detection_out = queue.Queue(maxsize=self.queue_size)
+
+        workers = [
+            threading.Thread(target=self._guard, name="stream-decode",
+                             args=(self._decode, [feature_in, detection_in], feature_in, detection_in)),
+            threading.Thread(target=self._guard, name="stream-features",
+                             args=(self._infer, [feature_out], feature_in, feature_out,
+                                   self.extract_features)),
+            threading.Thread(target=self._guard, name="stream-detections",
+                             args=(self._infer, [detection_out], detection_in, detection_out,
+                                   self.detect_objects)),
+            threading.Thread(target=self._guard, name="stream-ingest",
+                             args=(self._ingest_all, [], feature_out, detection_out))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        if self._errors:
+            raise self._errors[0]
+        if self.persist:
+            self.frame_extractor.save_frame_ranges()
+
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"Streamed {self.frames_processed} frames in {elapsed:.2f} seconds "
+            f"({self.frames_processed / elapsed if elapsed > 0 else 0:.2f} fps)")
+        return self.frames_processed
+
+    def _guard(self, target, downstream, *args):
+        try:
+            target(*args)
+        except Exception as e:
+            logging.error(f"Streaming stage {threading.current_thread().name} failed: {e}")
+            self._errors.append(e)
+            self._stop_event.set()
+        finally:
+            # Always unblock the next stages, even after a failure
+            for output in downstream:
+                self._put(output, _END, force=True)
+
+    def _put(self, output: queue.Queue, item, force: bool = False):
+        while True:
+            if self._stop_event.is_set() and not force:
+                return False
+            try:
+                output.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if self._stop_event.is_set():
+                    # Drain a slot so the end marker always gets through
+                    try:
+                        output.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _get(self, source: queue.Queue):
+        while True:
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    return _END
+
+    def _decode(self, feature_in: queue.Queue, detection_in: queue.Queue):
+        batch = []
+        for frame_number, _, frame in self.frame_extractor.iter_frames():
+            name = self.frame_extractor.frame_name(frame_number)
+            if self.persist:
+                cv2.imwrite(os.path.join(self.frame_extractor.output_dir, name), frame)
+            image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            batch.append((name, image))
+            if len(batch) >= self.batch_size:
+                if not (self._put(feature_in, batch) and self._put(detection_in, batch)):
+                    return
+                batch = []
+        if batch:
+            self._put(feature_in, batch)
+            self._put(detection_in, batch)
+
+    def _infer(self, source: queue.Queue, output: queue.Queue, process):
+        while True:
+            batch = self._get(source)
+            if batch is _END:
+                return
+            names = [name for name, _ in batch]
+            results = process([image for _, image in batch])
+            if not self._put(output, dict(zip(names, results))):
+                return
+
+    def extract_features(self, images: list):
+        return self.feature_extractor.process_batch(images)
+
+    def detect_objects(self, images: list):
+        return [
+            self.object_detector.to_records(detections)
+            for detections in self.object_detector.process_batch(images)]
+
+    def _ingest_all(self, feature_out: queue.Queue, detection_out: queue.Queue):
+        try:
+            self._ingest(feature_out, detection_out)
+        except Exception:
+            self.ingestor.abort()
+            raise
+        if self._stop_event.is_set():
+            self.ingestor.abort()
+        else:
+            # One flush once every batch is in, not one per batch
+            self.ingestor.finish()
+
+    def _ingest(self, feature_out: queue.Queue, detection_out: queue.Queue):
+        while True:
+            features = self._get(feature_out)
+            detections = self._get(detection_out)
+            if features is _END or detections is _END:
+                return
+            frames = []
+            # Batches hold frames in decode order, sorting the names would put frame_100 before frame_20
+            for name in features:
+                if name not in detections:
+                    continue
+                if self.persist:
+                    self.feature_extractor.save_features(name, features[name])
+                    self.object_detector.save_detections(name, detections[name])
+                frames.append((name, features[name], detections[name]))
+            self.ingestor.ingest_frames(frames)
+            self.frames_processed += len(frames)
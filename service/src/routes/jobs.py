@@ -0,0 +1,53 @@
+# src/routes/jobs.py
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from src.app.job_manager import JobConflict, JobQueueFull
+
+
+class RetryJob(BaseModel):
+    # Stages to run again even though completed, e.g. ["index"] or ["detections"]
+    stages: Optional[List[str]] = None
+
+
+def build_jobs_router(job_manager) -> APIRouter:
+    router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+    @router.get("/")
+    def list_jobs():
+        return job_manager.list()
+
+    @router.get("/{job_id}")
+    def read_job(job_id: str):
+        job = job_manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    @router.get("/{job_id}/trace")
+    def read_job_trace(job_id: str):
+        job = job_manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if not job.get("trace"):
+            # Traces are only collected with JOB_TRACE=true, once the job finished
+            raise HTTPException(status_code=404, detail="No trace recorded for this job")
+        return job["trace"]
+
+    @router.post("/{job_id}/retry", status_code=202)
+    def retry_job(job_id: str, request: Optional[RetryJob] = None):
+        """Run a finished job's upload again, completed stages are skipped."""
+        try:
+            retry_id = job_manager.retry(job_id, request.stages if request else None)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Job not found")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except JobConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e),
+                                headers={"Retry-After": "30"})
+        return {"job_id": retry_id, "retry_of": job_id, "status_url": f"/jobs/{retry_id}"}
+
+    return router
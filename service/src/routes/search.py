@@ -0,0 +1,127 @@
+# src/routes/search.py
+import hashlib
+import io
+import json
+import time
+from typing import List, Optional
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, UnidentifiedImageError
+from pydantic import BaseModel, Field
+from src.pipelines.metrics import metrics
+from src.pipelines.result_cache import content_key
+
+MAX_LIMIT = 100
+MAX_QUERIES = 32
+
+
+class VectorQuery(BaseModel):
+    vectors: List[List[float]] = Field(..., min_length=1, max_length=MAX_QUERIES)
+    video_ids: Optional[List[str]] = None
+    object_class: Optional[str] = None
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    min_confidence: Optional[float] = None
+    limit: int = Field(10, ge=1, le=MAX_LIMIT)
+    offset: int = Field(0, ge=0)
+    nprobe: Optional[int] = Field(None, ge=1)
+    ef: Optional[int] = Field(None, ge=1)
+
+
+def page(results: list, limit: int, offset: int):
+    return {
+        "results": results,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(results) == limit else None
+    }
+
+
+def page_batch(results: list, limit: int, offset: int):
+    # One page per query of a batched search
+    return {"queries": [page(hits, limit, offset) for hits in results]}
+
+
+def build_search_router(searcher, query_cache) -> APIRouter:
+    router = APIRouter(prefix="/search", tags=["search"])
+
+    def cached(kind: str, params: dict, compute):
+        # Hot UI queries are answered from memory, the key covers every parameter
+        key = content_key(kind, json.dumps(params, sort_keys=True))
+        start = time.perf_counter()
+        try:
+            return query_cache.get_or_compute(key, compute)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            metrics.observe("qyv_search_seconds", time.perf_counter() - start, kind=kind)
+
+    @router.post("/vectors")
+    async def search_vectors(query: VectorQuery):
+        params = query.model_dump()
+        results = await run_in_threadpool(
+            cached, "vectors", params, lambda: searcher.search_vectors(**params))
+        return page_batch(results, query.limit, query.offset)
+
+    @router.post("/images")
+    async def search_images(files: List[UploadFile] = File(...),
+                            video_ids: Optional[List[str]] = Form(None),
+                            object_class: Optional[str] = Form(None),
+                            start_time: Optional[float] = Form(None),
+                            end_time: Optional[float] = Form(None),
+                            min_confidence: Optional[float] = Form(None),
+                            limit: int = Form(10, ge=1, le=MAX_LIMIT),
+                            offset: int = Form(0, ge=0),
+                            nprobe: Optional[int] = Form(None, ge=1),
+                            ef: Optional[int] = Form(None, ge=1)):
+        if len(files) > MAX_QUERIES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_QUERIES} images per request")
+        contents = [await file.read() for file in files]
+        try:
+            images = [Image.open(io.BytesIO(content)).convert("RGB") for content in contents]
+        except UnidentifiedImageError:
+            raise HTTPException(status_code=400, detail="Unsupported image file")
+
+        params = {
+            "video_ids": video_ids, "object_class": object_class, "start_time": start_time,
+            "end_time": end_time, "min_confidence": min_confidence, "limit": limit,
+            "offset": offset, "nprobe": nprobe, "ef": ef}
+        # Keyed by the exact uploaded bytes, so a hit skips the Swin forward pass as well
+        key_params = dict(params, images=[hashlib.sha256(content).hexdigest() for content in contents])
+        results = await run_in_threadpool(
+            cached, "images", key_params, lambda: searcher.search_images(images, **params))
+        return page_batch(results, limit, offset)
+
+    @router.get("/objects")
+    def search_objects(object_class: str,
+                       video_ids: Optional[List[str]] = Query(None),
+                       start_time: Optional[float] = None,
+                       end_time: Optional[float] = None,
+                       min_confidence: Optional[float] = None,
+                       limit: int = Query(10, ge=1, le=MAX_LIMIT),
+                       offset: int = Query(0, ge=0)):
+        params = {
+            "object_class": object_class, "video_ids": video_ids, "start_time": start_time,
+            "end_time": end_time, "min_confidence": min_confidence, "limit": limit,
+            "offset": offset}
+        return page(cached("objects", params, lambda: searcher.search_objects(**params)),
+                    limit, offset)
+
+    @router.get("/transcripts")
+    def search_transcripts(text: str,
+                           video_ids: Optional[List[str]] = Query(None),
+                           start_time: Optional[float] = None,
+                           end_time: Optional[float] = None,
+                           limit: int = Query(10, ge=1, le=MAX_LIMIT),
+                           offset: int = Query(0, ge=0)):
+        params = {
+            "text": text, "video_ids": video_ids, "start_time": start_time,
+            "end_time": end_time, "limit": limit, "offset": offset}
+        return page(cached("transcripts", params, lambda: searcher.search_transcripts(**params)),
+                    limit, offset)
+
+    @router.get("/stats")
+    def read_stats():
+        return query_cache.stats()
+
+    return router
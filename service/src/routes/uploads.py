@@ -0,0 +1,96 @@
+# src/routes/uploads.py
+import logging
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Request
+from pydantic import BaseModel, Field
+from src.app.job_manager import JobQueueFull
+from src.app.upload_sessions import UploadOffsetMismatch
+
+logger = logging.getLogger(__name__)
+
+
+class CreateUpload(BaseModel):
+    filename: str
+    size: Optional[int] = Field(None, ge=1)
+    frames_per_second: float = Field(1, gt=0)
+
+
+def build_uploads_router(upload_sessions, job_manager, submit_upload) -> APIRouter:
+    """Resumable uploads: create a session, PUT the bytes in order, then complete it.
+
+    ``submit_upload(upload_id, video_path, frames_per_second, video_hash,
+    upload_pending)`` queues the job, as ``/upload_video/`` does.
+    """
+    router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+    def session_or_404(upload_id: str):
+        session = upload_sessions.get(upload_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return session
+
+    def release_failed_job(session):
+        # A failed early-started job no longer follows the upload, another one is queued instead
+        if session.job_id is None:
+            return
+        job = job_manager.get(session.job_id)
+        if job is None or job["status"] == "failed":
+            logger.info(f"Early-started job {session.job_id} of upload {session.upload_id} failed")
+            session.job_id = None
+
+    @router.post("/", status_code=201)
+    def create_upload(request: CreateUpload):
+        session = upload_sessions.create(request.filename, request.frames_per_second, request.size)
+        return dict(session.status(), upload_url=f"/uploads/{session.upload_id}")
+
+    @router.get("/{upload_id}")
+    def read_upload(upload_id: str):
+        # Clients resume from the returned offset after an interruption
+        return session_or_404(upload_id).status()
+
+    @router.put("/{upload_id}")
+    async def append_upload(upload_id: str, request: Request,
+                            upload_offset: int = Header(..., ge=0)):
+        session = session_or_404(upload_id)
+        try:
+            await upload_sessions.append(session, upload_offset, request.stream())
+        except UploadOffsetMismatch as e:
+            raise HTTPException(status_code=409, detail=str(e),
+                                headers={"Upload-Offset": str(session.received)})
+
+        release_failed_job(session)
+        if upload_sessions.can_start_early(session):
+            # Frames of a streamable container can be decoded while the rest arrives
+            try:
+                session.job_id = submit_upload(
+                    session.upload_id, session.video_path, session.frames_per_second,
+                    upload_pending=True)
+                logger.info(f"Upload {upload_id} started job {session.job_id} before completing")
+            except JobQueueFull:
+                pass  # Retried with the next chunk, or queued on completion
+        return session.status()
+
+    @router.post("/{upload_id}/complete", status_code=202)
+    async def complete_upload(upload_id: str):
+        session = session_or_404(upload_id)
+        release_failed_job(session)
+        if session.job_id is None and not job_manager.has_capacity():
+            raise HTTPException(status_code=429, detail="Job queue is full",
+                                headers={"Retry-After": "30"})
+        try:
+            content_hash = await upload_sessions.finish(session)
+        except UploadOffsetMismatch as e:
+            raise HTTPException(status_code=409, detail=str(e),
+                                headers={"Upload-Offset": str(session.received)})
+
+        if session.job_id is None:
+            try:
+                session.job_id = submit_upload(
+                    session.upload_id, session.video_path, session.frames_per_second,
+                    video_hash=content_hash)
+            except JobQueueFull as e:
+                raise HTTPException(status_code=429, detail=str(e),
+                                    headers={"Retry-After": "30"})
+        return session.status()
+
+    return router
@@ -0,0 +1,18 @@
+# src/routes/videos.py
+from fastapi import APIRouter, HTTPException
+from src.pipelines.ingest_to_milvus import delete_video
+
+
+def build_videos_router(searcher, query_cache) -> APIRouter:
+    router = APIRouter(prefix="/videos", tags=["videos"])
+
+    @router.delete("/{video_id}")
+    def remove_video(video_id: str):
+        # Sync route, FastAPI runs the blocking Milvus calls in its threadpool
+        if not delete_video(video_id):
+            raise HTTPException(status_code=404, detail="Video not found")
+        searcher.forget()
+        query_cache.clear()
+        return {"video_id": video_id, "deleted": True}
+
+    return router
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from pydub import AudioSegment
+
+from benchmarks.local_milvus import LocalMilvusClient
+from benchmarks.stub_models import STUB_CLASS_NAMES, StubSwin, StubYolo
+from benchmarks.synthetic_media import make_synthetic_audio, make_synthetic_video
+from src.pipelines.extract_audio_and_transcribe_video import silence_split_ranges
+from src.pipelines.extract_frames_from_video import ExtractFramesFromVideo
+
+
+class StubModelsTest(unittest.TestCase):
+    def test_swin_outputs_have_the_real_widths(self):
+        pixels = torch.rand(2, 3, 224, 224)
+        output = StubSwin()(pixels)
+        self.assertEqual(tuple(output.logits.shape), (2, 1000))
+        self.assertEqual(tuple(output.pooler_output.shape), (2, 1024))
+        torch.testing.assert_close(StubSwin()(pixels).logits, output.logits)
+
+    def test_yolo_detections_are_deterministic(self):
+        image = Image.fromarray(np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype=np.uint8))
+        yolo = StubYolo(max_boxes=3)
+        [boxes] = yolo([image]).xyxy
+        self.assertTrue(1 <= len(boxes) <= 3)
+        torch.testing.assert_close(yolo(image).xyxy[0], boxes)
+        [frame] = yolo([image]).pandas().xyxy
+        self.assertTrue(set(frame["name"]) <= set(STUB_CLASS_NAMES.values()))
+
+
+class LocalMilvusClientTest(unittest.TestCase):
+    def test_insert_delete_and_index(self):
+        client = LocalMilvusClient(layout="detection")
+        row = {"video_id": "a", "frame_name": "frame_0.jpg", "object_class": "dog", "confidence": 0.9,
+               "start_time": 0.0, "end_time": 0.0, "vector": [0.0] * 8}
+        client.insert_data([row, dict(row, frame_name="frame_30.jpg"), dict(row, video_id="b")])
+        client.delete_frames("a", ["frame_0.jpg"])
+        self.assertEqual(list(zip(client.columns["video_id"], client.columns["frame_name"])),
+                         [("a", "frame_30.jpg"), ("b", "frame_0.jpg")])
+        self.assertEqual(client.build_index()["config"]["index_type"], "FLAT")
+        self.assertEqual(client.vectors().shape, (2, 8))
+
+
+class SyntheticMediaTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_video_has_the_requested_frames(self):
+        path = make_synthetic_video(os.path.join(self.directory, "video.mp4"), seconds=3, width=64,
+                                    height=48, fps=30)
+        cap = cv2.VideoCapture(path)
+        self.addCleanup(cap.release)
+        self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 90)
+        for strategy in ("read", "grab", "seek"):
+            with self.subTest(strategy=strategy):
+                extractor = ExtractFramesFromVideo(path, os.path.join(self.directory, strategy), 1,
+                                                   strategy=strategy)
+                self.assertEqual([number for number, _, _ in extractor.iter_frames()], [0, 30, 60])
+
+    def test_audio_splits_into_one_chunk_per_burst(self):
+        path = make_synthetic_audio(os.path.join(self.directory, "audio.wav"), seconds=8,
+                                    voiced_seconds=2.0, pause_seconds=0.8)
+        audio = AudioSegment.from_wav(path)
+        ranges = silence_split_ranges(audio, min_silence_len=500, silence_thresh=audio.dBFS - 14)
+        self.assertEqual(len(ranges), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.generators import Sine
+from pydub.silence import split_on_silence
+
+from src.pipelines import extract_audio_and_transcribe_video
+from src.pipelines.extract_audio_and_transcribe_video import (
+    TRANSCRIBER_VERSION, ExtractAudioAndTranscribeVideo, run_transcription, silence_split_ranges)
+from src.pipelines.result_cache import ResultCache, content_key
+from src.pipelines.search_video_library import TranscriptIndex
+
+
+def silence(milliseconds: int) -> AudioSegment:
+    return AudioSegment.silent(duration=milliseconds, frame_rate=44100)
+
+
+def tone(milliseconds: int) -> AudioSegment:
+    return Sine(440).to_audio_segment(duration=milliseconds, volume=-3)
+
+
+class SilenceSplitRangesTest(unittest.TestCase):
+    def test_matches_split_on_silence(self):
+        audio = silence(1000) + tone(1000) + silence(600) + tone(1000) + silence(400)
+        ranges = silence_split_ranges(audio, min_silence_len=500, silence_thresh=-16, keep_silence=500)
+        chunks = split_on_silence(audio, min_silence_len=500, silence_thresh=-16, keep_silence=500)
+        self.assertEqual([end - start for start, end in ranges], [len(chunk) for chunk in chunks])
+
+    def test_overlapping_padding_is_split_between_chunks(self):
+        audio = silence(1000) + tone(1000) + silence(600) + tone(1000) + silence(400)
+        (first_start, first_end), (second_start, second_end) = silence_split_ranges(audio)
+        self.assertEqual(first_end, second_start)
+        self.assertLess(first_start, 1000)
+        self.assertEqual(second_end, len(audio))
+
+    def test_padding_is_clipped_to_the_audio(self):
+        audio = silence(200) + tone(1000) + silence(2000)
+        [(start, end)] = silence_split_ranges(audio)
+        self.assertEqual(start, 0)
+        self.assertLess(end, len(audio))
+
+    def test_silence_has_no_chunks(self):
+        self.assertEqual(silence_split_ranges(silence(1000)), [])
+
+
+
+
+class RunTranscriptionTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.audio_dir = os.path.join(directory.name, "audio")
+        self.cache = ResultCache(os.path.join(directory.name, "cache"), max_bytes=1024 ** 2)
+        recognizer = mock.Mock(version="google")
+        for name, value in (("result_cache", self.cache), ("get_speech_recognizer", lambda: recognizer)):
+            patcher = mock.patch.object(extract_audio_and_transcribe_video, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.transcript = [{"start": 0.0, "end": 2.5, "text": "a dog barks", "classification": "Speech"}]
+        self.cache.put_json("transcripts", content_key(TRANSCRIBER_VERSION, "google", "hash"), self.transcript)
+
+    def test_cached_transcript_is_written_for_the_transcript_search(self):
+        transcript, timings = run_transcription(
+            "missing.mp4", os.path.join(self.audio_dir, "duplicate"), video_hash="hash")
+        self.assertEqual(transcript, self.transcript)
+        self.assertEqual(timings, {"audio_extraction": 0.0, "transcription": 0.0})
+
+        [match] = TranscriptIndex(self.audio_dir).search("dog")
+        self.assertEqual((match["video_id"], match["text"]), ("duplicate", "a dog barks"))
+
+
+
+class ClassifyRangesTest(unittest.TestCase):
+    def setUp(self):
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        self.transcriber = ExtractAudioAndTranscribeVideo(
+            "video.mp4", output_dir.name, classifier="vectorized", speech_recognizer=object())
+
+    def track_features(self):
+        # 100 frames of 16 ms: silence for the first 50, music for the rest
+        def halves(first, second):
+            return np.concatenate([np.full(50, first), np.full(50, second)])
+        return {
+            "zcr": halves(0.01, 0.2),
+            "spectral_centroid": halves(1000, 3000),
+            "spectral_contrast": halves(10, 30),
+            "tonnetz": halves(0.05, 0.5),
+            "chroma": halves(0.1, 0.5),
+            "rms": halves(0.001, 0.1)
+        }
+
+    def test_chunks_are_classified_from_their_mean_features(self):
+        with mock.patch.object(self.transcriber, "track_features", self.track_features):
+            classifications = self.transcriber.classify_ranges([(0, 800), (800, 1600), (0, 1600)])
+        self.assertEqual(classifications, ["Silence", "Music", "Speech"])
+
+    def test_ranges_past_the_track_use_its_last_frame(self):
+        with mock.patch.object(self.transcriber, "track_features", self.track_features):
+            self.assertEqual(self.transcriber.classify_ranges([(1600, 3000)]), ["Music"])
+
+    def test_no_ranges_skips_the_features(self):
+        with mock.patch.object(self.transcriber, "track_features") as track_features:
+            self.assertEqual(self.transcriber.classify_ranges([]), [])
+        track_features.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
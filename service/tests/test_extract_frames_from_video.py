@@ -0,0 +1,34 @@
+import itertools
+import tempfile
+import unittest
+
+from src.pipelines.extract_frames_from_video import ExtractFramesFromVideo
+
+
+class TargetFrameNumbersTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output_dir.cleanup)
+
+    def targets(self, fps: float, video_fps: float, count: int, after: int = -1):
+        extractor = ExtractFramesFromVideo("video.mp4", self.output_dir.name, fps, strategy="grab")
+        return list(itertools.islice(extractor.target_frame_numbers(video_fps, after=after), count))
+
+    def test_whole_intervals(self):
+        self.assertEqual(self.targets(1, 30, 4), [0, 30, 60, 90])
+
+    def test_fractional_rates_round_instead_of_drifting(self):
+        # Truncating 29.97 / 1 would sample frame 29, 58, ... and fall behind
+        self.assertEqual(self.targets(1, 29.97, 4), [0, 30, 60, 90])
+        self.assertEqual(self.targets(0.5, 29.97, 4), [0, 60, 120, 180])
+
+    def test_rates_above_the_video_rate_never_repeat_a_frame(self):
+        self.assertEqual(self.targets(60, 30, 5), [0, 1, 2, 3, 4])
+
+    def test_after_skips_the_frames_already_sampled(self):
+        self.assertEqual(self.targets(1, 30, 2, after=60), [90, 120])
+        self.assertEqual(self.targets(1, 30, 1, after=59), [60])
+
+
+if __name__ == "__main__":
+    unittest.main()
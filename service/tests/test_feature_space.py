@@ -0,0 +1,90 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.pipelines.feature_space import FeatureSpace
+
+
+class QueryVectorsTest(unittest.TestCase):
+    def setUp(self):
+        projection_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(projection_dir.cleanup)
+        self.projection_dir = projection_dir.name
+        self.raw = np.random.default_rng(0).standard_normal((2, 1000)).tolist()
+
+    def feature_space(self, **kwargs):
+        options = dict(mode="logits", reduction="random", dim=8, normalize=False, dtype="float32",
+                       projection_dir=self.projection_dir, seed=0)
+        options.update(kwargs)
+        return FeatureSpace("library", **options)
+
+    def test_raw_features_are_reduced_like_stored_ones(self):
+        feature_space = self.feature_space()
+        vectors = feature_space.query_vectors(self.raw)
+        self.assertEqual(vectors, feature_space.milvus_vectors(self.raw))
+        self.assertEqual([len(vector) for vector in vectors], [8, 8])
+
+    def test_reduced_vectors_are_kept(self):
+        feature_space = self.feature_space(normalize=True)
+        reduced = [[0.5] * 8, [2.0] * 8]
+        self.assertEqual(feature_space.query_vectors(reduced), reduced)
+
+    def test_other_widths_are_rejected(self):
+        feature_space = self.feature_space()
+        with self.assertRaises(ValueError):
+            feature_space.query_vectors([[0.0] * 16])
+        with self.assertRaises(ValueError):
+            feature_space.query_vectors([self.raw[0], [0.0] * 16])
+
+    def test_normalized_raw_features_have_unit_length(self):
+        vectors = self.feature_space(normalize=True).query_vectors(self.raw)
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), [1.0, 1.0], rtol=1e-5)
+
+    def test_float16_vectors_are_arrays(self):
+        vectors = self.feature_space(dtype="float16").query_vectors([[0.5] * 8])
+        self.assertEqual(vectors[0].dtype, np.float16)
+
+    def test_without_reduction_raw_features_pass_through(self):
+        feature_space = self.feature_space(reduction="none")
+        np.testing.assert_allclose(feature_space.query_vectors(self.raw), self.raw, rtol=1e-6)
+
+
+class PcaFitTest(unittest.TestCase):
+    def setUp(self):
+        projection_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(projection_dir.cleanup)
+        self.projection_dir = projection_dir.name
+        self.raw = np.random.default_rng(0).standard_normal((16, 1000)).tolist()
+
+    def feature_space(self):
+        return FeatureSpace("library", mode="logits", reduction="pca", dim=4, normalize=False,
+                            dtype="float32", projection_dir=self.projection_dir, fit_samples=8, seed=0)
+
+    def test_too_few_samples_keep_the_random_projection(self):
+        feature_space = self.feature_space()
+        version = feature_space.version
+        with self.assertLogs(level="WARNING"):
+            feature_space.fit(self.raw[:4])
+
+        self.assertTrue(feature_space.needs_fit)
+        self.assertIn("~random", version)
+        self.assertEqual(feature_space.version, version)
+        self.assertEqual([len(vector) for vector in feature_space.milvus_vectors(self.raw[:2])], [4, 4])
+
+    def test_fitted_projection_replaces_the_random_one(self):
+        feature_space = self.feature_space()
+        provisional = feature_space.milvus_vectors(self.raw[:2])
+        feature_space.fit(self.raw)
+
+        self.assertFalse(feature_space.needs_fit)
+        self.assertNotIn("~random", feature_space.version)
+        self.assertNotEqual(feature_space.milvus_vectors(self.raw[:2]), provisional)
+        # Other workers pick up the saved projection
+        other = self.feature_space()
+        self.assertFalse(other.needs_fit)
+        self.assertEqual(other.milvus_vectors(self.raw[:2]), feature_space.milvus_vectors(self.raw[:2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from src.pipelines.filter_redundant_frames import DEFAULT_THRESHOLDS, FilterRedundantFrames
+
+
+def scene(seed: int):
+    # Smooth colour blobs, frames of one shot differ by a little sensor noise
+    blocks = np.random.default_rng(seed).integers(0, 256, (6, 6, 3), dtype=np.uint8)
+    return cv2.resize(blocks, (96, 64), interpolation=cv2.INTER_CUBIC)
+
+
+def noisy(frame, seed: int):
+    noise = np.random.default_rng(seed).integers(-2, 3, frame.shape)
+    return np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+class FilterRedundantFramesTest(unittest.TestCase):
+    def setUp(self):
+        first, second = scene(1), scene(2)
+        # Two seconds of the first shot, one of the second, then the first again
+        shots = [first, first, first, second, second, first]
+        self.frames = [(i * 30, float(i), noisy(frame, i)) for i, frame in enumerate(shots)]
+
+    def test_every_method_keeps_one_frame_per_shot(self):
+        for method in DEFAULT_THRESHOLDS:
+            with self.subTest(method=method):
+                frame_filter = FilterRedundantFrames(method)
+                kept = [frame_number for frame_number, _, _ in frame_filter.filter(self.frames)]
+                self.assertEqual(kept, [0, 90, 150])
+                self.assertEqual(frame_filter.ranges, {
+                    0: {"start": 0.0, "end": 2.0, "frames": 3},
+                    90: {"start": 3.0, "end": 4.0, "frames": 2},
+                    150: {"start": 5.0, "end": 5.0, "frames": 1}
+                })
+                stats = frame_filter.stats()
+                self.assertEqual((stats["frames_seen"], stats["frames_kept"]), (6, 3))
+                self.assertEqual(stats["model_invocations_saved"], 6)
+
+    def test_ranges_are_final_when_a_frame_is_yielded(self):
+        frame_filter = FilterRedundantFrames("phash")
+        for frame_number, _, _ in frame_filter.filter(self.frames):
+            if frame_number == 0:
+                self.assertEqual(frame_filter.ranges[0]["frames"], 3)
+
+    def test_zero_threshold_keeps_changed_frames(self):
+        frame_filter = FilterRedundantFrames("ssim", threshold=0)
+        self.assertEqual(len(list(frame_filter.filter(self.frames))), 6)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            FilterRedundantFrames("optical_flow")
+
+
+if __name__ == "__main__":
+    unittest.main()
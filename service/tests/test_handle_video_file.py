@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from src.pipelines.handle_video_file import MATROSKA_MAGIC, TS_PACKET_SIZE, is_streamable
+
+
+def box(kind: bytes, payload: bytes = b"") -> bytes:
+    return (8 + len(payload)).to_bytes(4, "big") + kind + payload
+
+
+class IsStreamableTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "video")
+
+    def streamable(self, head: bytes) -> bool:
+        with open(self.path, "wb") as f:
+            f.write(head)
+        return is_streamable(self.path)
+
+    def test_matroska(self):
+        self.assertTrue(self.streamable(MATROSKA_MAGIC + b"\x00" * 32))
+
+    def test_mpeg_ts(self):
+        packet = b"\x47" + b"\x00" * (TS_PACKET_SIZE - 1)
+        self.assertTrue(self.streamable(packet * 4))
+        self.assertFalse(self.streamable(packet + b"\x00" * TS_PACKET_SIZE * 3))
+
+    def test_faststart_mp4(self):
+        self.assertTrue(self.streamable(box(b"ftyp", b"isom" * 4) + box(b"moov") + box(b"mdat")))
+
+    def test_fragmented_mp4(self):
+        self.assertTrue(self.streamable(box(b"ftyp") + box(b"moof") + box(b"mdat")))
+
+    def test_moov_after_mdat(self):
+        self.assertFalse(self.streamable(box(b"ftyp") + box(b"mdat", b"\x00" * 64) + box(b"moov")))
+
+    def test_large_box_sizes_are_skipped(self):
+        free = (1).to_bytes(4, "big") + b"free" + (24).to_bytes(8, "big") + b"\x00" * 8
+        self.assertTrue(self.streamable(box(b"ftyp") + free + box(b"moov")))
+
+    def test_truncated_or_unknown_headers(self):
+        self.assertFalse(self.streamable(box(b"ftyp")))
+        self.assertFalse(self.streamable(b"\x00\x00\x00\x00free" + box(b"moov")))
+        self.assertFalse(self.streamable(b""))
+
+
+if __name__ == "__main__":
+    unittest.main()
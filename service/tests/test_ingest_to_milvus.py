@@ -0,0 +1,213 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from benchmarks.local_milvus import LocalMilvusClient
+from src.pipelines.feature_space import FeatureSpace
+from src.pipelines.ingest_to_milvus import (
+    READ_AHEAD_FRAMES, ColumnarBatchWriter, IngestToMilvus, estimate_row_bytes)
+
+
+def rows(frame: str, detections: int = 2, video_id: str = "video"):
+    return [{
+        "video_id": video_id,
+        "frame_name": frame,
+        "object_class": f"class{i}",
+        "confidence": 0.5,
+        "start_time": 0.0,
+        "end_time": 0.0,
+        "vector": [0.0] * 64
+    } for i in range(detections)]
+
+
+class RecordingClient(LocalMilvusClient):
+    def __init__(self, **kwargs):
+        super().__init__(layout="detection", **kwargs)
+        self.delete_threads = []
+
+    def delete_frames(self, video_id: str, frame_names: list):
+        self.delete_threads.append(threading.current_thread())
+        super().delete_frames(video_id, frame_names)
+
+
+class ColumnarBatchWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.client = RecordingClient()
+        self.batches = []
+        self.frame_bytes = sum(estimate_row_bytes(row) for row in rows("frame_0"))
+
+    def writer(self, frames_per_batch: int, **kwargs):
+        return ColumnarBatchWriter(self.client, self.frame_bytes * frames_per_batch, max_in_flight=2,
+                                   on_batch=self.batches.append, **kwargs)
+
+    def test_batches_are_cut_by_size_between_frames(self):
+        writer = self.writer(frames_per_batch=3)
+        for i in range(7):
+            writer.add_rows(rows(f"frame_{i}"))
+        stats = writer.close()
+
+        self.assertEqual((stats["rows"], stats["batches"]), (14, 3))
+        self.assertEqual(self.batches, [
+            ["frame_0", "frame_1", "frame_2"], ["frame_3", "frame_4", "frame_5"], ["frame_6"]])
+        self.assertEqual(self.client.columns["frame_name"],
+                         [f"frame_{i}" for i in range(7) for _ in range(2)])
+        self.assertEqual(self.client.flush_calls, 1)
+
+    def test_nothing_inserted_skips_the_flush(self):
+        self.assertEqual(self.writer(frames_per_batch=1).close()["rows"], 0)
+        self.assertEqual(self.client.flush_calls, 0)
+
+    def test_replace_deletes_stored_rows_from_the_submitting_thread(self):
+        self.client.insert_data(rows("frame_0") + rows("frame_1") + rows("frame_0", video_id="other"))
+        writer = self.writer(frames_per_batch=1, replace=True)
+        for i in range(3):
+            writer.add_rows(rows(f"frame_{i}"))
+        writer.close()
+
+        stored = list(zip(self.client.columns["video_id"], self.client.columns["frame_name"]))
+        self.assertEqual(sorted(stored), sorted(
+            [("other", "frame_0")] * 2 + [("video", f"frame_{i}") for i in range(3) for _ in range(2)]))
+        self.assertEqual(set(self.client.delete_threads), {threading.current_thread()})
+
+    def test_in_flight_inserts_are_bounded(self):
+        self.client.insert_latency = 0.02
+        running = []
+        peak = []
+        insert_columns = self.client.insert_columns
+
+        def counting_insert(columns):
+            running.append(1)
+            peak.append(len(running))
+            try:
+                return insert_columns(columns)
+            finally:
+                running.pop()
+
+        self.client.insert_columns = counting_insert
+        writer = self.writer(frames_per_batch=1)
+        for i in range(8):
+            writer.add_rows(rows(f"frame_{i}"))
+        self.assertLessEqual(len(writer.in_flight), 2)
+        writer.close()
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(len(self.batches), 8)
+
+    def test_abort_drops_pending_rows_without_flushing(self):
+        writer = self.writer(frames_per_batch=10)
+        writer.add_rows(rows("frame_0"))
+        writer.abort()
+        self.assertEqual(self.client.num_entities, 0)
+        self.assertEqual(self.client.flush_calls, 0)
+
+
+class IngestToMilvusTest(unittest.TestCase):
+    def setUp(self):
+        frames_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(frames_dir.cleanup)
+        self.frames_dir = frames_dir.name
+        self.space = FeatureSpace("test", mode="logits", reduction="none", normalize=False, dtype="float32")
+
+    def write_frame(self, frame_number: int, detections=("person",)):
+        frame = f"frame_{frame_number}.jpg"
+        with open(os.path.join(self.frames_dir, f"{frame}_features.json"), "w") as f:
+            json.dump({"frame": frame, "features": [float(frame_number)] * self.space.raw_dim}, f)
+        with open(os.path.join(self.frames_dir, f"{frame}_detections.json"), "w") as f:
+            json.dump({"frame": frame, "detections": [
+                {"name": name, "confidence": 0.9} for name in detections]}, f)
+
+    def ingestor(self, client, **kwargs):
+        return IngestToMilvus(self.frames_dir, client, video_id="video", space=self.space,
+                              frame_ranges={}, **kwargs)
+
+    def test_frames_are_ingested_in_frame_number_order(self):
+        for frame_number in (100, 20, 0, 1000):
+            self.write_frame(frame_number)
+        # Features without detections are skipped with a warning
+        with open(os.path.join(self.frames_dir, "frame_5.jpg_features.json"), "w") as f:
+            json.dump({"frame": "frame_5.jpg", "features": []}, f)
+        client = LocalMilvusClient(layout="detection")
+        stats = self.ingestor(client).ingest_data()
+
+        self.assertEqual(stats["rows"], 4)
+        self.assertEqual(client.columns["frame_name"],
+                         ["frame_0.jpg", "frame_20.jpg", "frame_100.jpg", "frame_1000.jpg"])
+        self.assertEqual(client.flush_calls, 1)
+
+    def test_resume_skips_ingested_frames(self):
+        for frame_number in range(4):
+            self.write_frame(frame_number)
+        client = LocalMilvusClient(layout="detection")
+        ingested = []
+        self.ingestor(client, ingested={"frame_0.jpg", "frame_1.jpg"}, resume=True,
+                      on_ingested=ingested.extend).ingest_data()
+        self.assertEqual(client.columns["frame_name"], ["frame_2.jpg", "frame_3.jpg"])
+        self.assertEqual(ingested, ["frame_2.jpg", "frame_3.jpg"])
+
+    def test_files_are_read_a_bounded_number_of_frames_ahead(self):
+        ingestor = self.ingestor(LocalMilvusClient(layout="detection"))
+        loaded = []
+        with mock.patch.object(ingestor, "load_frame", lambda *pair: loaded.append(pair[0]) or pair[0]):
+            frames = ingestor.load_frames([(f"frame_{i}", None, None) for i in range(10 * READ_AHEAD_FRAMES)])
+            self.assertEqual(next(frames), "frame_0")
+            time.sleep(0.05)
+            self.assertLessEqual(len(loaded), READ_AHEAD_FRAMES)
+            self.assertEqual(list(frames), [f"frame_{i}" for i in range(1, 10 * READ_AHEAD_FRAMES)])
+
+    def test_failed_ingest_stops_the_writer(self):
+        self.write_frame(0)
+        client = LocalMilvusClient(layout="detection")
+        client.insert_columns = mock.Mock(side_effect=RuntimeError("insert failed"))
+        ingestor = self.ingestor(client)
+        with self.assertRaises(RuntimeError):
+            ingestor.ingest_data()
+        self.assertIsNone(ingestor.writer)
+        self.assertEqual(client.flush_calls, 0)
+
+
+class PcaIngestTest(unittest.TestCase):
+    def setUp(self):
+        frames_root = tempfile.TemporaryDirectory()
+        self.addCleanup(frames_root.cleanup)
+        self.frames_root = frames_root.name
+        self.space = FeatureSpace("test", mode="logits", reduction="pca", dim=4, normalize=False,
+                                  dtype="float32", projection_dir=os.path.join(self.frames_root, "projections"),
+                                  fit_samples=8, seed=0)
+
+    def write_frames(self, upload: str, count: int):
+        frames_dir = os.path.join(self.frames_root, upload)
+        os.makedirs(frames_dir, exist_ok=True)
+        features = np.random.default_rng(len(os.listdir(self.frames_root))).standard_normal(
+            (count, self.space.raw_dim))
+        for frame_number in range(count):
+            frame = f"frame_{frame_number}.jpg"
+            with open(os.path.join(frames_dir, f"{frame}_features.json"), "w") as f:
+                json.dump({"frame": frame, "features": features[frame_number].tolist()}, f)
+            with open(os.path.join(frames_dir, f"{frame}_detections.json"), "w") as f:
+                json.dump({"frame": frame, "detections": [{"name": "person", "confidence": 0.9}]}, f)
+        return frames_dir
+
+    def ingest(self, frames_dir: str):
+        client = LocalMilvusClient(layout="detection")
+        IngestToMilvus(frames_dir, client, video_id="video", space=self.space, frame_ranges={}).ingest_data()
+        return client
+
+    def test_short_first_video_is_stored_with_the_random_projection(self):
+        client = self.ingest(self.write_frames("first", 3))
+        self.assertEqual(client.num_entities, 3)
+        self.assertEqual(client.vectors().shape, (3, 4))
+        self.assertTrue(self.space.needs_fit)
+
+    def test_earlier_uploads_top_up_the_fit(self):
+        self.write_frames("first", 5)
+        self.ingest(self.write_frames("second", 4))
+        self.assertFalse(self.space.needs_fit)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from src.app.job_manager import JobManager, JobQueueFull, can_resume_ingest, expire_failed_uploads
+from src.pipelines.stage_manifest import MANIFEST_FILE, StageManifest
+
+
+class Executor:
+    """Holds submitted jobs without running them."""
+
+    def __init__(self, broken: bool = False):
+        self.broken = broken
+        self.futures = []
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        if self.broken:
+            raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class JobManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.done = []
+        self.job_manager = JobManager(max_workers=1, max_queued=1, preload_models=False,
+                                      on_job_done=self.done.append)
+        self.job_manager.jobs = {}
+        self.job_manager.worker_stats = {}
+        self.job_manager.worker_metrics = {}
+        self.executor = self.job_manager._executor = Executor()
+        self.new_executors = []
+        patcher = mock.patch.object(self.job_manager, "_new_executor", self.new_executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def new_executor(self):
+        executor = Executor()
+        self.new_executors.append(executor)
+        return executor
+
+    def submit(self, upload_id: str = "video"):
+        return self.job_manager.submit({"upload_id": upload_id})
+
+    def test_full_queue_rejects_jobs_until_one_finishes(self):
+        first = self.submit("first")
+        self.submit("second")
+        self.assertFalse(self.job_manager.has_capacity())
+        with self.assertRaises(JobQueueFull):
+            self.submit("third")
+
+        self.executor.futures[0].set_result(None)
+        self.assertEqual(self.done, [first])
+        self.assertTrue(self.job_manager.has_capacity())
+        self.submit("third")
+        self.assertEqual(self.job_manager.stats()["active"], 2)
+
+    def test_broken_pool_is_replaced_on_submit(self):
+        self.executor.broken = True
+        job_id = self.submit()
+        [executor] = self.new_executors
+        self.assertIs(self.job_manager._executor, executor)
+        self.assertTrue(self.executor.shut_down)
+        self.assertEqual(len(executor.futures), 1)
+        self.assertEqual(self.job_manager.get(job_id)["status"], "queued")
+
+    def test_worker_death_fails_its_job_and_replaces_the_pool(self):
+        job_id = self.submit()
+        self.executor.futures[0].set_exception(BrokenProcessPool("worker killed"))
+        self.assertEqual(self.job_manager.get(job_id)["status"], "failed")
+        self.assertEqual(len(self.new_executors), 1)
+        self.assertTrue(self.executor.shut_down)
+        self.assertTrue(self.job_manager.has_capacity())
+
+    def test_failed_submission_frees_its_slot(self):
+        self.executor.broken = True
+        with mock.patch.object(self.job_manager, "_new_executor", lambda: Executor(broken=True)):
+            with self.assertRaises(BrokenProcessPool):
+                self.submit()
+        self.assertEqual(self.job_manager.stats()["active"], 0)
+        [job] = self.job_manager.list()
+        self.assertEqual(job["status"], "failed")
+
+
+class ExpireFailedUploadsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.frames_root = os.path.join(self.root, "frames")
+
+    def failed_upload(self, upload_id: str, age: float):
+        frames_dir = os.path.join(self.frames_root, upload_id)
+        os.makedirs(frames_dir)
+        video_path = os.path.join(self.root, f"{upload_id}.mp4")
+        open(video_path, "w").close()
+        manifest = StageManifest(os.path.join(frames_dir, MANIFEST_FILE))
+        manifest.mark_failed([video_path])
+        manifest.data["failed"]["at"] -= age
+        manifest.save()
+        return frames_dir, video_path
+
+    def test_only_old_failures_are_removed(self):
+        old_dir, old_video = self.failed_upload("old", age=120)
+        new_dir, new_video = self.failed_upload("new", age=0)
+        skipped_dir, _ = self.failed_upload("running", age=120)
+
+        self.assertEqual(expire_failed_uploads(self.frames_root, 60, skip={"running"}), ["old"])
+        self.assertFalse(os.path.exists(old_dir) or os.path.exists(old_video))
+        self.assertTrue(os.path.exists(new_dir) and os.path.exists(new_video))
+        self.assertTrue(os.path.exists(skipped_dir))
+
+    def test_missing_root_expires_nothing(self):
+        self.assertEqual(expire_failed_uploads(os.path.join(self.root, "missing"), 60), [])
+
+
+class CanResumeIngestTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.manifest = StageManifest(os.path.join(directory.name, MANIFEST_FILE))
+        self.manifest.prepare({"ingest": "v1"})
+
+    def client(self, collection_name: str, has_video: bool = True, shared: bool = False):
+        return mock.Mock(collection_name=collection_name, shared=shared,
+                         has_video=mock.Mock(return_value=has_video))
+
+    def test_unfinished_ingest_needs_its_staging_collection(self):
+        self.assertFalse(can_resume_ingest(self.client("object_detection_video"), self.manifest, "video"))
+        self.assertTrue(can_resume_ingest(self.client("staging_object_detection_video", has_video=False),
+                                          self.manifest, "video"))
+
+    def test_checkpointed_rows_must_still_be_stored(self):
+        self.manifest.add_checkpoint_frames("ingest", ["frame_0.jpg"])
+        client = self.client("shared", has_video=False, shared=True)
+        self.assertFalse(can_resume_ingest(client, self.manifest, "video"))
+        client.has_video.assert_called_once_with("video")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from src.pipelines.metrics import MetricsRegistry
+
+
+class MergeTest(unittest.TestCase):
+    def test_counters_and_histograms_add_up_and_gauges_are_replaced(self):
+        worker = MetricsRegistry(buckets=(0.1, 1.0))
+        worker.inc("qyv_items_total", 3, stage="frames")
+        worker.set_gauge("qyv_model_loaded", 1, model="swin")
+        worker.observe("qyv_item_seconds", 0.05, stage="frames")
+        worker.observe("qyv_item_seconds", 0.5, count=2, stage="frames")
+
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        registry.inc("qyv_items_total", 2, stage="frames")
+        registry.set_gauge("qyv_model_loaded", 0, model="swin")
+        registry.observe("qyv_item_seconds", 5.0, stage="frames")
+        registry.merge(worker.snapshot())
+
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot["counters"], [["qyv_items_total", [("stage", "frames")], 5]])
+        self.assertEqual(snapshot["gauges"], [["qyv_model_loaded", [("model", "swin")], 1]])
+        [[_, _, histogram]] = snapshot["histograms"]
+        self.assertEqual(histogram["buckets"], [1, 2])
+        self.assertEqual(histogram["count"], 4)
+        self.assertAlmostEqual(histogram["sum"], 6.05)
+
+    def test_drained_snapshots_merge_once(self):
+        worker = MetricsRegistry()
+        worker.inc("qyv_jobs_total", status="completed")
+        registry = MetricsRegistry()
+        registry.merge(worker.drain())
+        registry.merge(worker.drain())
+        self.assertEqual(registry.counter_totals(), {'qyv_jobs_total{status="completed"}': 1})
+
+    def test_empty_snapshot_is_ignored(self):
+        registry = MetricsRegistry()
+        registry.merge(None)
+        registry.merge({})
+        self.assertEqual(registry.counter_totals(), {})
+
+    def test_different_buckets_are_rejected(self):
+        with self.assertRaises(ValueError):
+            MetricsRegistry(buckets=(1.0,)).merge(MetricsRegistry(buckets=(2.0,)).snapshot())
+
+
+class RenderPrometheusTest(unittest.TestCase):
+    def test_histograms_are_cumulative(self):
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        registry.observe("qyv_stage_seconds", 0.05, stage="ingest")
+        registry.observe("qyv_stage_seconds", 0.5, stage="ingest")
+        registry.observe("qyv_stage_seconds", 2.0, stage="ingest")
+        self.assertEqual(registry.render_prometheus().splitlines(), [
+            "# HELP qyv_stage_seconds Wall time of a pipeline stage",
+            "# TYPE qyv_stage_seconds histogram",
+            'qyv_stage_seconds_bucket{stage="ingest",le="0.1"} 1',
+            'qyv_stage_seconds_bucket{stage="ingest",le="1.0"} 2',
+            'qyv_stage_seconds_bucket{stage="ingest",le="+Inf"} 3',
+            'qyv_stage_seconds_sum{stage="ingest"} 2.55',
+            'qyv_stage_seconds_count{stage="ingest"} 3'
+        ])
+
+    def test_counters_gauges_and_label_escaping(self):
+        registry = MetricsRegistry()
+        registry.inc("qyv_items_total", 2, stage="frames")
+        registry.set_gauge("custom_value", 1.5, path='a"b\\c')
+        lines = registry.render_prometheus().splitlines()
+        self.assertIn("# TYPE qyv_items_total counter", lines)
+        self.assertIn('qyv_items_total{stage="frames"} 2', lines)
+        self.assertIn("# TYPE custom_value untyped", lines)
+        self.assertIn('custom_value{path="a\\"b\\\\c"} 1.5', lines)
+
+    def test_empty_registry(self):
+        self.assertEqual(MetricsRegistry().render_prometheus(), "\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
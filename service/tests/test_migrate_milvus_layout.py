@@ -0,0 +1,92 @@
+import unittest
+from unittest import mock
+
+from pymilvus import CollectionSchema, DataType, FieldSchema
+
+from benchmarks.local_milvus import LocalMilvusClient
+from src.pipelines import migrate_milvus_layout
+from src.pipelines.migrate_milvus_layout import frame_groups, frame_row, migrate_collection
+
+# Schema of the collections written before video ids and frame times were stored
+BASELINE_SCHEMA = CollectionSchema([
+    FieldSchema(name="frame_id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+    FieldSchema(name="frame_name", dtype=DataType.VARCHAR, max_length=255),
+    FieldSchema(name="object_class", dtype=DataType.VARCHAR, max_length=255),
+    FieldSchema(name="confidence", dtype=DataType.FLOAT),
+    FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=4)
+])
+
+
+class QueryIterator:
+    def __init__(self, rows: list, batch_size: int):
+        self.batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+        self.closed = False
+
+    def next(self):
+        return self.batches.pop(0) if self.batches else []
+
+    def close(self):
+        self.closed = True
+
+
+class Collection:
+    def __init__(self, schema: CollectionSchema, rows: list):
+        self.schema = schema
+        self.rows = rows
+        self.iterators = []
+
+    def query_iterator(self, batch_size: int, expr: str, output_fields: list):
+        names = {field.name for field in self.schema.fields}
+        unknown = set(output_fields) - names
+        if unknown:
+            raise ValueError(f"field {sorted(unknown)} not exist")
+        self.iterators.append(QueryIterator(
+            [{name: row[name] for name in output_fields} for row in self.rows], batch_size))
+        return self.iterators[-1]
+
+    def release(self):
+        pass
+
+
+def baseline_rows():
+    return [
+        {"frame_id": 1, "frame_name": "frame_0.jpg", "object_class": "dog", "confidence": 0.75, "vector": [0.0] * 4},
+        {"frame_id": 2, "frame_name": "frame_0.jpg", "object_class": "cat", "confidence": 0.5, "vector": [0.0] * 4},
+        {"frame_id": 3, "frame_name": "frame_1.jpg", "object_class": "dog", "confidence": 0.25, "vector": [1.0] * 4}
+    ]
+
+
+class FrameGroupsTest(unittest.TestCase):
+    def test_baseline_rows_are_grouped_by_frame(self):
+        collection = Collection(BASELINE_SCHEMA, baseline_rows())
+        groups = list(frame_groups(collection, batch_size=2, video_id="upload"))
+
+        self.assertEqual([[row["object_class"] for row in group] for group in groups], [["dog", "cat"], ["dog"]])
+        self.assertTrue(collection.iterators[0].closed)
+        row = frame_row(groups[0], "upload")
+        self.assertEqual((row["video_id"], row["frame_name"], row["start_time"], row["end_time"]),
+                         ("upload", "frame_0.jpg", 0.0, 0.0))
+        self.assertEqual(row["class_confidence"], {"dog": 0.75, "cat": 0.5})
+
+
+class MigrateCollectionTest(unittest.TestCase):
+    def test_baseline_collection_takes_its_video_id_from_the_name(self):
+        source = mock.Mock(layout="detection", vector_dim=4, vector_dtype="float32",
+                           collection=Collection(BASELINE_SCHEMA, baseline_rows()))
+        target = LocalMilvusClient(layout="frame")
+        target.collection = mock.Mock()
+        clients = mock.Mock(side_effect=[source, target])
+        with mock.patch.object(migrate_milvus_layout, "MilvusClient", clients), \
+                mock.patch.object(migrate_milvus_layout, "utility") as utility:
+            utility.has_collection.return_value = False
+            stats = migrate_collection("object_detection_upload")
+
+        self.assertEqual(stats, {"collection": "object_detection_upload", "detection_rows": 3, "frame_rows": 2})
+        self.assertEqual(target.columns["video_id"], ["upload", "upload"])
+        self.assertEqual(target.columns["frame_name"], ["frame_0.jpg", "frame_1.jpg"])
+        utility.rename_collection.assert_any_call("object_detection_upload", "backup_object_detection_upload")
+        utility.rename_collection.assert_any_call("migrating_object_detection_upload", "object_detection_upload")
+
+
+if __name__ == "__main__":
+    unittest.main()
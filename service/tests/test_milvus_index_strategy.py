@@ -0,0 +1,58 @@
+import unittest
+
+from src.pipelines.milvus_index_strategy import FLAT_MAX_VECTORS, SQ8_MIN_VECTORS, MilvusIndexStrategy
+
+
+def strategy(**kwargs):
+    options = dict(index_type="auto", metric_type="L2", recall_target=0.95, latency_target_ms=50)
+    options.update(kwargs)
+    return MilvusIndexStrategy(**options)
+
+
+class MilvusIndexStrategyTest(unittest.TestCase):
+    def index_type(self, num_vectors: int, **kwargs):
+        return strategy(**kwargs).choose(num_vectors, 256)["index_type"]
+
+    def test_size_thresholds(self):
+        self.assertEqual(self.index_type(0), "FLAT")
+        self.assertEqual(self.index_type(FLAT_MAX_VECTORS), "FLAT")
+        self.assertEqual(self.index_type(FLAT_MAX_VECTORS + 1), "IVF_FLAT")
+        self.assertEqual(self.index_type(SQ8_MIN_VECTORS - 1), "IVF_FLAT")
+        self.assertEqual(self.index_type(SQ8_MIN_VECTORS), "IVF_SQ8")
+
+    def test_tight_targets_pick_hnsw(self):
+        self.assertEqual(self.index_type(FLAT_MAX_VECTORS + 1, latency_target_ms=10), "HNSW")
+        self.assertEqual(self.index_type(SQ8_MIN_VECTORS, recall_target=0.98), "HNSW")
+        # Small collections stay brute force whatever the targets
+        self.assertEqual(self.index_type(100, recall_target=0.99), "FLAT")
+
+    def test_forced_index_type(self):
+        self.assertEqual(self.index_type(100, index_type="hnsw"), "HNSW")
+        with self.assertRaises(ValueError):
+            strategy(index_type="DISKANN").choose(100, 256)
+
+    def test_ivf_parameters_grow_with_the_collection(self):
+        config = strategy().choose(1_000_000, 256)
+        self.assertEqual(config["params"], {"nlist": 4096})
+        self.assertEqual(config["search_params"], {"nprobe": 256})
+        self.assertEqual(strategy().ivf_params(20_000)[0], {"nlist": 512})
+        self.assertEqual(strategy().ivf_params(10 ** 12)[0], {"nlist": 65536})
+        # Lower recall targets probe fewer lists, never fewer than 8
+        self.assertEqual(strategy(recall_target=0.9).nprobe(256), 8)
+
+    def test_hnsw_parameters_follow_the_recall_target(self):
+        config = strategy(index_type="HNSW").choose(50_000, 256)
+        self.assertEqual(config["params"], {"M": 16, "efConstruction": 200})
+        self.assertEqual(config["search_params"], {"ef": 96})
+        self.assertEqual(strategy(recall_target=0.99).hnsw_params(), (
+            {"M": 32, "efConstruction": 200}, {"ef": 256}))
+
+    def test_search_params_of_a_built_index(self):
+        self.assertEqual(strategy().search_params("IVF_FLAT", {"nlist": 1024}), {"nprobe": 64})
+        self.assertEqual(strategy().search_params("HNSW", {"M": 16}), {"ef": 96})
+        self.assertEqual(strategy().search_params("FLAT", {}), {})
+        self.assertEqual(strategy().search_params(None, {}), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import time
+import unittest
+from unittest import mock
+
+from src.pipelines.model_registry import ModelRegistry
+
+
+class ModelRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.loads = []
+        self.registry = ModelRegistry(idle_timeout=60, check_interval=0.01)
+        self.registry.register("swin", lambda: self.load("swin"))
+        self.registry.register("yolov5", lambda: self.load("yolov5"))
+
+    def load(self, name: str):
+        self.loads.append(name)
+        return object()
+
+    def test_models_load_once(self):
+        model = self.registry.get("swin")
+        self.assertIs(self.registry.get("swin"), model)
+        self.assertEqual(self.loads, ["swin"])
+        with self.assertRaises(KeyError):
+            self.registry.get("clip")
+
+    def test_idle_models_are_evicted_and_reloaded_on_use(self):
+        evicted = []
+        self.registry.on_evict(evicted.append)
+        self.registry.warm_up()
+        now = time.time()
+        with mock.patch("src.pipelines.model_registry.time.time", return_value=now + 30):
+            self.registry.get("yolov5")
+        with mock.patch("src.pipelines.model_registry.time.time", return_value=now + 61):
+            self.assertEqual(self.registry.evict_idle(), ["swin"])
+        self.assertEqual(evicted, ["swin"])
+
+        stats = self.registry.stats()["models"]
+        self.assertFalse(stats["swin"]["loaded"])
+        self.assertTrue(stats["yolov5"]["loaded"])
+        self.registry.get("swin")
+        self.assertEqual(self.registry.stats()["models"]["swin"]["load_count"], 2)
+
+    def test_no_timeout_keeps_every_model(self):
+        registry = ModelRegistry(idle_timeout=0)
+        registry.register("swin", object)
+        registry.get("swin")
+        registry.start_idle_eviction()
+        self.assertIsNone(registry._reaper)
+        self.assertEqual(registry.evict_idle(), [])
+
+    def test_reaper_evicts_in_the_background(self):
+        self.registry.idle_timeout = 0.05
+        self.registry.get("swin")
+        self.registry.start_idle_eviction()
+        self.addCleanup(self.registry.stop_idle_eviction)
+        deadline = time.monotonic() + 5
+        while self.registry.stats()["models"]["swin"]["loaded"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(self.registry.stats()["models"]["swin"]["loaded"])
+
+    def test_evicting_an_unloaded_model_is_a_no_op(self):
+        callback = mock.Mock()
+        self.registry.on_evict(callback)
+        self.assertFalse(self.registry.evict("swin"))
+        callback.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
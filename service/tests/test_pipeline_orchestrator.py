@@ -0,0 +1,79 @@
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from src.pipelines import pipeline_orchestrator
+from src.pipelines.model_registry import model_registry
+from src.pipelines.pipeline_orchestrator import (
+    discard_executor, inference_executor, retire_inference_executor)
+
+
+class Executor:
+    def __init__(self):
+        self.shut_down = False
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class InferenceExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.built = []
+        for patcher in (
+                mock.patch.dict(pipeline_orchestrator._executors, clear=True),
+                mock.patch.object(pipeline_orchestrator, "_inference_users", 0),
+                mock.patch.object(pipeline_orchestrator, "_retire_inference", False),
+                mock.patch.object(pipeline_orchestrator, "build_inference_executor", self.build)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def build(self):
+        executor = Executor()
+        self.built.append(executor)
+        return executor
+
+    def test_pool_is_shared_between_runs(self):
+        with inference_executor() as first:
+            pass
+        with inference_executor() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertFalse(first.shut_down)
+
+    def test_broken_pool_is_replaced(self):
+        with self.assertRaises(BrokenProcessPool):
+            with inference_executor():
+                raise BrokenProcessPool("worker killed")
+        with inference_executor() as executor:
+            pass
+        broken, replacement = self.built
+        self.assertTrue(broken.shut_down)
+        self.assertIs(executor, replacement)
+        self.assertFalse(replacement.shut_down)
+
+    def test_stale_pool_is_not_discarded_twice(self):
+        with inference_executor() as executor:
+            pass
+        discard_executor("inference", Executor())
+        self.assertIs(pipeline_orchestrator._executors["inference"], executor)
+
+    def test_retirement_waits_for_running_jobs(self):
+        with inference_executor() as executor:
+            retire_inference_executor("swin")
+            self.assertFalse(executor.shut_down)
+        self.assertTrue(executor.shut_down)
+        self.assertNotIn("inference", pipeline_orchestrator._executors)
+
+    def test_idle_pool_is_retired_on_model_eviction(self):
+        self.assertIn(retire_inference_executor, model_registry._evict_callbacks)
+        with inference_executor() as executor:
+            pass
+        retire_inference_executor("yolov5")
+        self.assertTrue(executor.shut_down)
+        with inference_executor() as rebuilt:
+            pass
+        self.assertIsNot(rebuilt, executor)
+
+
+if __name__ == "__main__":
+    unittest.main()
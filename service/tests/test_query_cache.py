@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+from src.pipelines.query_cache import QueryCache
+
+
+class QueryCacheTest(unittest.TestCase):
+    def test_least_recently_used_entry_is_dropped(self):
+        cache = QueryCache(max_entries=2, ttl_seconds=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_entries_expire(self):
+        cache = QueryCache(max_entries=2, ttl_seconds=60)
+        with mock.patch("src.pipelines.query_cache.time.monotonic", return_value=1000):
+            cache.put("a", 1)
+        with mock.patch("src.pipelines.query_cache.time.monotonic", return_value=1059):
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch("src.pipelines.query_cache.time.monotonic", return_value=1061):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_get_or_compute_computes_once(self):
+        cache = QueryCache()
+        compute = mock.Mock(return_value=[{"frame_name": "frame_0.jpg"}])
+        self.assertEqual(cache.get_or_compute("key", compute), compute.return_value)
+        self.assertEqual(cache.get_or_compute("key", compute), compute.return_value)
+        compute.assert_called_once()
+        cache.clear()
+        cache.get_or_compute("key", compute)
+        self.assertEqual(compute.call_count, 2)
+
+    def test_disabled_cache(self):
+        for cache in (QueryCache(max_entries=0), QueryCache(ttl_seconds=0)):
+            cache.put("a", 1)
+            self.assertIsNone(cache.get("a"))
+            self.assertFalse(cache.stats()["enabled"])
+
+
+if __name__ == "__main__":
+    unittest.main()
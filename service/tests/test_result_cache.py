@@ -0,0 +1,82 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from src.pipelines.result_cache import ResultCache, content_key, frame_hash
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.cache = ResultCache(root.name, max_bytes=1024 ** 3)
+
+    def put(self, key: str, age: float = 0):
+        # Random bytes keep every entry about the same size after compression
+        self.cache.put_arrays("frames", key, features=np.random.default_rng(len(key)).random(256))
+        path = self.cache.path("frames", key, ".npz")
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return os.path.getsize(path)
+
+    def cached(self, key: str) -> bool:
+        return os.path.exists(self.cache.path("frames", key, ".npz"))
+
+    def test_round_trip(self):
+        self.cache.put_json("transcripts", "key", [{"text": "hello"}])
+        self.assertEqual(self.cache.get_json("transcripts", "key"), [{"text": "hello"}])
+        self.assertIsNone(self.cache.get_json("transcripts", "other"))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        sizes = [self.put("a", age=300), self.put("bb", age=200), self.put("ccc", age=100)]
+        # Reading an entry makes it the most recently used
+        self.assertIsNotNone(self.cache.get_arrays("frames", "a"))
+        # A fourth entry overflows the limit, dropping one brings it under 90% of it
+        self.cache.max_bytes = int(sum(sizes) * 3.5 / 3)
+        self.put("dddd")
+        self.assertEqual([self.cached(key) for key in ("a", "bb", "ccc", "dddd")],
+                         [True, False, True, True])
+
+    def test_eviction_stops_below_the_limit(self):
+        for i in range(10):
+            self.put("k" * (i + 1), age=100 - i)
+        total = sum(size for _, size, _ in self.cache._entries())
+        self.cache.max_bytes = total // 2
+        self.put("new")
+        remaining = sum(size for _, size, _ in self.cache._entries())
+        self.assertLessEqual(remaining, int(self.cache.max_bytes * 0.9))
+        self.assertTrue(self.cached("new"))
+        self.assertFalse(self.cached("k"))
+
+    def test_disabled_cache_neither_reads_nor_writes(self):
+        self.cache.enabled = False
+        self.cache.put_json("transcripts", "key", [])
+        self.assertIsNone(self.cache.get_json("transcripts", "key"))
+        self.assertEqual(list(self.cache._entries()), [])
+
+
+class KeyTest(unittest.TestCase):
+    def test_content_key_separates_parts(self):
+        self.assertNotEqual(content_key("ab", "c"), content_key("a", "bc"))
+        self.assertEqual(content_key("a", 1), content_key("a", "1"))
+
+    def test_exact_frame_keys_tell_colours_apart(self):
+        red = np.zeros((8, 8, 3), dtype=np.uint8)
+        red[..., 2] = 255
+        blue = red[..., ::-1].copy()
+        self.assertNotEqual(frame_hash(red, "exact"), frame_hash(blue, "exact"))
+        self.assertEqual(frame_hash(red, "exact"), frame_hash(red.copy(), "exact"))
+        self.assertNotEqual(frame_hash(red, "exact"), frame_hash(red.reshape(16, 4, 3), "exact"))
+
+    def test_near_frame_keys_ignore_small_noise(self):
+        frame = np.full((64, 64, 3), 100, dtype=np.uint8)
+        self.assertEqual(frame_hash(frame, "near"), frame_hash(frame + 1, "near"))
+        self.assertTrue(frame_hash(frame, "near").startswith("near:"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+from unittest import mock
+
+from src.pipelines.search_video_library import SearchVideoLibrary, filter_expression
+
+
+class FilterExpressionTest(unittest.TestCase):
+    def test_no_conditions(self):
+        self.assertIsNone(filter_expression())
+        self.assertIsNone(filter_expression(layout="frame"))
+
+    def test_detection_layout(self):
+        self.assertEqual(
+            filter_expression("dog", start_time=1, end_time=5, min_confidence=0.5),
+            'object_class == "dog" and end_time >= 1.0 and start_time <= 5.0 and confidence >= 0.5')
+
+    def test_time_ranges_overlap(self):
+        self.assertEqual(filter_expression(start_time=2), "end_time >= 2.0")
+        self.assertEqual(filter_expression(end_time=0), "start_time <= 0.0")
+
+    def test_frame_layout(self):
+        self.assertEqual(filter_expression("dog", min_confidence=0.5, layout="frame"),
+                         'class_confidence["dog"] >= 0.5')
+        self.assertEqual(filter_expression("dog", end_time=3, layout="frame"),
+                         'ARRAY_CONTAINS(object_classes, "dog") and start_time <= 3.0')
+        self.assertEqual(filter_expression(min_confidence=0.25, layout="frame"), "max_confidence >= 0.25")
+
+    def test_class_names_are_quoted(self):
+        self.assertEqual(filter_expression('a "b" \\c'), 'object_class == "a \\"b\\" \\\\c"')
+
+
+class Hit:
+    def __init__(self, entity: dict, distance: float):
+        self.entity = entity
+        self.distance = distance
+
+
+class Client:
+    """Returns rows in primary key order, like a Milvus query does."""
+
+    def __init__(self, rows, layout: str = "detection", search_defaults=("L2", {})):
+        self.rows = rows
+        self.layout = layout
+        self.defaults = search_defaults
+        self.searches = []
+
+    def iter_rows(self, expr):
+        return iter(self.rows)
+
+    def search_defaults(self):
+        return self.defaults
+
+    def search(self, vectors, limit, video_ids=None, expr=None, search_params=None):
+        self.searches.append({"limit": limit, "search_params": search_params})
+        return [[Hit(row, distance=float(i)) for i, row in enumerate(self.rows[:limit])] for _ in vectors]
+
+
+def detection(video_id: str, frame_number: int, confidence: float = 0.9):
+    return {"video_id": video_id, "frame_name": f"frame_{frame_number}.jpg", "object_class": "dog",
+            "confidence": confidence, "start_time": frame_number / 30, "end_time": frame_number / 30}
+
+
+class SearchObjectsTest(unittest.TestCase):
+    def setUp(self):
+        self.searcher = SearchVideoLibrary(frames_dir="frames", audio_dir="audio")
+
+    def search(self, clients, **kwargs):
+        targets = [(client, None, video_id) for client, video_id in clients]
+        with mock.patch.object(self.searcher, "targets", return_value=targets):
+            return self.searcher.search_objects("dog", **kwargs)
+
+    def test_pages_follow_playback_order_not_key_order(self):
+        # A shared collection interleaves videos, a resumed ingest re-inserts early frames last
+        rows = [detection("b", 30), detection("a", 60), detection("b", 0), detection("a", 90),
+                detection("a", 0), detection("a", 30), detection("b", 60, confidence=0.5),
+                detection("b", 60)]
+        client = Client(rows)
+        pages = [self.search([(client, None)], limit=3, offset=offset) for offset in (0, 3, 6)]
+        order = [(row["video_id"], row["frame_name"], row["confidence"]) for page in pages for row in page]
+        self.assertEqual(order, [
+            ("a", "frame_0.jpg", 0.9), ("a", "frame_30.jpg", 0.9), ("a", "frame_60.jpg", 0.9),
+            ("a", "frame_90.jpg", 0.9), ("b", "frame_0.jpg", 0.9), ("b", "frame_30.jpg", 0.9),
+            ("b", "frame_60.jpg", 0.9), ("b", "frame_60.jpg", 0.5)])
+
+    def test_per_video_collections_are_merged(self):
+        first = Client([{k: v for k, v in detection("b", frame).items() if k != "video_id"}
+                        for frame in (60, 0)])
+        second = Client([{k: v for k, v in detection("a", frame).items() if k != "video_id"}
+                         for frame in (30,)])
+        page = self.search([(first, "b"), (second, "a")], limit=2)
+        self.assertEqual([(row["video_id"], row["frame_name"]) for row in page],
+                         [("a", "frame_30.jpg"), ("b", "frame_0.jpg")])
+
+    def test_frame_rows_expand_to_their_matching_detections(self):
+        row = dict(detection("a", 0), detections=[
+            {"object_class": "dog", "confidence": 0.4}, {"object_class": "cat", "confidence": 0.9},
+            {"object_class": "dog", "confidence": 0.8}])
+        page = self.search([(Client([row], layout="frame"), None)], min_confidence=0.5)
+        self.assertEqual([(record["object_class"], record["confidence"]) for record in page],
+                         [("dog", 0.8)])
+
+    def test_window_limit(self):
+        with self.assertRaises(ValueError):
+            self.search([], limit=10, offset=16384)
+
+
+class SearchVectorsTest(unittest.TestCase):
+    def setUp(self):
+        self.searcher = SearchVideoLibrary(frames_dir="frames", audio_dir="audio")
+        self.vectors = [[0.0] * 1000]
+
+    def search(self, client, **kwargs):
+        with mock.patch.object(self.searcher, "targets", return_value=[(client, None, "video")]), \
+                mock.patch("src.pipelines.search_video_library.feature_space.query_vectors",
+                           side_effect=lambda vectors: vectors):
+            return self.searcher.search_vectors(self.vectors, **kwargs)
+
+    def test_hnsw_ef_covers_deep_pages(self):
+        client = Client([detection("a", i) for i in range(5)], search_defaults=("L2", {"ef": 96}))
+        self.search(client, limit=100, offset=200)
+        self.search(client, limit=10)
+        self.search(client, limit=10, ef=128)
+        self.assertEqual([search["search_params"] for search in client.searches],
+                         [{"ef": 300}, {"ef": 96}, {"ef": 128}])
+        self.assertEqual(client.searches[0]["limit"], 300)
+
+    def test_ivf_probes_can_be_overridden(self):
+        client = Client([], search_defaults=("L2", {"nprobe": 16}))
+        self.search(client, nprobe=64)
+        self.search(client)
+        self.assertEqual([search["search_params"] for search in client.searches],
+                         [{"nprobe": 64}, {"nprobe": 16}])
+
+    def test_pages_are_sliced_from_the_merged_hits(self):
+        client = Client([detection("a", i) for i in range(5)], search_defaults=("IP", {}))
+        [page] = self.search(client, limit=2, offset=1)
+        # The collection returns a window of 3 hits, inner product ranks larger distances first
+        self.assertEqual([hit["distance"] for hit in page], [1.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
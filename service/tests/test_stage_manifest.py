@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from src.pipelines.stage_manifest import STAGES, StageManifest, downstream_stages
+
+VERSIONS = {stage: f"{stage}-v1" for stage in STAGES}
+
+
+class DownstreamStagesTest(unittest.TestCase):
+    def test_frames_invalidate_every_visual_stage(self):
+        self.assertEqual(downstream_stages({"frames"}),
+                         {"frames", "features", "detections", "ingest", "index"})
+
+    def test_detections_keep_frames_and_features(self):
+        self.assertEqual(downstream_stages({"detections"}), {"detections", "ingest", "index"})
+
+    def test_audio_stands_alone(self):
+        self.assertEqual(downstream_stages({"audio"}), {"audio"})
+        self.assertEqual(downstream_stages(()), set())
+
+
+class PrepareTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "manifest.json")
+        manifest = StageManifest(self.path)
+        manifest.prepare(VERSIONS)
+        for stage in STAGES:
+            manifest.complete(stage, seconds=1.0)
+
+    def completed(self, manifest):
+        return {stage for stage in STAGES if manifest.is_completed(stage)}
+
+    def test_unchanged_versions_keep_every_stage(self):
+        manifest = StageManifest(self.path)
+        self.assertEqual(manifest.prepare(VERSIONS), set())
+        self.assertEqual(self.completed(manifest), set(STAGES))
+
+    def test_changed_version_resets_the_stage_and_its_downstream_ones(self):
+        manifest = StageManifest(self.path)
+        reset = manifest.prepare(dict(VERSIONS, detections="detections-v2"))
+        self.assertEqual(reset, {"detections", "ingest", "index"})
+        self.assertEqual(self.completed(StageManifest(self.path)), {"frames", "features", "audio"})
+
+    def test_rerun_stages_are_reset(self):
+        manifest = StageManifest(self.path)
+        self.assertEqual(manifest.prepare(VERSIONS, rerun=["audio"]), {"audio"})
+        self.assertFalse(manifest.is_completed("audio"))
+
+    def test_reset_drops_checkpoints(self):
+        manifest = StageManifest(self.path)
+        manifest.prepare(VERSIONS, rerun=["ingest"])
+        manifest.add_checkpoint_frames("ingest", ["frame_0.jpg"])
+        self.assertTrue(manifest.has_progress("ingest"))
+        manifest.prepare(dict(VERSIONS, features="features-v2"))
+        self.assertFalse(StageManifest(self.path).has_progress("ingest"))
+
+
+class FailureTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "manifest.json")
+
+    def test_failure_is_kept_until_cleared(self):
+        manifest = StageManifest(self.path)
+        manifest.mark_failed(["upload.mp4"])
+        reloaded = StageManifest(self.path)
+        self.assertIsNotNone(reloaded.failed_at())
+        self.assertEqual(reloaded.data["failed"]["paths"], ["upload.mp4"])
+        reloaded.clear_failure()
+        self.assertIsNone(StageManifest(self.path).failed_at())
+
+    def test_stale_rows_are_saved(self):
+        StageManifest(self.path).set_stale_rows([3, 1, 2])
+        self.assertEqual(StageManifest(self.path).stale_rows(), [3, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+
+from src.pipelines.stream_video_pipeline import StreamVideoPipeline
+
+
+class FrameExtractor:
+    output_dir = "frames"
+
+    def __init__(self, frame_numbers):
+        self.frame_numbers = frame_numbers
+        self.frame_ranges = {}
+
+    def iter_frames(self):
+        for frame_number in self.frame_numbers:
+            yield frame_number, frame_number / 30, np.zeros((4, 4, 3), dtype=np.uint8)
+
+    @staticmethod
+    def frame_name(frame_number: int) -> str:
+        return f"frame_{frame_number}.jpg"
+
+
+class FeatureExtractor:
+    def process_batch(self, images):
+        return [[0.0] * 4 for _ in images]
+
+
+class ObjectDetector:
+    def process_batch(self, images):
+        return [[] for _ in images]
+
+    def to_records(self, detections):
+        return detections
+
+
+class Ingestor:
+    frame_ranges = None
+
+    def __init__(self):
+        self.frames = []
+        self.finished = False
+
+    def ingest_frames(self, frames):
+        self.frames.extend(frame for frame, _, _ in frames)
+
+    def finish(self):
+        self.finished = True
+
+    def abort(self):
+        pass
+
+
+class StreamVideoPipelineTest(unittest.TestCase):
+    def run_pipeline(self, frame_numbers, batch_size):
+        ingestor = Ingestor()
+        pipeline = StreamVideoPipeline(
+            FrameExtractor(frame_numbers), FeatureExtractor(), ObjectDetector(), ingestor,
+            batch_size=batch_size, persist=False)
+        self.assertEqual(pipeline.run(), len(frame_numbers))
+        self.assertTrue(ingestor.finished)
+        return ingestor.frames
+
+    def test_frames_are_ingested_in_decode_order(self):
+        frame_numbers = [0, 20, 100, 120, 200, 1000]
+        expected = [f"frame_{frame_number}.jpg" for frame_number in frame_numbers]
+        self.assertEqual(self.run_pipeline(frame_numbers, batch_size=4), expected)
+        self.assertEqual(self.run_pipeline(frame_numbers, batch_size=16), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()